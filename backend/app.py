@@ -37,14 +37,47 @@ scheduler.start()
 
 
 
+# 每天凌晨把超过热数据窗口（logArchiveDays）的日志移入压缩归档
+from utils.log_archive import run_log_archive
+scheduler.add_job(
+    func=run_log_archive,
+    trigger='cron',
+    hour=3,
+    minute=30,
+    id='system_log_archive',
+    name='Log archive',
+    replace_existing=True
+)
+
+# 归档之后按保留天数清理过期日志、文件和运行记录，并压缩数据库
+from utils.retention import run_retention
+scheduler.add_job(
+    func=run_retention,
+    trigger='cron',
+    hour=4,
+    minute=0,
+    id='system_retention',
+    name='Data retention',
+    replace_existing=True
+)
+
+# 后台启动爬虫进程的预热 fork 服务（预导入常用模块需要一些时间），首次运行即可直接 fork
+from utils import zygote
+if zygote.is_supported() and db.get_system_settings().get('useZygote', True):
+    import threading
+    threading.Thread(target=zygote.get_zygote().start, daemon=True).start()
+
 # 导入路由
 from routes.spider_routes import spider_bp
 from routes.file_routes import file_bp
 from routes.log_routes import log_bp
-from routes.schedule_routes import schedule_bp
+from routes.schedule_routes import schedule_bp, init_scheduler
 from routes.settings_routes import settings_bp
 from routes.monitor_routes import monitor_bp
 
+# 定时任务路由与系统任务共用同一个调度器
+init_scheduler(scheduler)
+
 # 注册蓝图
 app.register_blueprint(spider_bp, url_prefix='/api')
 app.register_blueprint(file_bp, url_prefix='/api')
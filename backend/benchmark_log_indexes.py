@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志/文件索引迁移前后的查询耗时对比
+
+在临时数据库中生成大量日志和文件记录，先只应用基础表结构（版本1），
+测量日志路由、监控统计和文件列表使用的查询耗时；再执行索引迁移，
+重新测量同样的查询。
+
+用法: python benchmark_log_indexes.py [--rows 1000000] [--spiders 50]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import run_migrations, CONNECTION_PRAGMAS
+
+INDEX_MIGRATION_VERSION = 2
+LEVELS = ['INFO', 'INFO', 'INFO', 'WARNING', 'ERROR', 'DEBUG']
+SOURCES = ['spider_output', 'spider_runner', 'spider_error', 'api_call']
+
+
+def populate(conn, rows, spiders, files_per_spider):
+    """生成测试数据"""
+    conn.executemany(
+        'INSERT INTO spiders (id, name, code) VALUES (?, ?, ?)',
+        [(i, f'spider_{i}', 'pass') for i in range(1, spiders + 1)]
+    )
+
+    now = datetime.now()
+    executions = {i: [str(uuid.uuid4()) for _ in range(20)] for i in range(1, spiders + 1)}
+
+    def log_rows():
+        for n in range(rows):
+            spider_id = random.randint(1, spiders)
+            ts = now - timedelta(seconds=random.randint(0, 30 * 24 * 3600))
+            yield (
+                spider_id,
+                random.choice(LEVELS),
+                f'line {n} fetched item {random.randint(0, 99999)}',
+                ts.strftime('%Y-%m-%d %H:%M:%S'),
+                random.choice(SOURCES),
+                random.choice(executions[spider_id])
+            )
+
+    conn.executemany(
+        'INSERT INTO spider_logs (spider_id, level, message, timestamp, source, execution_id) VALUES (?, ?, ?, ?, ?, ?)',
+        log_rows()
+    )
+
+    def file_rows():
+        for spider_id in range(1, spiders + 1):
+            for n in range(files_per_spider):
+                ts = now - timedelta(seconds=random.randint(0, 30 * 24 * 3600))
+                path = os.path.join('spider_files', f'spider_{spider_id}', f'result_{n}.json')
+                yield (spider_id, f'result_{n}.json', path, 'json', 1024, ts.strftime('%Y-%m-%d %H:%M:%S'))
+
+    conn.executemany(
+        'INSERT INTO spider_files (spider_id, filename, file_path, file_type, file_size, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+        file_rows()
+    )
+    conn.commit()
+
+    return executions
+
+
+def build_queries(spider_id, execution_id, files_per_spider):
+    """与路由中相同形状的查询"""
+    day_ago = (datetime.now() - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
+    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+
+    return [
+        ('logs page (ORDER BY timestamp)',
+         'SELECT * FROM spider_logs WHERE spider_id = ? ORDER BY timestamp DESC LIMIT 50 OFFSET 0',
+         (spider_id,)),
+        ('logs count',
+         'SELECT COUNT(*) FROM spider_logs WHERE spider_id = ?',
+         (spider_id,)),
+        ('logs by execution',
+         'SELECT * FROM spider_logs WHERE spider_id = ? AND execution_id = ? ORDER BY timestamp DESC LIMIT 50',
+         (spider_id, execution_id)),
+        ('logs by level',
+         'SELECT * FROM spider_logs WHERE spider_id = ? AND level = ? ORDER BY timestamp DESC LIMIT 50',
+         (spider_id, 'ERROR')),
+        ('level distribution',
+         'SELECT level, COUNT(*) FROM spider_logs WHERE spider_id = ? GROUP BY level',
+         (spider_id,)),
+        ('daily logs (7 days)',
+         'SELECT DATE(timestamp), COUNT(*) FROM spider_logs WHERE spider_id = ? AND timestamp >= ? GROUP BY DATE(timestamp)',
+         (spider_id, week_ago)),
+        ('monitor hourly (24h, all spiders)',
+         "SELECT strftime('%Y-%m-%d %H:00:00', timestamp), COUNT(*) FROM spider_logs WHERE timestamp >= ? GROUP BY 1",
+         (day_ago,)),
+        ('files page',
+         'SELECT * FROM spider_files WHERE spider_id = ? ORDER BY created_at DESC LIMIT 20 OFFSET 0',
+         (spider_id,)),
+        ('file by path',
+         'SELECT * FROM spider_files WHERE spider_id = ? AND file_path = ?',
+         (spider_id, os.path.join('spider_files', f'spider_{spider_id}', f'result_{files_per_spider - 1}.json'))),
+    ]
+
+
+def measure(conn, queries, repeat):
+    """每个查询执行 repeat 次，返回中位耗时（毫秒）"""
+    results = {}
+    for name, sql, params in queries:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = timings[len(timings) // 2]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日志/文件索引迁移性能对比')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='日志行数')
+    parser.add_argument('--spiders', type=int, default=50, help='爬虫数量')
+    parser.add_argument('--files', type=int, default=2000, help='每个爬虫的文件记录数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询的重复次数')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='spider_bench_'), 'bench.db')
+    conn = sqlite3.connect(db_path)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+    print(f"数据库: {db_path}")
+    run_migrations(conn, target_version=1)
+
+    print(f"生成 {args.rows:,} 条日志、{args.spiders * args.files:,} 条文件记录...")
+    start = time.perf_counter()
+    executions = populate(conn, args.rows, args.spiders, args.files)
+    print(f"数据生成耗时 {time.perf_counter() - start:.1f}秒")
+
+    spider_id = args.spiders // 2 or 1
+    queries = build_queries(spider_id, executions[spider_id][0], args.files)
+
+    print("\n测量无索引时的查询耗时...")
+    before = measure(conn, queries, args.repeat)
+
+    print("执行索引迁移...")
+    start = time.perf_counter()
+    run_migrations(conn, target_version=INDEX_MIGRATION_VERSION)
+    print(f"迁移耗时 {time.perf_counter() - start:.1f}秒")
+
+    print("测量有索引时的查询耗时...\n")
+    after = measure(conn, queries, args.repeat)
+
+    print(f"{'查询':<36}{'迁移前(ms)':>14}{'迁移后(ms)':>14}{'加速':>10}")
+    print('-' * 74)
+    for name, _, _ in queries:
+        speedup = before[name] / after[name] if after[name] > 0 else float('inf')
+        print(f"{name:<36}{before[name]:>14.2f}{after[name]:>14.2f}{speedup:>9.1f}x")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
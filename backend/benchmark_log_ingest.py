@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫输出日志写入吞吐对比：逐行 create_log 与 create_logs_bulk
+
+模拟一次爬虫执行输出 N 行 stdout，分别用逐行提交和批量写入的方式
+写入临时数据库，输出每秒写入行数。
+
+用法: python benchmark_log_ingest.py [--lines 50000] [--chunk-size 1000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import Database
+
+
+def make_lines(count):
+    return [f'[2024-01-01T00:00:00] [INFO] fetched item {n} from page {n // 20}' for n in range(count)]
+
+
+def bench_per_line(db, spider_id, lines):
+    execution_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    for line in lines:
+        db.create_log(
+            spider_id=spider_id,
+            level='INFO',
+            message=line,
+            source='spider_output',
+            execution_id=execution_id
+        )
+    return time.perf_counter() - start
+
+
+def bench_bulk(db, spider_id, lines, chunk_size):
+    execution_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    db.create_logs_bulk(
+        ((spider_id, 'INFO', line, 'spider_output', execution_id) for line in lines),
+        chunk_size=chunk_size
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日志写入吞吐对比')
+    parser.add_argument('--lines', type=int, default=50000, help='输出行数')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='批量写入每个事务的行数')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='spider_bench_'), 'bench.db')
+    db = Database(db_path)
+    spider_id = db.create_spider('benchmark', '', 'pass')
+    lines = make_lines(args.lines)
+
+    print(f"数据库: {db_path}")
+    print(f"写入 {args.lines:,} 行日志\n")
+
+    per_line = bench_per_line(db, spider_id, lines)
+    print(f"逐行 create_log:      {per_line:8.2f}秒  {args.lines / per_line:12,.0f} 行/秒")
+
+    bulk = bench_bulk(db, spider_id, lines, args.chunk_size)
+    print(f"create_logs_bulk:     {bulk:8.2f}秒  {args.lines / bulk:12,.0f} 行/秒")
+
+    print(f"\n加速: {per_line / bulk:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
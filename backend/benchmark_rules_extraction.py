@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则提取性能测试：BeautifulSoup 路径与编译后的 lxml 路径
+
+生成含 --items 个数据项的列表页，分别用原来的方式（BeautifulSoup 和 lxml 各解析一次，
+每个数据项逐字段 soup.select）和编译后的 lxml 方式（只解析一次，CSS 规则转换为 XPath
+后在整个文档上求值一次）提取，输出耗时并检查两者结果一致。
+
+用法: python benchmark_rules_extraction.py [--items 10000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+from lxml import html
+
+from utils import rules_engine
+
+RULES = [
+    # 第一个规则匹配的元素为数据项，其余字段在数据项中查找
+    {'field': 'item', 'selector': '#list > li.product', 'selectorType': 'css', 'type': 'text'},
+    {'field': 'title', 'selector': 'li.product h2 a', 'selectorType': 'css', 'type': 'text'},
+    {'field': 'link', 'selector': 'h2 > a', 'selectorType': 'css', 'type': 'attr', 'attr': 'href'},
+    {'field': 'price', 'selector': 'span.price', 'selectorType': 'css', 'type': 'text'},
+    {'field': 'sku', 'selector': '.meta [data-sku]', 'selectorType': 'css', 'type': 'attr', 'attr': 'data-sku'},
+    {'field': 'tags', 'selector': 'ul.tags', 'selectorType': 'css', 'type': 'html'},
+]
+
+
+def build_page(items):
+    rows = []
+    for n in range(items):
+        rows.append(
+            f'<li class="product item-{n % 7}">'
+            f'<h2><a href="/p/{n}">商品 {n}</a></h2>'
+            f'<div class="meta"><span data-sku="SKU{n:06d}">库存 {n % 13}</span></div>'
+            f'<span class="price">{n * 1.5:.2f}</span>'
+            f'<ul class="tags"><li>t{n % 3}</li><li>t{n % 5}</li></ul>'
+            f'</li>'
+        )
+    return (
+        '<html><head><title>listing</title></head><body><nav><a href="/">home</a></nav>'
+        f'<ul id="list">{"".join(rows)}</ul></body></html>'
+    )
+
+
+def run_soup(text):
+    soup = BeautifulSoup(text, 'html.parser')
+    tree = html.fromstring(text)
+    return rules_engine.extract_data_by_rules(soup, tree, RULES)
+
+
+def run_lxml(text):
+    return rules_engine.parse_and_extract(text, RULES)
+
+
+def timed(func, text, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='规则提取性能测试')
+    parser.add_argument('--items', type=int, default=10000, help='列表页中的数据项数')
+    parser.add_argument('--repeat', type=int, default=3, help='每种方式的重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    text = build_page(args.items)
+    print(f"页面大小: {len(text.encode('utf-8')) / 1024 / 1024:.1f}MB，{args.items} 个数据项\n")
+
+    lxml_time, lxml_result = timed(run_lxml, text, args.repeat)
+    soup_time, soup_result = timed(run_soup, text, args.repeat)
+
+    print(f"BeautifulSoup: {soup_time:8.3f}s")
+    print(f"lxml (编译):   {lxml_time:8.3f}s  加速 {soup_time / lxml_time:5.1f}x")
+    print(f"结果一致: {soup_result == lxml_result}（{len(lxml_result)} 条）")
+    if soup_result != lxml_result:
+        for expected, actual in zip(soup_result, lxml_result):
+            if expected != actual:
+                print(f"  BeautifulSoup: {expected}\n  lxml:          {actual}")
+                break
+
+
+if __name__ == '__main__':
+    main()
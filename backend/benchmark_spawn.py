@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫进程启动延迟对比：冷启动解释器与预热 fork 服务（zygote）
+
+每次启动一个导入 requests / bs4 / lxml 后输出一行的脚本，分别测量
+从发起启动到读到第一行输出的时间，以及到进程退出的时间。
+
+用法: python benchmark_spawn.py [--runs 20] [--imports requests,bs4,lxml.html]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import zygote
+
+
+def make_script(imports):
+    lines = ['import sys']
+    for name in imports:
+        lines.append(f'try:\n    import {name}\nexcept ImportError:\n    pass')
+    lines.append('print("first line", flush=True)')
+    path = os.path.join(tempfile.mkdtemp(prefix='spider_bench_'), 'spawn_bench.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+def cold_spawn(script, env, cwd):
+    return subprocess.Popen(
+        [sys.executable, script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        env=env,
+        cwd=cwd
+    )
+
+
+def measure(spawn, script, env, cwd, runs):
+    first_line = []
+    total = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = spawn(script, env, cwd)
+        line = process.stdout.readline()
+        first_line.append(time.perf_counter() - start)
+        process.stdout.read()
+        process.stderr.read()
+        process.wait()
+        total.append(time.perf_counter() - start)
+        if line.strip() != 'first line' or process.returncode != 0:
+            raise RuntimeError(f'unexpected output {line!r} (exit code {process.returncode})')
+    return first_line, total
+
+
+def summarize(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<22} 平均 {statistics.mean(samples) * 1000:8.1f}ms  "
+          f"中位数 {statistics.median(samples) * 1000:8.1f}ms  P95 {p95 * 1000:8.1f}ms")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫进程启动延迟对比')
+    parser.add_argument('--runs', type=int, default=20, help='每种方式的启动次数')
+    parser.add_argument('--imports', default='requests,bs4,lxml.html', help='脚本导入的模块，逗号分隔')
+    args = parser.parse_args()
+
+    if not zygote.is_supported():
+        print('当前平台不支持 fork 服务（需要 POSIX 和 Python 3.9+）')
+        return
+
+    imports = [name for name in args.imports.split(',') if name]
+    script = make_script(imports)
+    cwd = os.path.dirname(script)
+    env = os.environ.copy()
+    env['PYTHONUNBUFFERED'] = '1'
+
+    client = zygote.ZygoteClient()
+    start = time.perf_counter()
+    if not client.start():
+        print('fork 服务启动失败')
+        return
+    print(f"fork 服务预热耗时: {(time.perf_counter() - start) * 1000:.0f}ms（只在服务启动时发生一次）")
+    print(f"脚本导入: {', '.join(imports)}，每种方式 {args.runs} 次\n")
+
+    cold_first, cold_total = measure(cold_spawn, script, env, cwd, args.runs)
+    warm_first, warm_total = measure(client.spawn, script, env, cwd, args.runs)
+    client.stop()
+
+    print('启动到第一行输出:')
+    cold = summarize('  冷启动', cold_first)
+    warm = summarize('  fork 服务', warm_first)
+    print('启动到进程退出:')
+    summarize('  冷启动', cold_total)
+    summarize('  fork 服务', warm_total)
+
+    print(f"\n第一行输出延迟加速（中位数）: {cold / warm:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+worker 进程吞吐测试：不同 worker 进程数下执行同一批运行任务的总耗时
+
+在临时目录中创建数据库和若干个爬虫（每个爬虫执行 --cpu 秒的计算后保存数据），
+把每个爬虫的一次运行写入任务队列，然后分别启动 1、2、4 …… 个 worker 进程执行，
+输出完成全部任务的耗时和每秒完成的运行数。--kill-one 时在运行中途强制结束
+一个 worker，检验其租约过期的任务会被其他 worker 重新执行。
+
+用法: python benchmark_workers.py [--jobs 24] [--workers 1,2,4] [--concurrency 1] [--cpu 0.5] [--kill-one]
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+
+SPIDER_CODE = '''
+import time
+start = time.process_time()
+total = 0
+while time.process_time() - start < {cpu}:
+    total += 1
+save_data([{{'iterations': total}}], 'result.json')
+'''
+
+
+def enqueue_jobs(db, spider_ids):
+    for spider_id in spider_ids:
+        db.enqueue_job(spider_id, str(uuid.uuid4()))
+
+
+def wait_for_jobs(db, count, timeout):
+    """等待任务全部结束，返回各状态的任务数"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = db.get_job_queue_stats()['counts']
+        finished = sum(counts.get(status, 0) for status in ('done', 'failed', 'cancelled'))
+        if finished >= count:
+            return counts
+        time.sleep(0.2)
+    raise RuntimeError(f'jobs did not finish within {timeout}s: {db.get_job_queue_stats()}')
+
+
+def run_round(db, spider_ids, workers, concurrency, lease, kill_one, timeout):
+    with db.get_connection() as conn:
+        conn.execute('DELETE FROM job_queue')
+        conn.commit()
+    enqueue_jobs(db, spider_ids)
+
+    start = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, 'worker.py'),
+             '--concurrency', str(concurrency), '--lease', str(lease), '--poll', '0.1',
+             '--worker-id', f'bench-{workers}-{n}'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        for n in range(workers)
+    ]
+    try:
+        if kill_one:
+            time.sleep(1.5)
+            processes[0].kill()
+        counts = wait_for_jobs(db, len(spider_ids), timeout)
+        elapsed = time.perf_counter() - start
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return elapsed, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='worker 进程吞吐测试')
+    parser.add_argument('--jobs', type=int, default=24, help='任务数（每个任务对应一个爬虫）')
+    parser.add_argument('--workers', default='1,2,4', help='依次测试的 worker 进程数，逗号分隔')
+    parser.add_argument('--concurrency', type=int, default=1, help='每个 worker 同时执行的运行数')
+    parser.add_argument('--cpu', type=float, default=0.5, help='每个爬虫消耗的 CPU 时间（秒）')
+    parser.add_argument('--lease', type=float, default=30, help='任务租约时长（秒）')
+    parser.add_argument('--kill-one', action='store_true', help='运行中途强制结束一个 worker')
+    parser.add_argument('--timeout', type=float, default=600, help='每轮的最长等待时间（秒）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='spider_workers_')
+    os.chdir(workdir)
+    from database import get_db
+    db = get_db()
+    spider_ids = [
+        db.create_spider(f'bench_{n}', 'worker benchmark', SPIDER_CODE.format(cpu=args.cpu))
+        for n in range(args.jobs)
+    ]
+
+    print(f"工作目录: {workdir}")
+    print(f"{args.jobs} 个任务，每个消耗 {args.cpu}s CPU，每个 worker 并发 {args.concurrency}\n")
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(',') if n]:
+        elapsed, counts = run_round(
+            db, spider_ids, workers, args.concurrency, args.lease, args.kill_one, args.timeout
+        )
+        baseline = baseline or elapsed
+        print(f"{workers:>2} 个 worker: {elapsed:7.2f}s  {args.jobs / elapsed:6.2f} 次/秒  "
+              f"加速 {baseline / elapsed:4.1f}x  任务状态 {counts}")
+
+
+if __name__ == '__main__':
+    main()
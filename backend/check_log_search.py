@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志搜索检查：数据库中的热数据与压缩归档的搜索语义一致
+
+在临时目录中创建数据库，写入一部分早于归档窗口的日志并归档，其余留在数据库中，
+然后通过日志列表接口用多词、"短语"、前缀*、OR 等搜索词查询（页码分页和游标分页），
+检查热数据和归档中的匹配都被返回，且传入 include_total 时 total 与返回的条数一致。
+
+用法: python check_log_search.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+
+# 数据库和归档目录都使用相对当前目录的路径，切换到临时目录后再导入
+WORK_DIR = tempfile.mkdtemp(prefix='check_log_search_')
+os.chdir(WORK_DIR)
+
+from flask import Flask
+
+from database import get_db
+from routes.log_routes import log_bp
+from utils.log_archive import get_log_archive
+
+# (消息, 是否归档)
+MESSAGES = [
+    ('err line from archive', True),
+    ('Timeout while loading page', True),
+    ('unrelated archived message', True),
+    ('err line from database', False),
+    ('line err reversed order', False),
+    ('linear scan finished', False),
+    ('nothing to see here', False),
+]
+
+# (搜索词, 期望匹配的消息)
+QUERIES = [
+    ('err line', {'err line from archive', 'err line from database', 'line err reversed order'}),
+    ('line err', {'err line from archive', 'err line from database', 'line err reversed order'}),
+    ('"err line"', {'err line from archive', 'err line from database'}),
+    ('lin*', {'err line from archive', 'err line from database', 'line err reversed order', 'linear scan finished'}),
+    ('timeout OR linear', {'Timeout while loading page', 'linear scan finished'}),
+    ('archive OR database err', {'err line from archive', 'unrelated archived message', 'err line from database'}),
+    # 少于 3 个字符的词无法使用 trigram 索引，热数据退回 LIKE 条件
+    ('li er', {'err line from archive', 'err line from database', 'line err reversed order'}),
+]
+
+
+def setup(db):
+    with db.get_connection() as conn:
+        spider_id = conn.execute(
+            "INSERT INTO spiders (name, code) VALUES ('check_log_search', 'print(1)')"
+        ).lastrowid
+        old = datetime.utcnow() - timedelta(days=30)
+        for index, (message, archived) in enumerate(MESSAGES):
+            timestamp = (old if archived else datetime.utcnow()) + timedelta(seconds=index)
+            conn.execute(
+                'INSERT INTO spider_logs (spider_id, level, message, source, timestamp) VALUES (?, ?, ?, ?, ?)',
+                (spider_id, 'INFO', message, 'check', timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+            )
+        conn.commit()
+    db.rebuild_log_fts()
+    summary = get_log_archive().archive(7)
+    archived = sum(1 for _, is_archived in MESSAGES if is_archived)
+    assert summary['archived_rows'] == archived, f'归档了 {summary["archived_rows"]} 行，期望 {archived} 行'
+    return spider_id
+
+
+def fetch(client, spider_id, search, **params):
+    response = client.get(f'/api/spiders/{spider_id}/logs', query_string=dict(params, search=search, per_page=100))
+    assert response.status_code == 200, f'{search}: HTTP {response.status_code} {response.get_json()}'
+    return response.get_json()
+
+
+def main():
+    app = Flask(__name__)
+    app.register_blueprint(log_bp, url_prefix='/api')
+    client = app.test_client()
+    try:
+        spider_id = setup(get_db())
+        for search, expected in QUERIES:
+            for mode, params in (('页码分页', {}), ('游标分页', {'cursor': ''})):
+                result = fetch(client, spider_id, search, include_total='true', **params)
+                messages = {log['message'] for log in result['logs']}
+                total = result['pagination']['total']
+                assert messages == expected, f'{search}: {mode}返回 {sorted(messages)}，期望 {sorted(expected)}'
+                assert total == len(expected), f'{search}: {mode} total 为 {total}，期望 {len(expected)}'
+                assert not result['pagination']['total_capped'], f'{search}: {mode} total_capped 应为 false'
+
+            # 未传 include_total 时不统计归档中的匹配，total 只是下限
+            result = fetch(client, spider_id, search)
+            assert {log['message'] for log in result['logs']} == expected, f'{search}: 默认参数返回的日志不一致'
+            assert result['pagination']['total_capped'], f'{search}: 未统计归档时 total_capped 应为 true'
+            assert result['pagination']['total'] <= len(expected), f'{search}: total 超过匹配数'
+            print(f'  通过: {search}（{len(expected)} 条）')
+        print('全部检查通过')
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则爬虫多页面抓取检查
+
+在本地启动一个模拟列表站点的 HTTP 服务，分别用 URL 列表、URL 模板、下一页链接以及
+URL 列表加下一页链接的配置抓取，检查返回的数据项和页面数。服务端让页码越小的页面
+响应越慢，页面会乱序到达，以此检查数据仍按页面顺序（初始页面顺序，其后为各自的翻页）返回。
+安装了 aiohttp 时同时检查 aiohttp 和 requests 线程池两种客户端。
+
+用法: python check_rules_crawl.py
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import rules_engine
+
+PAGES = 5           # 每个栏目的页数
+ITEMS = 3           # 每页数据项数
+LATENCY = 0.02      # 页码每小一页，响应多等待的时间（秒）
+
+RULES = [
+    {'field': 'item', 'selector': 'li.product', 'selectorType': 'css', 'type': 'text'},
+    {'field': 'title', 'selector': 'a', 'selectorType': 'css', 'type': 'text'},
+]
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        section = url.path.strip('/').split('/')[0]
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        time.sleep((PAGES - page) * LATENCY)
+        rows = ''.join(f'<li class="product"><a>{section}-{page}-{n}</a></li>' for n in range(ITEMS))
+        next_link = f'<a class="next" href="/{section}/list?page={page + 1}">下一页</a>' if page < PAGES else ''
+        body = f'<html><body><ul>{rows}</ul>{next_link}</body></html>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ListingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def expected(section, pages):
+    return [f'{section}-{page}-{n}' for page in pages for n in range(ITEMS)]
+
+
+def check(name, config, titles, pages):
+    config = dict(config, type='rules', rules=RULES, retries=0, concurrency=8, per_host_concurrency=8)
+    result = rules_engine.run_rules(config, timeout=30)
+    assert result['success'], f"{name}: {result.get('error')}"
+    actual = [item['title'] for item in result['data']]
+    assert actual == titles, f'{name}: 数据顺序错误\n  实际: {actual}\n  期望: {titles}'
+    assert result['pages'] == pages, f"{name}: 抓取了 {result['pages']} 个页面，期望 {pages} 个"
+    assert result.get('failed_pages', 0) == 0, f"{name}: {result['failed_pages']} 个页面失败"
+    print(f'  通过: {name}（{pages} 个页面，{len(actual)} 条）')
+
+
+def run_checks(base):
+    check('URL 列表', {
+        'urls': [f'{base}/a/list?page=3', f'{base}/a/list?page=1', f'{base}/a/list?page=2'],
+    }, expected('a', [3, 1, 2]), 3)
+
+    check('URL 模板', {
+        'url_template': f'{base}/a/list?page={{page}}',
+        'pages': {'start': 1, 'end': PAGES},
+    }, expected('a', range(1, PAGES + 1)), PAGES)
+
+    check('下一页链接', {
+        'url': f'{base}/a/list?page=1',
+        'next_page': 'a.next',
+    }, expected('a', range(1, PAGES + 1)), PAGES)
+
+    check('下一页链接（max_pages 限制）', {
+        'url': f'{base}/a/list?page=1',
+        'next_page': {'selector': '//a[@class="next"]', 'selectorType': 'xpath'},
+        'max_pages': 2,
+    }, expected('a', [1, 2, 3]), 3)
+
+    # 两个栏目同时翻页，第二个栏目从第 3 页开始、响应更快，数据仍按初始页面顺序排列
+    check('URL 列表加下一页链接', {
+        'urls': [f'{base}/a/list?page=1', f'{base}/b/list?page=3'],
+        'next_page': 'a.next',
+    }, expected('a', range(1, PAGES + 1)) + expected('b', range(3, PAGES + 1)), PAGES + PAGES - 2)
+
+
+def main():
+    server = ListingServer(('127.0.0.1', 0), ListingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    aiohttp = rules_engine.aiohttp
+    clients = [('aiohttp', aiohttp)] if aiohttp is not None else []
+    clients.append(('requests 线程池', None))
+    try:
+        for client, module in clients:
+            print(f'客户端 {client}:')
+            rules_engine.aiohttp = module
+            run_checks(base)
+    finally:
+        rules_engine.aiohttp = aiohttp
+        server.shutdown()
+    print('全部检查通过')
+
+
+if __name__ == '__main__':
+    main()
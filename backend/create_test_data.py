@@ -45,6 +45,7 @@ def create_test_data():
         
         # 清除现有测试日志
         cursor.execute('DELETE FROM spider_logs WHERE spider_id IN ({})'.format(','.join('?' * len(spider_ids))), spider_ids)
+        cursor.execute('DELETE FROM spider_run_stats WHERE spider_id IN ({})'.format(','.join('?' * len(spider_ids))), spider_ids)
         
         # 生成每小时的日志数据
         for hour_offset in range(24):
@@ -79,8 +80,20 @@ def create_test_data():
                         INSERT INTO spider_logs (spider_id, level, message, timestamp, execution_id)
                         VALUES (?, ?, ?, ?, ?)
                     ''', (spider_id, 'ERROR', f'爬虫运行失败 - 执行ID: {execution_id} - error', end_time.isoformat(), execution_id))
+                
+                # 监控图表读取按小时汇总的运行统计
+                db.record_run_stats(spider_id, runs=1, at=start_time)
+                db.record_run_stats(
+                    spider_id,
+                    successes=1 if is_success else 0,
+                    errors=0 if is_success else 1,
+                    duration=(end_time - start_time).total_seconds(),
+                    at=end_time
+                )
         
         conn.commit()
+        # 直接插入的日志需要同步到全文索引
+        db.rebuild_log_fts()
         print(f"已生成过去24小时的测试日志数据")
     
     print("测试数据创建完成！")
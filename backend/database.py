@@ -1,93 +1,665 @@
 import sqlite3
 import json
 import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
 from contextlib import contextmanager
 import logging
+from utils.pagination import keyset_page, keyset_rows
 
 logger = logging.getLogger(__name__)
 
+# 连接池配置
+POOL_SIZE = 8
+POOL_TIMEOUT = 30  # 等待空闲连接的最长时间（秒）
+BUSY_TIMEOUT_MS = 5000
+
+# 批量写入日志时每个事务包含的行数
+LOG_BULK_CHUNK_SIZE = 1000
+DELETE_BATCH_SIZE = 2000         # 批量删除时每个事务删除的行数
+JOB_MAX_ATTEMPTS = 3             # 任务队列中租约过期的任务最多执行的次数
+
+# 每个连接建立后执行的PRAGMA
+CONNECTION_PRAGMAS = (
+    # 增量自动清理：删除数据后可用 incremental_vacuum 归还空间；必须在切换 WAL 之前设置，
+    # 对已有数据库只在下一次 VACUUM 时生效
+    'PRAGMA auto_vacuum=INCREMENTAL',
+    'PRAGMA journal_mode=WAL',       # 读写互不阻塞
+    'PRAGMA synchronous=NORMAL',     # WAL模式下只在检查点时fsync
+    'PRAGMA mmap_size=268435456',    # 256MB内存映射
+    'PRAGMA cache_size=-65536',      # 64MB页缓存
+    'PRAGMA temp_store=MEMORY',
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}',
+)
+
+
+class ConnectionPool:
+    """SQLite连接池
+
+    连接在多个线程之间复用，同一线程内嵌套的 get_connection 调用
+    共享同一个连接，避免嵌套时耗尽连接池或互相锁等待。
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.schema_ready = False
+        self.fts_tokenizer = None  # 日志全文索引的分词器，'' 表示不可用
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'reused': 0,
+        }
+
+    def _create_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        """取出一个空闲连接，连接数未达上限时新建，否则等待"""
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats['reused'] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f'Timed out after {self.timeout}s waiting for a database connection'
+            )
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats['waits'] += 1
+            self._stats['reused'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        return conn
+
+    def _release(self, conn):
+        """归还连接，未提交的事务会被回滚（与关闭连接时的行为一致）"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # 连接已损坏，丢弃并允许重新创建
+            try:
+                conn.close()
+            finally:
+                with self._lock:
+                    self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            # 同一线程内的嵌套调用复用已取出的连接
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        with self._lock:
+            self._stats['checkouts'] += 1
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def stats(self):
+        """连接池指标"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['created'] = self._created
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['created'] - stats['idle']
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# 每个数据库文件共享一个连接池（路由中会多次创建 Database 实例）
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """获取数据库文件对应的连接池"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[key] = pool
+        return pool
+
+
+# 日志全文索引（FTS5外部内容表，只索引 message，过滤条件通过连接 spider_logs 完成）
+# 新增日志只能通过 create_log / create_logs_bulk 写入，以便同步到全文索引
+LOG_FTS_TABLE = 'spider_logs_fts'
+# 搜索结果计数的上限，超过时返回的总数为估计值
+LOG_SEARCH_COUNT_LIMIT = 1000
+
+# 游标分页的排序键，与 (spider_id, timestamp) / (spider_id, created_at) 索引的顺序一致
+LOG_CURSOR_KEYS = [('timestamp', 'timestamp'), ('id', 'id')]
+FILE_CURSOR_KEYS = [('created_at', 'created_at'), ('id', 'id')]
+EXECUTION_CURSOR_KEYS = [('started_at', 'started_at'), ('id', 'id')]
+
+# 系统设置默认值（settings 表中 key 为 system 的 JSON）
+DEFAULT_SYSTEM_SETTINGS = {
+    'maxConcurrentSpiders': 3,
+    'defaultTimeout': 30,
+    'defaultRetries': 3,
+    'logRetentionDays': 30,
+    'logArchiveDays': 7,
+    'fileRetentionDays': 90,
+    'apiCallIntervalMinutes': 5,
+    'useZygote': True,
+    # 运行交给独立的 worker 进程（python -m worker）从任务队列领取执行，而不是在 Web 进程内执行
+    'useWorkerProcesses': False,
+    # 单次运行的超时时间（分钟），0 表示不限制；爬虫配置中的 execution_timeout（秒）可单独覆盖
+    'executionTimeoutMinutes': 60,
+    # 爬虫进程的资源限制，0 表示不限制；爬虫配置中的 resource_limits 可单独覆盖
+    'spiderCpuLimitSeconds': 0,
+    'spiderMemoryLimitMB': 0,
+    'spiderMaxOpenFiles': 0,
+    # 条件请求 HTTP 缓存（ETag/Last-Modified），爬虫配置中的 http_cache 可单独关闭或开启跳过未变化页面
+    'httpCacheEnabled': True,
+    'httpCacheMaxMB': 256
+}
+
+# spider_executions 表可写入的列
+EXECUTION_COLUMNS = (
+    'id', 'spider_id', 'trigger_source', 'status', 'started_at', 'finished_at', 'duration', 'exit_code',
+    'stdout_lines', 'stderr_lines', 'output_bytes', 'item_count', 'file_count', 'error_message',
+    'queue_wait', 'cpu_user', 'cpu_system', 'max_rss_kb', 'io_read_blocks', 'io_write_blocks',
+    'parent_execution_id', 'shard_index', 'shard_count', 'http_requests', 'http_connections',
+    'http_not_modified',
+)
+
+
+def _fts5_tokenizer(conn):
+    """选择全文索引分词器
+
+    trigram 分词器按字符三元组建索引，对中文等不以空格分词的文本也能做子串匹配，
+    与原来的 LIKE 搜索语义一致；旧版本 SQLite 不支持时退回 unicode61。
+    """
+    if sqlite3.sqlite_version_info >= (3, 34, 0):
+        return 'trigram'
+    return 'unicode61 remove_diacritics 2'
+
+
+def _migrate_log_fts(conn):
+    """创建日志全文索引、同步触发器并为已有日志建索引"""
+    tokenizer = _fts5_tokenizer(conn)
+    try:
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {LOG_FTS_TABLE} USING fts5(
+                message,
+                content='spider_logs',
+                content_rowid='id',
+                tokenize='{tokenizer}'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite 未编译 FTS5 时跳过，日志搜索继续使用 LIKE
+        logger.warning(f"FTS5 is not available, log search falls back to LIKE: {e}")
+        return
+    
+    # 新增日志由写入路径（create_log / create_logs_bulk）按批同步到索引，
+    # 逐行触发器的写入开销约为批量 INSERT ... SELECT 的数倍；删除和修改仍由触发器同步
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS spider_logs_fts_delete AFTER DELETE ON spider_logs BEGIN
+            INSERT INTO {LOG_FTS_TABLE} ({LOG_FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS spider_logs_fts_update AFTER UPDATE OF message ON spider_logs BEGIN
+            INSERT INTO {LOG_FTS_TABLE} ({LOG_FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message);
+            INSERT INTO {LOG_FTS_TABLE} (rowid, message) VALUES (new.id, new.message);
+        END
+    ''')
+    conn.execute(f"INSERT INTO {LOG_FTS_TABLE} ({LOG_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def search_terms(text):
+    """解析搜索词，返回 (词, 是否短语, 是否前缀) 列表，OR 关键字原样保留为 'OR'
+
+    支持的语法：
+      - 普通词：多个词之间为 AND 关系
+      - "短语"：双引号内按短语匹配
+      - 前缀*：以 * 结尾的词按前缀匹配
+      - OR：两个词之间的 OR 关键字
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text or ''):
+        if word == 'OR':
+            terms.append('OR')
+            continue
+        
+        term = phrase if phrase else word
+        prefix = not phrase and term.endswith('*')
+        term = (term.rstrip('*') if prefix else term).strip()
+        if term:
+            terms.append((term, bool(phrase), prefix))
+    return terms
+
+
+def build_fts_query(text, tokenizer='trigram'):
+    """把用户输入的搜索词转换为 FTS5 MATCH 表达式
+
+    无法用索引表达时（如 trigram 分词下少于3个字符的词）返回 None。
+    """
+    parts = []
+    for term in search_terms(text):
+        if term == 'OR':
+            if parts and parts[-1] != 'OR':
+                parts.append('OR')
+            continue
+        
+        word, _, prefix = term
+        quoted = '"' + word.replace('"', '""') + '"'
+        if tokenizer == 'trigram':
+            # trigram 为子串匹配，前缀查询自然包含在内；少于3个字符无法使用索引
+            if len(word) < 3:
+                return None
+            parts.append(quoted)
+        else:
+            parts.append(quoted + ('*' if prefix else ''))
+    
+    while parts and parts[-1] == 'OR':
+        parts.pop()
+    if not parts:
+        return None
+    return ' '.join(parts)
+
+
+def search_groups(terms):
+    """把 search_terms 的结果按 OR 拆分为若干组（小写），组内各词为 AND 关系，与 FTS5 的优先级一致"""
+    groups = [[]]
+    for term in terms:
+        if term == 'OR':
+            if groups[-1]:
+                groups.append([])
+            continue
+        groups[-1].append(term[0].lower())
+    return [group for group in groups if group]
+
+
+def search_matcher(text):
+    """返回判断日志消息是否匹配搜索词的函数，用于不在数据库中的日志（如归档）
+
+    语义与 trigram 全文索引查询一致：各词、"短语" 和 前缀* 都按不区分大小写的子串匹配，
+    词之间为 AND，OR 连接的各组满足其一即可。没有有效搜索词时返回 None。
+    """
+    groups = search_groups(search_terms(text))
+    if not groups:
+        return None
+    
+    def matches(message):
+        message = (message or '').lower()
+        return any(all(word in message for word in group) for group in groups)
+    return matches
+
+
+def search_like_clause(text, column='message'):
+    """全文索引不可用时与 search_matcher 语义一致的 LIKE 条件，返回 (条件, 参数)，没有有效搜索词时返回 None"""
+    groups = search_groups(search_terms(text))
+    if not groups:
+        return None
+    
+    def escape(word):
+        return word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    
+    clause = ' OR '.join(
+        '(' + ' AND '.join(f"{column} LIKE ? ESCAPE '\\'" for _ in group) + ')' for group in groups
+    )
+    params = [f'%{escape(word)}%' for group in groups for word in group]
+    return f'({clause})', params
+
+
+def highlight_snippet(message, terms, width=120):
+    """截取命中词附近的文本并用 <mark> 标出所有命中（不区分大小写）"""
+    words = [term[0] for term in terms if term != 'OR']
+    if not words or not message:
+        return message
+    
+    pattern = re.compile('|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(message)
+    start = 0
+    if first and len(message) > width:
+        start = max(0, min(first.start() - width // 3, len(message) - width))
+    end = start + width
+    
+    fragment = message[start:end]
+    highlighted = pattern.sub(lambda m: f'<mark>{m.group(0)}</mark>', fragment)
+    return ('…' if start > 0 else '') + highlighted + ('…' if end < len(message) else '')
+
+
+# 数据库结构迁移：(版本号, 说明, SQL语句列表或接收连接的函数)
+# 已应用的版本记录在 PRAGMA user_version 中，只追加新迁移，不要修改已发布的迁移
+SCHEMA_MIGRATIONS = [
+    (1, 'create base tables', [
+        # 爬虫表
+        '''
+        CREATE TABLE IF NOT EXISTS spiders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            code TEXT NOT NULL,
+            status TEXT DEFAULT 'inactive',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_run_at TEXT,
+            run_count INTEGER DEFAULT 0,
+            success_count INTEGER DEFAULT 0,
+            error_count INTEGER DEFAULT 0,
+            config TEXT DEFAULT '{}'
+        )
+        ''',
+        # 爬虫日志表
+        '''
+        CREATE TABLE IF NOT EXISTS spider_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spider_id INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+            source TEXT,
+            execution_id TEXT,
+            FOREIGN KEY (spider_id) REFERENCES spiders (id) ON DELETE CASCADE
+        )
+        ''',
+        # 爬虫文件表
+        '''
+        CREATE TABLE IF NOT EXISTS spider_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spider_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_type TEXT,
+            file_size INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            description TEXT,
+            tags TEXT,
+            execution_id TEXT,
+            FOREIGN KEY (spider_id) REFERENCES spiders (id) ON DELETE CASCADE
+        )
+        ''',
+        # 设置表
+        '''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (2, 'add log and file indexes', [
+        # 日志列表/导出/统计按 spider_id + 时间范围查询
+        'CREATE INDEX IF NOT EXISTS idx_spider_logs_spider_time ON spider_logs (spider_id, timestamp)',
+        # 按执行ID过滤日志
+        'CREATE INDEX IF NOT EXISTS idx_spider_logs_execution ON spider_logs (execution_id)',
+        # 按级别过滤和分组统计，附带时间列以覆盖日期范围条件
+        'CREATE INDEX IF NOT EXISTS idx_spider_logs_spider_level ON spider_logs (spider_id, level, timestamp)',
+        # 监控面板按时间范围统计所有爬虫
+        'CREATE INDEX IF NOT EXISTS idx_spider_logs_time ON spider_logs (timestamp)',
+        # 文件列表按创建时间排序
+        'CREATE INDEX IF NOT EXISTS idx_spider_files_spider_created ON spider_files (spider_id, created_at)',
+        # 扫描输出文件时按路径查重
+        'CREATE INDEX IF NOT EXISTS idx_spider_files_spider_path ON spider_files (spider_id, file_path)',
+        'ANALYZE',
+    ]),
+    (3, 'add log message full-text index', _migrate_log_fts),
+    (4, 'add hourly run statistics rollup', [
+        # 按 (爬虫, 小时) 汇总的运行统计，由运行器在开始/结束时增量更新；hour 为本地时间的整点
+        '''
+        CREATE TABLE IF NOT EXISTS spider_run_stats (
+            spider_id INTEGER NOT NULL,
+            hour TEXT NOT NULL,
+            run_count INTEGER NOT NULL DEFAULT 0,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            error_count INTEGER NOT NULL DEFAULT 0,
+            api_call_count INTEGER NOT NULL DEFAULT 0,
+            total_duration REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (spider_id, hour)
+        ) WITHOUT ROWID
+        ''',
+        # 监控面板按时间范围汇总所有爬虫
+        'CREATE INDEX IF NOT EXISTS idx_spider_run_stats_hour ON spider_run_stats (hour)',
+        # 根据运行器和API调用写入的固定格式日志回填历史数据（日志时间为UTC）
+        '''
+        INSERT INTO spider_run_stats (spider_id, hour, run_count, success_count, error_count, api_call_count)
+        SELECT spider_id, hour, SUM(is_run), SUM(is_success), SUM(is_error), SUM(is_api_call)
+        FROM (
+            SELECT
+                spider_id,
+                strftime('%Y-%m-%d %H:00:00', timestamp, 'localtime') AS hour,
+                (source = 'spider_runner' AND message LIKE 'Spider "%" started with execution ID: %')
+                    OR (source = 'api_call' AND message LIKE 'API调用开始%') AS is_run,
+                (source = 'spider_runner' AND message LIKE 'Spider "%" completed successfully')
+                    OR (source = 'api_call' AND message LIKE 'API调用成功%') AS is_success,
+                (source = 'spider_runner' AND (message LIKE 'Spider "%" failed with exit code %'
+                                               OR message LIKE 'Spider "%" execution failed:%'))
+                    OR (source = 'api_call' AND message LIKE 'API调用失败%') AS is_error,
+                (source = 'api_call' AND message LIKE 'API调用开始%') AS is_api_call
+            FROM spider_logs
+            WHERE source IN ('spider_runner', 'api_call')
+        )
+        WHERE is_run OR is_success OR is_error
+        GROUP BY spider_id, hour
+        ''',
+    ]),
+    (5, 'add spider executions table', [
+        # 每次运行结束时写入一行，时间为UTC，与其他表的 CURRENT_TIMESTAMP 一致
+        '''
+        CREATE TABLE IF NOT EXISTS spider_executions (
+            id TEXT PRIMARY KEY,
+            spider_id INTEGER NOT NULL,
+            trigger_source TEXT NOT NULL DEFAULT 'manual',
+            status TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            duration REAL,
+            exit_code INTEGER,
+            stdout_lines INTEGER NOT NULL DEFAULT 0,
+            stderr_lines INTEGER NOT NULL DEFAULT 0,
+            output_bytes INTEGER NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            file_count INTEGER NOT NULL DEFAULT 0,
+            error_message TEXT,
+            FOREIGN KEY (spider_id) REFERENCES spiders (id) ON DELETE CASCADE
+        )
+        ''',
+        # 运行历史按爬虫和开始时间倒序分页
+        'CREATE INDEX IF NOT EXISTS idx_spider_executions_spider_started ON spider_executions (spider_id, started_at)',
+    ]),
+    (6, 'add execution queue wait time', [
+        # 从提交运行到工作线程开始执行之间的排队时间（秒）
+        'ALTER TABLE spider_executions ADD COLUMN queue_wait REAL NOT NULL DEFAULT 0',
+    ]),
+    (7, 'add execution resource usage', [
+        # 爬虫进程的资源用量（wait4 的 rusage）：CPU 秒数、峰值常驻内存（KB）、块设备读写次数
+        'ALTER TABLE spider_executions ADD COLUMN cpu_user REAL',
+        'ALTER TABLE spider_executions ADD COLUMN cpu_system REAL',
+        'ALTER TABLE spider_executions ADD COLUMN max_rss_kb INTEGER',
+        'ALTER TABLE spider_executions ADD COLUMN io_read_blocks INTEGER',
+        'ALTER TABLE spider_executions ADD COLUMN io_write_blocks INTEGER',
+    ]),
+    (8, 'add durable job queue', [
+        # 由独立 worker 进程执行的运行；lease_expires_at / heartbeat_at 为 Unix 时间戳
+        '''
+        CREATE TABLE IF NOT EXISTS job_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            execution_id TEXT NOT NULL UNIQUE,
+            spider_id INTEGER NOT NULL,
+            trigger_source TEXT NOT NULL DEFAULT 'manual',
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            worker_id TEXT,
+            lease_expires_at REAL,
+            heartbeat_at REAL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY (spider_id) REFERENCES spiders (id) ON DELETE CASCADE
+        )
+        ''',
+        # 领取任务按 (优先级, 提交顺序) 取排队中的第一条
+        'CREATE INDEX IF NOT EXISTS idx_job_queue_status_priority ON job_queue (status, priority, id)',
+        'CREATE INDEX IF NOT EXISTS idx_job_queue_spider_status ON job_queue (spider_id, status)',
+    ]),
+    (9, 'add sharded execution columns', [
+        # 分片运行中每个分片一条执行记录，指向汇总所有分片的父执行
+        'ALTER TABLE spider_executions ADD COLUMN parent_execution_id TEXT',
+        'ALTER TABLE spider_executions ADD COLUMN shard_index INTEGER',
+        'ALTER TABLE spider_executions ADD COLUMN shard_count INTEGER',
+        'CREATE INDEX IF NOT EXISTS idx_spider_executions_parent ON spider_executions (parent_execution_id)',
+    ]),
+    (10, 'add http session columns', [
+        # 共享 HTTP 会话发出的请求数和新建的连接数，两者之差为复用连接的请求数
+        'ALTER TABLE spider_executions ADD COLUMN http_requests INTEGER',
+        'ALTER TABLE spider_executions ADD COLUMN http_connections INTEGER',
+    ]),
+    (11, 'add http cache column', [
+        # 条件请求中服务器返回 304、使用缓存正文的次数
+        'ALTER TABLE spider_executions ADD COLUMN http_not_modified INTEGER',
+    ]),
+]
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """读取数据库当前的结构版本"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn, target_version=None):
+    """将数据库升级到目标版本（默认最新），返回已应用的版本列表
+
+    每个迁移在单独的事务中执行，并在同一事务内更新 user_version，
+    因此中途失败不会留下半完成的版本；多个进程同时启动时，
+    BEGIN IMMEDIATE 保证同一迁移只会被执行一次。
+    """
+    if target_version is None:
+        target_version = SCHEMA_VERSION
+    
+    applied = []
+    for version, description, steps in SCHEMA_MIGRATIONS:
+        if version > target_version:
+            break
+        if get_schema_version(conn) >= version:
+            continue
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 获取写锁后再检查一次，其他进程可能已经完成了该迁移
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            
+            if callable(steps):
+                steps(conn)
+            else:
+                for statement in steps:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"Database migration {version} ({description}) failed")
+            raise
+        
+        logger.info(f"Applied database migration {version}: {description}")
+        applied.append(version)
+    
+    return applied
+
+
 class Database:
     def __init__(self, db_path='spider_management.db'):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
         self.init_database()
     
     def init_database(self):
-        """初始化数据库表"""
+        """初始化数据库表并执行未应用的结构迁移"""
+        # 同一进程内每个数据库文件只需检查一次
+        if self.pool.schema_ready:
+            return
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 创建爬虫表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS spiders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE,
-                    description TEXT,
-                    code TEXT NOT NULL,
-                    status TEXT DEFAULT 'inactive',
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    last_run_at TEXT,
-                    run_count INTEGER DEFAULT 0,
-                    success_count INTEGER DEFAULT 0,
-                    error_count INTEGER DEFAULT 0,
-                    config TEXT DEFAULT '{}'
-                )
-            ''')
-            
-            # 创建爬虫日志表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS spider_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    spider_id INTEGER NOT NULL,
-                    level TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    source TEXT,
-                    execution_id TEXT,
-                    FOREIGN KEY (spider_id) REFERENCES spiders (id) ON DELETE CASCADE
-                )
-            ''')
-            
-            # 创建爬虫文件表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS spider_files (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    spider_id INTEGER NOT NULL,
-                    filename TEXT NOT NULL,
-                    file_path TEXT NOT NULL,
-                    file_type TEXT,
-                    file_size INTEGER DEFAULT 0,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    description TEXT,
-                    tags TEXT,
-                    execution_id TEXT,
-                    FOREIGN KEY (spider_id) REFERENCES spiders (id) ON DELETE CASCADE
-                )
-            ''')
-            
-            # 创建设置表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-            logger.info("Database tables created successfully")
+            applied = run_migrations(conn)
+        
+        self.pool.schema_ready = True
+        if applied:
+            logger.info(f"Database upgraded to schema version {SCHEMA_VERSION}")
     
-    @contextmanager
     def get_connection(self):
-        """获取数据库连接的上下文管理器"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
-        try:
-            yield conn
-        finally:
-            conn.close()
+        """从连接池获取数据库连接的上下文管理器"""
+        return self.pool.connection()
+    
+    def get_pool_stats(self):
+        """获取连接池指标"""
+        return self.pool.stats()
     
     # 爬虫相关操作
     def create_spider(self, name, description, code, config=None):
@@ -146,8 +718,11 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM spiders WHERE id = ?', (spider_id,))
+            deleted = cursor.rowcount > 0
+            cursor.execute('DELETE FROM spider_run_stats WHERE spider_id = ?', (spider_id,))
+            cursor.execute('DELETE FROM spider_executions WHERE spider_id = ?', (spider_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            return deleted
     
     def update_spider_status(self, spider_id, status):
         """更新爬虫状态"""
@@ -217,7 +792,7 @@ class Database:
                 params.append(datetime.now().isoformat())
                 params.append(spider_id)
                 
-                sql = f'UPDATE spiders SET {', '.join(updates)} WHERE id = ?'
+                sql = f'UPDATE spiders SET {", ".join(updates)} WHERE id = ?'
                 cursor.execute(sql, params)
                 conn.commit()
                 return cursor.rowcount > 0
@@ -233,9 +808,63 @@ class Database:
                 INSERT INTO spider_logs (spider_id, level, message, source, execution_id)
                 VALUES (?, ?, ?, ?, ?)
             ''', (spider_id, level, message, source, execution_id))
+            if self.get_log_fts_tokenizer():
+                cursor.execute(
+                    f'INSERT INTO {LOG_FTS_TABLE} (rowid, message) VALUES (?, ?)',
+                    (cursor.lastrowid, message)
+                )
             conn.commit()
             return cursor.lastrowid
     
+    def create_logs_bulk(self, records, chunk_size=LOG_BULK_CHUNK_SIZE):
+        """批量创建日志
+        
+        records 为 (spider_id, level, message, source, execution_id) 元组或
+        包含同名键的字典。每 chunk_size 行用一次 executemany 写入并提交，
+        避免逐行提交，也避免超大事务长时间占用写锁。返回写入的行数。
+        """
+        total = 0
+        chunk = []
+        with self.get_connection() as conn:
+            for record in records:
+                if isinstance(record, dict):
+                    record = (
+                        record['spider_id'],
+                        record['level'],
+                        record['message'],
+                        record.get('source'),
+                        record.get('execution_id')
+                    )
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    total += self._insert_log_chunk(conn, chunk)
+                    chunk = []
+            if chunk:
+                total += self._insert_log_chunk(conn, chunk)
+        return total
+    
+    def _insert_log_chunk(self, conn, chunk):
+        """在一个事务中写入一批日志并同步全文索引"""
+        index_fts = self.get_log_fts_tokenizer()
+        try:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM spider_logs').fetchone()[0]
+            conn.executemany('''
+                INSERT INTO spider_logs (spider_id, level, message, source, execution_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', chunk)
+            if index_fts:
+                conn.execute(
+                    f'INSERT INTO {LOG_FTS_TABLE} (rowid, message) SELECT id, message FROM spider_logs WHERE id > ?',
+                    (last_id,)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(chunk)
+    
     def get_spider_logs(self, spider_id, limit=100, offset=0):
         """获取爬虫日志"""
         with self.get_connection() as conn:
@@ -243,7 +872,7 @@ class Database:
             cursor.execute('''
                 SELECT * FROM spider_logs 
                 WHERE spider_id = ? 
-                ORDER BY timestamp DESC 
+                ORDER BY timestamp DESC, id DESC 
                 LIMIT ? OFFSET ?
             ''', (spider_id, limit, offset))
             rows = cursor.fetchall()
@@ -257,19 +886,483 @@ class Database:
                 SELECT l.*, s.name as spider_name 
                 FROM spider_logs l 
                 LEFT JOIN spiders s ON l.spider_id = s.id 
-                ORDER BY l.timestamp DESC 
+                ORDER BY l.timestamp DESC, l.id DESC 
                 LIMIT ? OFFSET ?
             ''', (limit, offset))
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
     
-    def delete_spider_logs(self, spider_id):
-        """删除爬虫日志"""
+    def get_system_settings(self):
+        """读取系统设置，未保存的项使用默认值"""
+        settings = dict(DEFAULT_SYSTEM_SETTINGS)
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT value FROM settings WHERE key = ?', ('system',)).fetchone()
+        if row:
+            try:
+                settings.update(json.loads(row[0]))
+            except ValueError:
+                logger.warning("Invalid system settings JSON, using defaults")
+        return settings
+    
+    # 运行统计相关操作
+    def record_run_stats(self, spider_id, runs=0, successes=0, errors=0, api_calls=0, duration=0.0, at=None):
+        """把一次运行的计数累加到所在小时的统计行"""
+        hour = (at or datetime.now()).strftime('%Y-%m-%d %H:00:00')
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO spider_run_stats
+                    (spider_id, hour, run_count, success_count, error_count, api_call_count, total_duration)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (spider_id, hour) DO UPDATE SET
+                    run_count = run_count + excluded.run_count,
+                    success_count = success_count + excluded.success_count,
+                    error_count = error_count + excluded.error_count,
+                    api_call_count = api_call_count + excluded.api_call_count,
+                    total_duration = total_duration + excluded.total_duration
+            ''', (spider_id, hour, runs, successes, errors, api_calls, duration))
+            conn.commit()
+    
+    def get_hourly_run_stats(self, start_time, end_time=None, spider_id=None):
+        """按小时读取运行统计（spider_id 为空时汇总所有爬虫）"""
+        conditions = ['hour >= ?']
+        params = [start_time.strftime('%Y-%m-%d %H:00:00')]
+        if end_time:
+            conditions.append('hour <= ?')
+            params.append(end_time.strftime('%Y-%m-%d %H:00:00'))
+        if spider_id is not None:
+            conditions.append('spider_id = ?')
+            params.append(spider_id)
+        
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM spider_logs WHERE spider_id = ?', (spider_id,))
+            cursor.execute(f'''
+                SELECT hour,
+                       SUM(run_count) as run_count,
+                       SUM(success_count) as success_count,
+                       SUM(error_count) as error_count,
+                       SUM(api_call_count) as api_call_count,
+                       SUM(total_duration) as total_duration
+                FROM spider_run_stats
+                WHERE {' AND '.join(conditions)}
+                GROUP BY hour
+                ORDER BY hour
+            ''', params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    # 执行记录相关操作
+    def create_execution(self, **fields):
+        """写入一次运行的执行记录"""
+        columns = [column for column in EXECUTION_COLUMNS if column in fields]
+        with self.get_connection() as conn:
+            conn.execute(
+                f"INSERT INTO spider_executions ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [fields[column] for column in columns]
+            )
             conn.commit()
-            return cursor.rowcount
+    
+    def get_execution(self, execution_id):
+        """获取单条执行记录"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM spider_executions WHERE id = ?', (execution_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def get_shard_executions(self, parent_execution_id):
+        """获取分片运行中各分片的执行记录"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                'SELECT * FROM spider_executions WHERE parent_execution_id = ? ORDER BY shard_index',
+                (parent_execution_id,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_spider_executions_page(self, spider_id, limit=20, cursor=None, status=None, trigger_source=None):
+        """按开始时间倒序分页获取执行记录（分片运行只列出父执行），返回 (记录列表, next_cursor, prev_cursor)"""
+        conditions = ['spider_id = ?', 'parent_execution_id IS NULL']
+        params = [spider_id]
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if trigger_source:
+            conditions.append('trigger_source = ?')
+            params.append(trigger_source)
+        
+        with self.get_connection() as conn:
+            return keyset_page(
+                conn, 'SELECT * FROM spider_executions', conditions, params,
+                EXECUTION_CURSOR_KEYS, limit, cursor
+            )
+    
+    def get_execution_usage_summary(self, since, limit=20):
+        """按爬虫汇总 since（UTC 字符串）之后运行的资源用量，按总 CPU 时间倒序"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT e.spider_id, s.name,
+                       COUNT(*) AS run_count,
+                       SUM(COALESCE(e.cpu_user, 0) + COALESCE(e.cpu_system, 0)) AS total_cpu,
+                       AVG(e.cpu_user + e.cpu_system) AS avg_cpu,
+                       MAX(e.max_rss_kb) AS peak_rss_kb,
+                       AVG(e.max_rss_kb) AS avg_rss_kb,
+                       SUM(COALESCE(e.io_read_blocks, 0)) AS io_read_blocks,
+                       SUM(COALESCE(e.io_write_blocks, 0)) AS io_write_blocks,
+                       SUM(COALESCE(e.duration, 0)) AS total_duration
+                FROM spider_executions e
+                LEFT JOIN spiders s ON s.id = e.spider_id
+                WHERE e.started_at >= ? AND e.cpu_user IS NOT NULL AND e.parent_execution_id IS NULL
+                GROUP BY e.spider_id
+                ORDER BY total_cpu DESC
+                LIMIT ?
+            ''', (since, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    # 任务队列相关操作（由 worker 进程执行的运行）
+    def enqueue_job(self, spider_id, execution_id, trigger_source='manual', priority=0, max_attempts=JOB_MAX_ATTEMPTS):
+        """提交一个运行任务"""
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO job_queue (execution_id, spider_id, trigger_source, priority, max_attempts)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (execution_id, spider_id, trigger_source, priority, max_attempts))
+            conn.commit()
+    
+    def claim_job(self, worker_id, lease_seconds):
+        """领取优先级最高的排队任务并加租约，没有任务时返回 None
+
+        BEGIN IMMEDIATE 保证多个 worker 进程同时领取时同一任务只会被一个 worker 领到。
+        """
+        now = time.time()
+        with self.get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('''
+                    SELECT * FROM job_queue
+                    WHERE status = 'queued'
+                    ORDER BY priority, id
+                    LIMIT 1
+                ''').fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                conn.execute('''
+                    UPDATE job_queue
+                    SET status = 'leased', worker_id = ?, attempts = attempts + 1,
+                        lease_expires_at = ?, heartbeat_at = ?, started_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (worker_id, now + lease_seconds, now, row['id']))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        job = dict(row)
+        job.update(status='leased', worker_id=worker_id, attempts=job['attempts'] + 1)
+        return job
+    
+    def heartbeat_job(self, job_id, worker_id, lease_seconds):
+        """续租，返回 (是否仍持有租约, 是否已请求取消)"""
+        now = time.time()
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE job_queue SET lease_expires_at = ?, heartbeat_at = ?
+                WHERE id = ? AND worker_id = ? AND status = 'leased'
+            ''', (now + lease_seconds, now, job_id, worker_id))
+            conn.commit()
+            if cursor.rowcount == 0:
+                return False, False
+            row = conn.execute('SELECT cancel_requested FROM job_queue WHERE id = ?', (job_id,)).fetchone()
+            return True, bool(row['cancel_requested'])
+    
+    def finish_job(self, job_id, worker_id, status, result=None):
+        """结束任务（status 为 done/failed/cancelled），租约已被收回时返回 False"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE job_queue
+                SET status = ?, result = ?, lease_expires_at = NULL, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND worker_id = ? AND status = 'leased'
+            ''', (status, result, job_id, worker_id))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def cancel_job(self, execution_id):
+        """取消任务：排队中的直接取消，执行中的标记取消请求由 worker 在心跳时终止
+
+        返回取消前的任务状态，任务不存在或已结束时返回 None。
+        """
+        with self.get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT status FROM job_queue WHERE execution_id = ? AND status IN ('queued', 'leased')",
+                    (execution_id,)
+                ).fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                if row['status'] == 'queued':
+                    conn.execute('''
+                        UPDATE job_queue SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+                        WHERE execution_id = ?
+                    ''', (execution_id,))
+                else:
+                    conn.execute('UPDATE job_queue SET cancel_requested = 1 WHERE execution_id = ?', (execution_id,))
+                conn.commit()
+                return row['status']
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def requeue_expired_jobs(self):
+        """收回租约过期的任务（worker 崩溃或失联）：未超过重试次数的重新排队，否则标记失败
+
+        返回标记为失败的任务列表。
+        """
+        now = time.time()
+        with self.get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                expired = [dict(row) for row in conn.execute(
+                    "SELECT * FROM job_queue WHERE status = 'leased' AND lease_expires_at < ?", (now,)
+                )]
+                failed = []
+                for job in expired:
+                    if job['cancel_requested'] or job['attempts'] >= job['max_attempts']:
+                        status = 'cancelled' if job['cancel_requested'] else 'failed'
+                        conn.execute('''
+                            UPDATE job_queue SET status = ?, lease_expires_at = NULL, finished_at = CURRENT_TIMESTAMP,
+                                result = 'lease expired'
+                            WHERE id = ?
+                        ''', (status, job['id']))
+                        job['status'] = status
+                        failed.append(job)
+                    else:
+                        conn.execute('''
+                            UPDATE job_queue SET status = 'queued', worker_id = NULL, lease_expires_at = NULL
+                            WHERE id = ?
+                        ''', (job['id'],))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if expired:
+            logger.warning(f"Reclaimed {len(expired)} expired job leases ({len(failed)} given up)")
+        return failed
+    
+    def get_job(self, execution_id):
+        """按执行ID获取任务"""
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT * FROM job_queue WHERE execution_id = ?', (execution_id,)).fetchone()
+            return dict(row) if row else None
+    
+    def get_active_job(self, spider_id):
+        """获取爬虫排队中或执行中的任务"""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT * FROM job_queue WHERE spider_id = ? AND status IN ('queued', 'leased')
+                ORDER BY id LIMIT 1
+            ''', (spider_id,)).fetchone()
+            return dict(row) if row else None
+    
+    def get_active_jobs(self):
+        """获取所有排队中和执行中的任务"""
+        with self.get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM job_queue WHERE status IN ('queued', 'leased') ORDER BY priority, id")
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_execution_logs_after(self, execution_id, after_id=0, limit=500):
+        """按 id 顺序获取某次运行 id 大于 after_id 的日志（用于轮询推送）"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM spider_logs WHERE execution_id = ? AND id > ?
+                ORDER BY id LIMIT ?
+            ''', (execution_id, after_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_job_queue_stats(self):
+        """任务队列各状态的任务数和在线的 worker 数"""
+        with self.get_connection() as conn:
+            counts = {row['status']: row['count'] for row in conn.execute(
+                'SELECT status, COUNT(*) AS count FROM job_queue GROUP BY status'
+            )}
+            workers = conn.execute(
+                "SELECT COUNT(DISTINCT worker_id) FROM job_queue WHERE status = 'leased' AND lease_expires_at >= ?",
+                (time.time(),)
+            ).fetchone()[0]
+        return {'counts': counts, 'busy_workers': workers}
+    
+    def get_log_fts_tokenizer(self):
+        """返回日志全文索引使用的分词器，不可用时返回 None"""
+        if self.pool.fts_tokenizer is None:
+            with self.get_connection() as conn:
+                row = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (LOG_FTS_TABLE,)
+                ).fetchone()
+            if not row:
+                self.pool.fts_tokenizer = ''
+            elif 'trigram' in row[0]:
+                self.pool.fts_tokenizer = 'trigram'
+            else:
+                self.pool.fts_tokenizer = 'unicode61'
+        return self.pool.fts_tokenizer or None
+    
+    def rebuild_log_fts(self):
+        """根据 spider_logs 重建日志全文索引（绕过 create_log / create_logs_bulk 直接写入日志后使用）"""
+        if not self.get_log_fts_tokenizer():
+            return
+        with self.get_connection() as conn:
+            conn.execute(f"INSERT INTO {LOG_FTS_TABLE} ({LOG_FTS_TABLE}) VALUES ('rebuild')")
+            conn.commit()
+    
+    def _log_search_query(self, spider_id, text, level=None, source=None, execution_id=None,
+                          start_date=None, end_date=None):
+        """全文搜索的 (FROM 子句, 条件列表, 参数)，全文索引不可用或搜索词无法用索引表达时返回 None"""
+        tokenizer = self.get_log_fts_tokenizer()
+        if not tokenizer:
+            return None
+        match = build_fts_query(text, tokenizer)
+        if not match:
+            return None
+        
+        conditions = [f'{LOG_FTS_TABLE} MATCH ?', 'l.spider_id = ?']
+        params = [match, spider_id]
+        for column, value in (('l.level', level), ('l.source', source), ('l.execution_id', execution_id)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if start_date:
+            conditions.append('l.timestamp >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('l.timestamp <= ?')
+            params.append(end_date)
+        # CROSS JOIN 固定由全文索引驱动连接，避免按 spider_id 遍历日志后逐行匹配
+        from_clause = f'{LOG_FTS_TABLE} CROSS JOIN spider_logs l ON l.id = {LOG_FTS_TABLE}.rowid'
+        return from_clause, conditions, params
+    
+    def search_log_rows(self, spider_id, text, direction='next', before=None, count=50, level=None,
+                        source=None, execution_id=None, start_date=None, end_date=None):
+        """按写入顺序读取全文搜索匹配的日志（附带高亮片段），用于与归档日志合并分页
+        
+        before 为游标的 (timestamp, id) 排序键，next 方向读取更早的行，prev 方向读取更新的行。
+        日志ID按写入顺序递增，只按ID比较即可在取满 count 行后提前结束。
+        全文索引不可用或搜索词无法用索引表达时返回 None。
+        """
+        query = self._log_search_query(spider_id, text, level, source, execution_id, start_date, end_date)
+        if query is None:
+            return None
+        from_clause, conditions, params = query
+        try:
+            with self.get_connection() as conn:
+                rows = keyset_rows(
+                    conn, f'SELECT l.* FROM {from_clause}', conditions, params,
+                    [(f'{LOG_FTS_TABLE}.rowid', 'id')], direction,
+                    [before[-1]] if before else None, count
+                )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text log search failed for {text!r}: {e}")
+            return None
+        terms = search_terms(text)
+        for row in rows:
+            row['snippet'] = highlight_snippet(row['message'], terms)
+        return rows
+    
+    def search_logs(self, spider_id, text, level=None, source=None, execution_id=None,
+                    start_date=None, end_date=None, limit=50, offset=0, order='time',
+                    cursor=None, include_total=True):
+        """全文搜索爬虫日志
+        
+        返回 {'logs', 'total', 'total_capped', 'next_cursor', 'prev_cursor'}，每条日志附带高亮片段 snippet；
+        order 为 'relevance' 时按相关度排序（并附带 bm25 相关度 rank），否则按写入顺序（即时间）倒序。
+        按时间排序且传入 cursor（首页为空字符串）时使用游标分页，忽略 offset。
+        计数最多统计 LOG_SEARCH_COUNT_LIMIT 条，避免常见词每次请求都遍历全部匹配；include_total 为 False 时不计数。
+        全文索引不可用或搜索词无法用索引表达时返回 None，由调用方退回 LIKE 查询。
+        """
+        query = self._log_search_query(spider_id, text, level, source, execution_id, start_date, end_date)
+        if query is None:
+            return None
+        from_clause, conditions, params = query
+        where_clause = ' AND '.join(conditions)
+        if order == 'relevance':
+            rank_column = f', bm25({LOG_FTS_TABLE}) AS rank'
+            order_clause = f'{LOG_FTS_TABLE}.rank'
+        else:
+            # 日志ID按写入顺序递增，按索引的 rowid 倒序可以在取满一页后提前结束
+            rank_column = ''
+            order_clause = f'{LOG_FTS_TABLE}.rowid DESC'
+        
+        total = None
+        capped = False
+        next_cursor = prev_cursor = None
+        try:
+            with self.get_connection() as conn:
+                cursor_obj = conn.cursor()
+                if include_total:
+                    cursor_obj.execute(
+                        f'SELECT COUNT(*) FROM (SELECT 1 FROM {from_clause} WHERE {where_clause} LIMIT ?)',
+                        params + [LOG_SEARCH_COUNT_LIMIT + 1]
+                    )
+                    total = cursor_obj.fetchone()[0]
+                    capped = total > LOG_SEARCH_COUNT_LIMIT
+                    if capped:
+                        total = LOG_SEARCH_COUNT_LIMIT
+                
+                if cursor is not None and order != 'relevance':
+                    rows, next_cursor, prev_cursor = keyset_page(
+                        conn, f'SELECT l.* FROM {from_clause}', conditions, params,
+                        [(f'{LOG_FTS_TABLE}.rowid', 'id')], limit, cursor
+                    )
+                else:
+                    cursor_obj.execute(f'''
+                        SELECT l.*{rank_column} FROM {from_clause}
+                        WHERE {where_clause}
+                        ORDER BY {order_clause}
+                        LIMIT ? OFFSET ?
+                    ''', params + [limit, offset])
+                    rows = [dict(row) for row in cursor_obj.fetchall()]
+        except sqlite3.OperationalError as e:
+            # MATCH 表达式语法错误等情况
+            logger.warning(f"Full-text log search failed for {text!r}: {e}")
+            return None
+        
+        # 高亮片段在 Python 中生成：FTS5 的 snippet() 对常见词需要逐行定位位置列表，代价很高
+        terms = search_terms(text)
+        for row in rows:
+            row['snippet'] = highlight_snippet(row['message'], terms)
+        
+        return {
+            'logs': rows,
+            'total': total,
+            'total_capped': capped,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        }
+    
+    def delete_in_batches(self, table, where='1', params=(), batch_size=DELETE_BATCH_SIZE, pause=0, throttle=None):
+        """分批删除满足条件的行，返回删除总数
+        
+        每批在单独的短事务中提交，批次之间释放写锁，避免一次大 DELETE 长时间阻塞日志写入；
+        pause 为批次间的停顿秒数，throttle 为每批之后调用的回调（可在其中等待）。
+        只用于有 rowid 的表，table 和 where 必须来自代码而不是用户输入。
+        """
+        total = 0
+        with self.get_connection() as conn:
+            while True:
+                cursor = conn.execute(
+                    f'DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)',
+                    list(params) + [batch_size]
+                )
+                conn.commit()
+                total += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+                if throttle:
+                    throttle()
+                if pause:
+                    time.sleep(pause)
+        return total
+    
+    def delete_spider_logs(self, spider_id):
+        """删除爬虫日志"""
+        return self.delete_in_batches('spider_logs', 'spider_id = ?', (spider_id,))
     
     # 文件相关操作
     def create_file(self, spider_id, filename, file_path, file_type=None, description=None, execution_id=None):
@@ -304,7 +1397,7 @@ class Database:
             cursor.execute('''
                 SELECT * FROM spider_files 
                 WHERE spider_id = ? 
-                ORDER BY created_at DESC
+                ORDER BY created_at DESC, id DESC
             ''', (spider_id,))
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
@@ -335,11 +1428,7 @@ class Database:
     
     def delete_spider_files(self, spider_id):
         """删除爬虫文件"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM spider_files WHERE spider_id = ?', (spider_id,))
-            conn.commit()
-            return cursor.rowcount
+        return self.delete_in_batches('spider_files', 'spider_id = ?', (spider_id,))
 
 # 全局数据库实例
 db = Database()
@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
-from database import Database
+from database import Database, FILE_CURSOR_KEYS
+from utils.pagination import keyset_page, parse_bool, InvalidCursor
 
 file_bp = Blueprint('file', __name__)
 
@@ -55,27 +56,42 @@ def get_spider_files(spider_id):
         
         where_clause = ' AND '.join(conditions)
         
+        # 传入 cursor 参数（首页为空字符串）时使用游标分页，总数默认不计算
+        cursor_token = request.args.get('cursor')
+        use_cursor = cursor_token is not None
+        include_total = parse_bool(request.args.get('include_total'), not use_cursor)
+        
         # 获取总数
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            count_query = f'SELECT COUNT(*) FROM spider_files WHERE {where_clause}'
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
+        total = None
+        if include_total:
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                count_query = f'SELECT COUNT(*) FROM spider_files WHERE {where_clause}'
+                cursor.execute(count_query, params)
+                total = cursor.fetchone()[0]
         
         # 获取分页数据
-        offset = (page - 1) * per_page
-        query = f'''
-            SELECT * FROM spider_files 
-            WHERE {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        '''
-        params.extend([per_page, offset])
-        
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            files_data = cursor.fetchall()
+        next_cursor = prev_cursor = None
+        if use_cursor:
+            with db.get_connection() as conn:
+                files_data, next_cursor, prev_cursor = keyset_page(
+                    conn, 'SELECT * FROM spider_files', conditions, params,
+                    FILE_CURSOR_KEYS, per_page, cursor_token
+                )
+        else:
+            offset = (page - 1) * per_page
+            query = f'''
+                SELECT * FROM spider_files 
+                WHERE {where_clause}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ? OFFSET ?
+            '''
+            params.extend([per_page, offset])
+            
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                files_data = cursor.fetchall()
         
         files = []
         for file_data in files_data:
@@ -114,13 +130,10 @@ def get_spider_files(spider_id):
         
         return jsonify({
             'files': files,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            }
+            'pagination': _build_pagination(page, per_page, total, use_cursor, next_cursor, prev_cursor)
         })
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -521,6 +534,23 @@ def batch_delete_files(spider_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _build_pagination(page, per_page, total, use_cursor, next_cursor=None, prev_cursor=None):
+    """构建分页信息，未计算总数时 total 和 pages 为 None"""
+    if use_cursor:
+        return {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
+        }
+    return {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page if total is not None else None
+    }
+
 def _format_file_size(size_bytes):
     """格式化文件大小"""
     if size_bytes == 0:
@@ -796,27 +826,42 @@ def search_files(spider_id):
         
         where_clause = ' AND '.join(conditions)
         
+        # 传入 cursor 参数（首页为空字符串）时使用游标分页，总数默认不计算
+        cursor_token = request.args.get('cursor')
+        use_cursor = cursor_token is not None
+        include_total = parse_bool(request.args.get('include_total'), not use_cursor)
+        
         # 获取总数
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            count_query = f'SELECT COUNT(*) FROM spider_files WHERE {where_clause}'
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
+        total = None
+        if include_total:
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                count_query = f'SELECT COUNT(*) FROM spider_files WHERE {where_clause}'
+                cursor.execute(count_query, params)
+                total = cursor.fetchone()[0]
         
         # 获取分页数据
-        offset = (page - 1) * per_page
-        query_sql = f'''
-            SELECT * FROM spider_files 
-            WHERE {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        '''
-        params.extend([per_page, offset])
-        
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query_sql, params)
-            files_data = cursor.fetchall()
+        next_cursor = prev_cursor = None
+        if use_cursor:
+            with db.get_connection() as conn:
+                files_data, next_cursor, prev_cursor = keyset_page(
+                    conn, 'SELECT * FROM spider_files', conditions, params,
+                    FILE_CURSOR_KEYS, per_page, cursor_token
+                )
+        else:
+            offset = (page - 1) * per_page
+            query_sql = f'''
+                SELECT * FROM spider_files 
+                WHERE {where_clause}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ? OFFSET ?
+            '''
+            params.extend([per_page, offset])
+            
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query_sql, params)
+                files_data = cursor.fetchall()
         
         # 格式化文件数据
         files = []
@@ -849,15 +894,12 @@ def search_files(spider_id):
         
         return jsonify({
             'files': files,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            },
+            'pagination': _build_pagination(page, per_page, total, use_cursor, next_cursor, prev_cursor),
             'search_query': query,
             'search_content_enabled': search_content
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
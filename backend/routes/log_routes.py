@@ -3,7 +3,10 @@ from datetime import datetime, timedelta
 import json
 import csv
 import io
-from database import Database
+import itertools
+from database import Database, LOG_CURSOR_KEYS, search_terms, highlight_snippet, search_like_clause
+from utils.pagination import keyset_rows, merged_keyset_page, parse_bool, InvalidCursor
+from utils.log_archive import get_log_archive, merge_logs
 
 log_bp = Blueprint('log', __name__)
 
@@ -27,10 +30,12 @@ def get_spider_logs(spider_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         search = request.args.get('search')
+        sort = request.args.get('sort', 'time')  # time, relevance（仅搜索时有效）
         
         # 构建查询条件
         conditions = ['spider_id = ?']
         params = [spider_id]
+        start_iso = end_iso = None
         
         if level:
             conditions.append('level = ?')
@@ -46,66 +51,195 @@ def get_spider_logs(spider_id):
         
         if start_date:
             try:
-                start_dt = datetime.fromisoformat(start_date)
+                start_iso = datetime.fromisoformat(start_date).isoformat()
                 conditions.append('timestamp >= ?')
-                params.append(start_dt.isoformat())
+                params.append(start_iso)
             except ValueError:
                 pass
         
         if end_date:
             try:
-                end_dt = datetime.fromisoformat(end_date)
+                end_iso = datetime.fromisoformat(end_date).isoformat()
                 conditions.append('timestamp <= ?')
-                params.append(end_dt.isoformat())
+                params.append(end_iso)
             except ValueError:
                 pass
         
-        if search:
-            conditions.append('message LIKE ?')
-            params.append(f'%{search}%')
-        
-        where_clause = ' AND '.join(conditions)
-        
-        # 获取总数
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            count_query = f'SELECT COUNT(*) FROM spider_logs WHERE {where_clause}'
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
-        
-        # 获取分页数据
         offset = (page - 1) * per_page
-        query = f'''
-            SELECT * FROM spider_logs 
-            WHERE {where_clause}
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        '''
-        params.extend([per_page, offset])
         
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            logs_data = cursor.fetchall()
+        # 传入 cursor 参数（首页为空字符串）时使用游标分页：每页耗时与翻页深度无关，
+        # 总数和统计信息默认不计算（首页仍返回统计信息），可通过 include_total / include_stats 开启
+        cursor = request.args.get('cursor')
+        use_cursor = cursor is not None
+        include_total = parse_bool(request.args.get('include_total'), not use_cursor)
+        include_stats = parse_bool(request.args.get('include_stats'), not cursor)
+        next_cursor = prev_cursor = None
+        
+        # 时间范围延伸到归档数据时，合并读取数据库中的热数据和归档段
+        archive = get_log_archive()
+        use_archive = (
+            parse_bool(request.args.get('include_archive'), True)
+            and sort != 'relevance'
+            and archive.has_range(spider_id, start_iso, end_iso)
+        )
+        archive_filters = {
+            'start': start_iso, 'end': end_iso, 'level': level, 'source': source,
+            'execution_id': execution_id, 'search': search
+        }
+        
+        # 归档中的搜索匹配需要解压该爬虫的所有归档段逐行过滤，只在显式传入 include_total 时计数；
+        # 不计数时 total 只含热数据，total_capped 为 true
+        count_archive = not search or 'include_total' in request.args
+        
+        # 搜索优先使用全文索引；合并归档时热数据仍由全文索引按写入顺序读取，
+        # 归档行用 search_matcher 逐行匹配，与全文索引（及退回的 LIKE 条件）的语法和语义一致，
+        # 因此合并后的列表和 total 对同一搜索词采用同一匹配定义
+        search_result = None
+        hot_search = False
+        total = None
+        total_capped = False
+        if search and use_archive:
+            hot_count = db.search_logs(
+                spider_id, search, level=level, source=source, execution_id=execution_id,
+                start_date=start_iso, end_date=end_iso, limit=0, include_total=include_total
+            )
+            if hot_count is not None:
+                hot_search = True
+                total = hot_count['total']
+                total_capped = hot_count['total_capped']
+        elif search:
+            search_result = db.search_logs(
+                spider_id,
+                search,
+                level=level,
+                source=source,
+                execution_id=execution_id,
+                start_date=start_iso,
+                end_date=end_iso,
+                limit=per_page,
+                offset=offset,
+                order=sort,
+                cursor=cursor,
+                include_total=include_total
+            )
         
-        logs = []
-        for log_data in logs_data:
-            log_dict = dict(log_data)
-            logs.append(log_dict)
+        if search_result is not None:
+            logs = search_result['logs']
+            total = search_result['total']
+            total_capped = search_result['total_capped']
+            next_cursor = search_result['next_cursor']
+            prev_cursor = search_result['prev_cursor']
+        else:
+            if search and not hot_search:
+                like = search_like_clause(search)
+                if like:
+                    conditions.append(like[0])
+                    params.extend(like[1])
+            
+            where_clause = ' AND '.join(conditions)
+            
+            # 获取总数
+            if include_total:
+                if not hot_search:
+                    with db.get_connection() as conn:
+                        cursor_obj = conn.cursor()
+                        count_query = f'SELECT COUNT(*) FROM spider_logs WHERE {where_clause}'
+                        cursor_obj.execute(count_query, params)
+                        total = cursor_obj.fetchone()[0]
+                if use_archive and count_archive:
+                    total += archive.count_logs(spider_id, **archive_filters)
+                elif use_archive:
+                    # 总数不含归档中的匹配，只是下限
+                    total_capped = True
+            
+            search_filters = {
+                'level': level, 'source': source, 'execution_id': execution_id,
+                'start_date': start_iso, 'end_date': end_iso
+            }
+            
+            if use_cursor:
+                with db.get_connection() as conn:
+                    def fetch_hot(direction, values, count):
+                        if hot_search:
+                            return db.search_log_rows(spider_id, search, direction, values, count, **search_filters)
+                        return keyset_rows(
+                            conn, 'SELECT * FROM spider_logs', conditions, params,
+                            LOG_CURSOR_KEYS, direction, values, count
+                        )
+                    
+                    fetchers = [fetch_hot]
+                    if use_archive:
+                        fetchers.append(_archive_fetcher(archive, spider_id, archive_filters))
+                    logs, next_cursor, prev_cursor = merged_keyset_page(
+                        fetchers, [name for _, name in LOG_CURSOR_KEYS], per_page, cursor
+                    )
+            elif use_archive:
+                # 页码分页：取热数据的前 offset + per_page 行与归档按时间合并后截取
+                if hot_search:
+                    hot_logs = db.search_log_rows(spider_id, search, 'next', None, offset + per_page, **search_filters)
+                else:
+                    with db.get_connection() as conn:
+                        hot_logs = keyset_rows(
+                            conn, 'SELECT * FROM spider_logs', conditions, params,
+                            LOG_CURSOR_KEYS, 'next', None, offset + per_page
+                        )
+                merged = merge_logs([hot_logs, archive.iter_logs(spider_id, **archive_filters)])
+                logs = list(itertools.islice(merged, offset, offset + per_page))
+            else:
+                # 获取分页数据
+                query = f'''
+                    SELECT * FROM spider_logs 
+                    WHERE {where_clause}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ? OFFSET ?
+                '''
+                params.extend([per_page, offset])
+                
+                with db.get_connection() as conn:
+                    cursor_obj = conn.cursor()
+                    cursor_obj.execute(query, params)
+                    logs_data = cursor_obj.fetchall()
+                
+                logs = []
+                for log_data in logs_data:
+                    log_dict = dict(log_data)
+                    logs.append(log_dict)
+        
+        # 归档中的匹配同样附带高亮片段
+        if hot_search:
+            terms = search_terms(search)
+            for log in logs:
+                if 'snippet' not in log:
+                    log['snippet'] = highlight_snippet(log['message'], terms)
         
         # 获取统计信息
-        stats = _get_log_statistics(spider_id, start_date, end_date)
+        stats = _get_log_statistics(spider_id, start_date, end_date) if include_stats else None
         
-        return jsonify({
-            'logs': logs,
-            'pagination': {
+        if use_cursor:
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor,
+                'has_more': next_cursor is not None,
+                'total': total,
+                'total_capped': total_capped
+            }
+        else:
+            pagination = {
                 'page': page,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
-            },
+                'pages': (total + per_page - 1) // per_page if total is not None else None,
+                'total_capped': total_capped
+            }
+        
+        return jsonify({
+            'logs': logs,
+            'pagination': pagination,
             'statistics': stats
         })
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -195,19 +329,21 @@ def clear_logs(spider_id):
         # 可选择保留最近N天的日志
         keep_days = data.get('keep_days', 0)
         
+        # 分批删除，避免长时间占用写锁阻塞正在运行的爬虫写日志
         if keep_days > 0:
             cutoff_date = datetime.utcnow() - timedelta(days=keep_days)
-            query = 'DELETE FROM spider_logs WHERE spider_id = ? AND timestamp < ?'
-            params = [spider_id, cutoff_date.isoformat()]
+            deleted_count = db.delete_in_batches(
+                'spider_logs', 'spider_id = ? AND timestamp < ?', (spider_id, cutoff_date.isoformat())
+            )
         else:
-            query = 'DELETE FROM spider_logs WHERE spider_id = ?'
-            params = [spider_id]
+            deleted_count = db.delete_spider_logs(spider_id)
         
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            deleted_count = cursor.rowcount
-            conn.commit()
+        # 同时清理归档段
+        archive = get_log_archive()
+        if keep_days > 0:
+            archive.delete_before(cutoff_date.strftime('%Y-%m-%d'), spider_id=spider_id)
+        else:
+            archive.delete_spider(spider_id)
         
         return jsonify({
             'message': f'{deleted_count} logs cleared successfully',
@@ -251,29 +387,37 @@ def export_logs(spider_id):
             conditions.append('execution_id = ?')
             params.append(execution_id)
         
+        start_iso = end_iso = None
         if start_date:
             try:
-                start_dt = datetime.fromisoformat(start_date)
+                start_iso = datetime.fromisoformat(start_date).isoformat()
                 conditions.append('timestamp >= ?')
-                params.append(start_dt.isoformat())
+                params.append(start_iso)
             except ValueError:
                 pass
         
         if end_date:
             try:
-                end_dt = datetime.fromisoformat(end_date)
+                end_iso = datetime.fromisoformat(end_date).isoformat()
                 conditions.append('timestamp <= ?')
-                params.append(end_dt.isoformat())
+                params.append(end_iso)
             except ValueError:
                 pass
         
         where_clause = ' AND '.join(conditions)
-        query = f'SELECT * FROM spider_logs WHERE {where_clause} ORDER BY timestamp DESC'
+        query = f'SELECT * FROM spider_logs WHERE {where_clause} ORDER BY timestamp DESC, id DESC'
         
         with db.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            logs_data = cursor.fetchall()
+            logs_data = [dict(row) for row in cursor.fetchall()]
+        
+        # 时间范围延伸到归档数据时一并导出
+        archive = get_log_archive()
+        if parse_bool(request.args.get('include_archive'), True) and archive.has_range(spider_id, start_iso, end_iso):
+            logs_data = merge_logs([logs_data, archive.iter_logs(
+                spider_id, start_iso, end_iso, level=level, source=source, execution_id=execution_id
+            )])
         
         if format_type == 'csv':
             # CSV格式导出
@@ -329,6 +473,38 @@ def export_logs(spider_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@log_bp.route('/logs/archive', methods=['GET'])
+def get_log_archive_summary():
+    """获取日志归档概况"""
+    try:
+        return jsonify(get_log_archive().summary())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@log_bp.route('/logs/archive', methods=['POST'])
+def archive_logs():
+    """立即归档早于指定天数（默认使用系统设置 logArchiveDays）的日志"""
+    try:
+        db = Database()
+        data = request.get_json(silent=True) or {}
+        older_than_days = data.get('older_than_days', db.get_system_settings().get('logArchiveDays', 7))
+        
+        try:
+            older_than_days = int(older_than_days)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'older_than_days must be an integer'}), 400
+        if older_than_days < 1:
+            return jsonify({'error': 'older_than_days must be at least 1'}), 400
+        
+        summary = get_log_archive().archive(older_than_days)
+        
+        return jsonify({
+            'message': f"{summary['archived_rows']} logs archived successfully",
+            'summary': summary
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @log_bp.route('/spiders/<int:spider_id>/logs/statistics', methods=['GET'])
 def get_log_statistics(spider_id):
     """获取日志统计信息"""
@@ -358,19 +534,20 @@ def _get_log_statistics(spider_id, start_date='', end_date=''):
     params = [spider_id]
     
     # 日期范围过滤
+    start_iso = end_iso = None
     if start_date:
         try:
-            start_dt = datetime.fromisoformat(start_date)
+            start_iso = datetime.fromisoformat(start_date).isoformat()
             conditions.append('timestamp >= ?')
-            params.append(start_dt.isoformat())
+            params.append(start_iso)
         except ValueError:
             pass
     
     if end_date:
         try:
-            end_dt = datetime.fromisoformat(end_date)
+            end_iso = datetime.fromisoformat(end_date).isoformat()
             conditions.append('timestamp <= ?')
-            params.append(end_dt.isoformat())
+            params.append(end_iso)
         except ValueError:
             pass
     
@@ -426,14 +603,44 @@ def _get_log_statistics(spider_id, start_date='', end_date=''):
         '''
         cursor.execute(daily_query, daily_params)
         daily_stats = cursor.fetchall()
+    daily_counts = dict(daily_stats)
+    
+    # 合并归档数据的统计（大多直接来自归档索引）
+    archive = get_log_archive()
+    if archive.has_range(spider_id, start_iso, end_iso):
+        archived = archive.statistics(spider_id, start_iso, end_iso)
+        total_logs += archived['total']
+        for level, count in archived['levels'].items():
+            level_distribution[level] = level_distribution.get(level, 0) + count
+        for source, count in archived['sources'].items():
+            source_distribution[source] = source_distribution.get(source, 0) + count
+        daily_start = max(start_iso, seven_days_ago.isoformat()) if start_iso else seven_days_ago.isoformat()
+        if archive.has_range(spider_id, daily_start, end_iso):
+            for date, count in archive.statistics(spider_id, daily_start, end_iso)['daily'].items():
+                daily_counts[date] = daily_counts.get(date, 0) + count
+    
     daily_logs = [{
         'date': date,
         'count': count
-    } for date, count in daily_stats]
+    } for date, count in sorted(daily_counts.items())]
     
     return {
         'total_logs': total_logs,
         'level_distribution': level_distribution,
         'source_distribution': source_distribution,
         'daily_logs': daily_logs
-    }
\ No newline at end of file
+    }
+
+def _archive_fetcher(archive, spider_id, filters):
+    """把归档读取包装为 merged_keyset_page 使用的数据源"""
+    def fetch(direction, values, count):
+        descending = direction == 'next'
+        rows = archive.iter_logs(
+            spider_id,
+            descending=descending,
+            before=values if descending else None,
+            after=None if descending else values,
+            **filters
+        )
+        return list(itertools.islice(rows, count))
+    return fetch
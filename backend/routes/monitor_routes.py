@@ -1,8 +1,9 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import psutil
-import sqlite3
 from datetime import datetime, timedelta
 from database import get_db
+from utils.log_writer import get_log_writer
+from utils.spider_runner import get_spider_runner, get_execution_queue
 
 monitor_bp = Blueprint('monitor', __name__)
 
@@ -31,6 +32,43 @@ def get_system_stats():
             'error': str(e)
         }), 500
 
+@monitor_bp.route('/monitor/executions', methods=['GET'])
+def get_active_executions():
+    """获取执行队列、worker 任务队列状态和所有排队中、运行中的执行"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'queue': get_execution_queue().stats(),
+                'job_queue': get_db().get_job_queue_stats(),
+                'executions': get_spider_runner().get_active_executions()
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitor_bp.route('/monitor/resource-usage', methods=['GET'])
+def get_resource_usage():
+    """按爬虫汇总最近的进程资源用量（CPU、峰值内存、磁盘读写），用于找出开销最大的爬虫"""
+    try:
+        db = get_db()
+        days = request.args.get('days', 7, type=int)
+        limit = request.args.get('limit', 20, type=int)
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        
+        return jsonify({
+            'success': True,
+            'data': db.get_execution_usage_summary(since, limit)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @monitor_bp.route('/monitor/spider-stats', methods=['GET'])
 def get_spider_stats():
     """获取爬虫运行统计数据（按小时）"""
@@ -41,44 +79,12 @@ def get_spider_stats():
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=24)
         
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 按小时统计所有爬虫的运行次数（基于爬虫日志表）
-            cursor.execute("""
-                SELECT 
-                    strftime('%Y-%m-%d %H:00:00', timestamp) as hour,
-                    COUNT(CASE WHEN level = 'INFO' AND message LIKE '%started%' THEN 1 END) as run_count,
-                    COUNT(CASE WHEN level = 'INFO' AND message LIKE '%completed%' THEN 1 END) as success_count
-                FROM spider_logs 
-                WHERE timestamp >= ? AND timestamp <= ?
-                    AND level IN ('INFO', 'ERROR')
-                GROUP BY strftime('%Y-%m-%d %H:00:00', timestamp)
-                ORDER BY hour
-            """, (start_time.isoformat(), end_time.isoformat()))
-            
-            hourly_stats = cursor.fetchall()
-            
-            # 计算总的运行次数和成功次数
-            total_runs = sum(row[1] for row in hourly_stats)
-            total_success = sum(row[2] for row in hourly_stats)
-            overall_success_rate = (total_success / total_runs * 100) if total_runs > 0 else 0
-            
-            # 格式化数据
-            stats_data = []
-            for hour, run_count, success_count in hourly_stats:
-                # 每小时的成功率仍然基于该小时的数据
-                hourly_success_rate = (success_count / run_count * 100) if run_count > 0 else 0
-                stats_data.append({
-                    'hour': hour,
-                    'run_count': run_count,
-                    'success_count': success_count,
-                    'success_rate': round(hourly_success_rate, 1)
-                })
-            
+        # 读取按小时汇总的运行统计表，只需遍历最多24个小时桶
+        hourly_stats = db.get_hourly_run_stats(start_time, end_time)
+        
         return jsonify({
             'success': True,
-            'data': stats_data
+            'data': [_format_hourly_stats(row) for row in hourly_stats]
         })
     except Exception as e:
         return jsonify({
@@ -96,41 +102,50 @@ def get_single_spider_stats(spider_id):
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=24)
         
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 按小时统计单个爬虫的运行次数
-            cursor.execute("""
-                SELECT 
-                    strftime('%Y-%m-%d %H:00:00', timestamp) as hour,
-                    COUNT(CASE WHEN level = 'INFO' AND message LIKE '%started%' THEN 1 END) as run_count,
-                    COUNT(CASE WHEN level = 'INFO' AND message LIKE '%completed%' THEN 1 END) as success_count
-                FROM spider_logs 
-                WHERE spider_id = ? AND timestamp >= ? AND timestamp <= ?
-                    AND level IN ('INFO', 'ERROR')
-                GROUP BY strftime('%Y-%m-%d %H:00:00', timestamp)
-                ORDER BY hour
-            """, (spider_id, start_time.isoformat(), end_time.isoformat()))
-            
-            hourly_stats = cursor.fetchall()
-            
-            # 格式化数据
-            stats_data = []
-            for hour, run_count, success_count in hourly_stats:
-                success_rate = (success_count / run_count * 100) if run_count > 0 else 0
-                stats_data.append({
-                    'hour': hour,
-                    'run_count': run_count,
-                    'success_count': success_count,
-                    'success_rate': round(success_rate, 1)
-                })
+        hourly_stats = db.get_hourly_run_stats(start_time, end_time, spider_id=spider_id)
         
         return jsonify({
             'success': True,
-            'data': stats_data
+            'data': [_format_hourly_stats(row) for row in hourly_stats]
         })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+def _format_hourly_stats(row):
+    """格式化一个小时桶的运行统计"""
+    run_count = row['run_count']
+    success_count = row['success_count']
+    finished_count = success_count + row['error_count']
+    success_rate = (success_count / run_count * 100) if run_count > 0 else 0
+    return {
+        'hour': row['hour'],
+        'run_count': run_count,
+        'success_count': success_count,
+        'error_count': row['error_count'],
+        'api_call_count': row['api_call_count'],
+        'success_rate': round(success_rate, 1),
+        'avg_duration': round(row['total_duration'] / finished_count, 2) if finished_count else 0
+    }
+
+@monitor_bp.route('/monitor/database', methods=['GET'])
+def get_database_stats():
+    """获取数据库连接池和日志写入服务指标"""
+    try:
+        db = get_db()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'pool': db.get_pool_stats(),
+                'log_writer': get_log_writer().stats(),
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -5,6 +5,8 @@ from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 import json
 from database import get_db
+from utils.log_writer import get_log_writer
+from utils.spider_runner import run_scheduled_spider
 
 schedule_bp = Blueprint('schedule', __name__)
 
@@ -81,11 +83,8 @@ def create_schedule(spider_id):
         
         # 添加任务到调度器
         if scheduler:
-            from utils.spider_runner import SpiderRunner
-            spider_runner = SpiderRunner()
-            
             job = scheduler.add_job(
-                func=spider_runner.run_spider,
+                func=run_scheduled_spider,  # 提交到全局运行器，与手动运行共用并发上限
                 trigger=trigger,
                 args=[spider_id],  # 传递spider_id而不是spider对象
                 id=job_id,
@@ -96,7 +95,7 @@ def create_schedule(spider_id):
             )
             
             # 记录日志
-            db.create_log(
+            get_log_writer().write(
                 spider_id=spider_id,
                 level='INFO',
                 message=f'Schedule "{data["name"]}" created successfully',
@@ -183,7 +182,7 @@ def update_schedule(spider_id, job_id):
             job.name = data['name']
         
         # 记录日志
-        db.create_log(
+        get_log_writer().write(
             spider_id=spider_id,
             level='INFO',
             message=f'Schedule "{job.name}" updated successfully',
@@ -221,7 +220,7 @@ def delete_schedule(spider_id, job_id):
         scheduler.remove_job(job_id)
         
         # 记录日志
-        db.create_log(
+        get_log_writer().write(
             spider_id=spider_id,
             level='INFO',
             message=f'Schedule "{job_name}" deleted successfully',
@@ -255,7 +254,7 @@ def pause_schedule(spider_id, job_id):
         scheduler.pause_job(job_id)
         
         # 记录日志
-        db.create_log(
+        get_log_writer().write(
             spider_id=spider_id,
             level='INFO',
             message=f'Schedule "{job.name}" paused',
@@ -289,7 +288,7 @@ def resume_schedule(spider_id, job_id):
         scheduler.resume_job(job_id)
         
         # 记录日志
-        db.create_log(
+        get_log_writer().write(
             spider_id=spider_id,
             level='INFO',
             message=f'Schedule "{job.name}" resumed',
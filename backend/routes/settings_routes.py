@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
-from database import db
+from database import db, DEFAULT_SYSTEM_SETTINGS
+from utils.log_archive import get_log_archive
+from utils.retention import get_retention_engine
+from utils.spider_runner import get_execution_queue
 import json
 from datetime import datetime
 
@@ -116,23 +119,8 @@ def update_notifications():
 def get_system_settings():
     """获取系统设置"""
     try:
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT value FROM settings WHERE key = ?', ('system',))
-            result = cursor.fetchone()
-        
-        if result:
-            system_settings = json.loads(result[0])
-        else:
-            # 默认配置
-            system_settings = {
-                'maxConcurrentSpiders': 3,
-                'defaultTimeout': 30,
-                'defaultRetries': 3,
-                'logRetentionDays': 30,
-                'fileRetentionDays': 90,
-                'apiCallIntervalMinutes': 5
-            }
+        # 未保存过的设置项使用默认配置
+        system_settings = db.get_system_settings()
             
         return jsonify(system_settings)
     except Exception as e:
@@ -144,13 +132,43 @@ def update_system_settings():
     try:
         data = request.get_json()
         
+        try:
+            max_concurrent = int(data.get('maxConcurrentSpiders', 3))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'maxConcurrentSpiders must be an integer'}), 400
+        if max_concurrent < 1:
+            return jsonify({'error': 'maxConcurrentSpiders must be at least 1'}), 400
+        
+        # 爬虫进程的资源限制和运行超时，0 表示不限制
+        limit_settings = {}
+        for key in ('spiderCpuLimitSeconds', 'spiderMemoryLimitMB', 'spiderMaxOpenFiles', 'executionTimeoutMinutes'):
+            try:
+                limit_settings[key] = int(data.get(key, DEFAULT_SYSTEM_SETTINGS[key]) or 0)
+            except (TypeError, ValueError):
+                return jsonify({'error': f'{key} must be an integer'}), 400
+            if limit_settings[key] < 0:
+                return jsonify({'error': f'{key} must not be negative'}), 400
+        
+        try:
+            http_cache_max_mb = int(data.get('httpCacheMaxMB', DEFAULT_SYSTEM_SETTINGS['httpCacheMaxMB']))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'httpCacheMaxMB must be an integer'}), 400
+        if http_cache_max_mb < 1:
+            return jsonify({'error': 'httpCacheMaxMB must be at least 1'}), 400
+        
         system_data = {
-            'maxConcurrentSpiders': data.get('maxConcurrentSpiders', 3),
+            'maxConcurrentSpiders': max_concurrent,
             'defaultTimeout': data.get('defaultTimeout', 30),
             'defaultRetries': data.get('defaultRetries', 3),
             'logRetentionDays': data.get('logRetentionDays', 30),
+            'logArchiveDays': data.get('logArchiveDays', 7),
             'fileRetentionDays': data.get('fileRetentionDays', 90),
             'apiCallIntervalMinutes': data.get('apiCallIntervalMinutes', 5),
+            'useZygote': bool(data.get('useZygote', True)),
+            'useWorkerProcesses': bool(data.get('useWorkerProcesses', False)),
+            'httpCacheEnabled': bool(data.get('httpCacheEnabled', True)),
+            'httpCacheMaxMB': http_cache_max_mb,
+            **limit_settings,
             'updated_at': datetime.utcnow().isoformat()
         }
         
@@ -163,6 +181,9 @@ def update_system_settings():
             )
             conn.commit()
         
+        # 立即按新的并发上限调整执行队列的工作线程数
+        get_execution_queue().resize(system_data['maxConcurrentSpiders'])
+        
         return jsonify({'message': 'System settings updated successfully', 'system': system_data})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -174,24 +195,56 @@ def clear_data():
         data = request.get_json()
         clear_type = data.get('type', 'all')  # all, logs, files, spiders
         
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-             
-            if clear_type == 'all' or clear_type == 'logs':
-                cursor.execute('DELETE FROM spider_logs')
-                
-            if clear_type == 'all' or clear_type == 'files':
-                cursor.execute('DELETE FROM spider_files')
-                
-            if clear_type == 'all' or clear_type == 'spiders':
-                cursor.execute('DELETE FROM spiders')
-                
-            conn.commit()
+        # 分批删除，每批单独提交，避免一次大 DELETE 长时间占用写锁
+        if clear_type == 'all' or clear_type == 'logs':
+            db.delete_in_batches('spider_logs')
+            get_log_archive().clear()
+            
+        if clear_type == 'all' or clear_type == 'files':
+            db.delete_in_batches('spider_files')
+            
+        if clear_type == 'all' or clear_type == 'spiders':
+            db.delete_in_batches('spiders')
+            db.delete_in_batches('spider_executions')
+            with db.get_connection() as conn:
+                conn.execute('DELETE FROM spider_run_stats')
+                conn.commit()
              
         return jsonify({'message': f'Data cleared successfully: {clear_type}'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@settings_bp.route('/settings/retention', methods=['GET'])
+def get_retention_status():
+    """获取数据保留清理的状态和上次清理报告"""
+    try:
+        engine = get_retention_engine()
+        return jsonify({
+            'running': engine.is_running(),
+            'last_report': engine.last_report
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@settings_bp.route('/settings/retention/run', methods=['POST'])
+def run_retention_now():
+    """立即按保留天数清理过期数据
+
+    full_vacuum 为 true 时对未启用增量自动清理的旧数据库执行一次完整 VACUUM。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        report = get_retention_engine().run(
+            log_days=data.get('logRetentionDays'),
+            file_days=data.get('fileRetentionDays'),
+            full_vacuum=bool(data.get('full_vacuum', False))
+        )
+        if report is None:
+            return jsonify({'error': 'Retention is already running'}), 409
+        return jsonify({'message': 'Retention completed', 'report': report})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @settings_bp.route('/settings/export', methods=['GET'])
 def export_data():
     """导出数据"""
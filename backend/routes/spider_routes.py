@@ -1,11 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app
-from utils.spider_runner import SpiderRunner
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from utils.spider_runner import get_spider_runner, MAX_SHARDS, HTTP_CACHE_ROOT
+from utils.log_writer import get_log_writer
+from utils.log_archive import get_log_archive
+from utils.execution_events import get_event_hub, format_sse
+from utils.pagination import InvalidCursor
 from datetime import datetime, timedelta
 import json
 import os
+import time
 
 spider_bp = Blueprint('spider', __name__)
-spider_runner = SpiderRunner()
+spider_runner = get_spider_runner()
+log_writer = get_log_writer()
 
 def get_db():
     """获取数据库实例"""
@@ -115,7 +121,7 @@ def create_spider():
         )
         
         # 记录创建日志
-        db.create_log(
+        log_writer.write(
             spider_id=spider_id,
             level='INFO',
             message=f'Spider "{data["name"]}" created successfully',
@@ -171,7 +177,7 @@ def update_spider(spider_id):
             return jsonify({'error': 'Failed to update spider'}), 500
         
         # 记录更新日志
-        db.create_log(
+        log_writer.write(
             spider_id=spider_id,
             level='INFO',
             message=f'Spider "{data.get("name", spider["name"])}" updated successfully',
@@ -202,7 +208,7 @@ def delete_spider(spider_id):
             return jsonify({'error': 'Spider not found'}), 404
         
         # 检查爬虫是否正在运行
-        if spider['status'] == 'running':
+        if spider['status'] in ('running', 'queued'):
             return jsonify({'error': 'Cannot delete running spider'}), 400
         
         spider_name = spider['name']
@@ -229,6 +235,7 @@ def delete_spider(spider_id):
         try:
             spider_files_dir = os.path.abspath(os.path.join('spider_files', f'spider_{spider_id}'))
             spider_logs_dir = os.path.abspath(os.path.join('spider_logs', f'spider_{spider_id}'))
+            http_cache_dir = os.path.abspath(os.path.join(HTTP_CACHE_ROOT, f'spider_{spider_id}'))
             
             # 删除文件目录
             if os.path.exists(spider_files_dir):
@@ -241,10 +248,18 @@ def delete_spider(spider_id):
                 import shutil
                 shutil.rmtree(spider_logs_dir, ignore_errors=True)
                 print(f"Deleted spider logs directory: {spider_logs_dir}")
+            
+            # 删除 HTTP 缓存
+            if os.path.exists(http_cache_dir):
+                import shutil
+                shutil.rmtree(http_cache_dir, ignore_errors=True)
                 
         except Exception as e:
             print(f"Error deleting spider directories: {e}")
         
+        # 删除日志归档
+        get_log_archive().delete_spider(spider_id)
+        
         # 删除数据库记录
         db.delete_spider_files(spider_id)
         db.delete_spider_logs(spider_id)
@@ -259,24 +274,31 @@ def delete_spider(spider_id):
 
 @spider_bp.route('/spiders/<int:spider_id>/run', methods=['POST'])
 def run_spider(spider_id):
-    """运行爬虫"""
+    """运行爬虫，请求体中的 shards 大于 1 时为分片运行（同时启动 shards 个进程分担任务）"""
     db = get_db()
     try:
+        data = request.get_json(silent=True) or {}
+        shards = data.get('shards', 1)
+        if not isinstance(shards, int) or isinstance(shards, bool) or not 1 <= shards <= MAX_SHARDS:
+            return jsonify({'error': f'shards must be an integer between 1 and {MAX_SHARDS}'}), 400
+        
         spider = db.get_spider(spider_id)
         if not spider:
             return jsonify({'error': 'Spider not found'}), 404
         
         # 检查爬虫状态
-        if spider['status'] == 'running':
+        if spider['status'] in ('running', 'queued'):
             return jsonify({'error': 'Spider is already running'}), 400
         
-        # 启动爬虫
-        execution_id = spider_runner.run_spider(spider_id)
+        # 提交到执行队列，有空闲工作线程时立即开始
+        execution_id = spider_runner.run_spider(spider_id, shards=shards)
+        runtime_info = spider_runner.get_spider_status(spider_id)
         
         return jsonify({
             'message': f'Spider "{spider["name"]}" started successfully',
             'execution_id': execution_id,
-            'status': 'running'
+            'status': 'queued' if runtime_info.get('is_queued') else 'running',
+            'runtime_info': runtime_info
         })
     except Exception as e:
         import traceback
@@ -308,7 +330,7 @@ def stop_spider(spider_id):
         if not spider:
             return jsonify({'error': 'Spider not found'}), 404
         
-        if spider['status'] != 'running':
+        if spider['status'] not in ('running', 'queued'):
             return jsonify({'error': 'Spider is not running'}), 400
         
         # 停止爬虫
@@ -345,6 +367,155 @@ def get_spider_status(spider_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@spider_bp.route('/spiders/<int:spider_id>/executions', methods=['GET'])
+def get_spider_executions(spider_id):
+    """获取爬虫运行历史（按开始时间倒序，游标分页）"""
+    db = get_db()
+    try:
+        spider = db.get_spider(spider_id)
+        if not spider:
+            return jsonify({'error': 'Spider not found'}), 404
+        
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        executions, next_cursor, prev_cursor = db.get_spider_executions_page(
+            spider_id,
+            limit=per_page,
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status'),
+            trigger_source=request.args.get('trigger')
+        )
+        
+        return jsonify({
+            'executions': executions,
+            'running': spider_runner.get_spider_status(spider_id),
+            'pagination': {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor,
+                'has_more': next_cursor is not None
+            }
+        })
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@spider_bp.route('/spiders/<int:spider_id>/executions/<execution_id>', methods=['GET'])
+def get_spider_execution(spider_id, execution_id):
+    """获取单次运行的执行记录"""
+    db = get_db()
+    try:
+        execution = db.get_execution(execution_id)
+        if not execution or execution['spider_id'] != spider_id:
+            return jsonify({'error': 'Execution not found'}), 404
+        
+        # 分片运行附带各分片的执行记录
+        if execution.get('shard_count') and not execution.get('parent_execution_id'):
+            execution['shards'] = db.get_shard_executions(execution_id)
+        
+        return jsonify(execution)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@spider_bp.route('/spiders/<int:spider_id>/executions/<execution_id>/stream', methods=['GET'])
+def stream_spider_execution(spider_id, execution_id):
+    """以 Server-Sent Events 推送单次运行的日志、状态和进度
+
+    事件类型：snapshot（连接时的当前状态）、status、progress、log、gap（续传时缓冲区
+    已丢弃的事件数）、end。断线重连时通过 Last-Event-ID 请求头（或 last_event_id 参数）续传。
+    运行期间只读取内存中的事件，不查询数据库。
+    """
+    try:
+        channel = get_event_hub().get_channel(execution_id)
+        if channel is None or channel.spider_id != spider_id:
+            # 交给 worker 进程执行的运行从数据库轮询日志和状态
+            job = get_db().get_job(execution_id)
+            if job and job['spider_id'] == spider_id and job['status'] in ('queued', 'leased'):
+                return Response(
+                    stream_with_context(_stream_job_execution(execution_id)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+                )
+            
+            # 已结束较久的运行直接推送执行记录
+            execution = get_db().get_execution(execution_id)
+            if not execution or execution['spider_id'] != spider_id:
+                return jsonify({'error': 'Execution not found'}), 404
+            events = format_sse('status', execution) + format_sse('end', {'execution_id': execution_id})
+            return Response(events, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+        try:
+            last_event_id = max(int(last_event_id), 0)
+        except ValueError:
+            last_event_id = 0
+        
+        def generate():
+            yield 'retry: 3000\n\n'
+            yield format_sse('snapshot', channel.snapshot())
+            for event in get_event_hub().subscribe(execution_id, last_event_id):
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                event_id, event_type, data = event
+                yield format_sse(event_type, data, event_id)
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _stream_job_execution(execution_id, poll_interval=1.0):
+    """轮询数据库推送 worker 进程中运行的日志和状态，事件ID为日志行的 id，可用 Last-Event-ID 续传"""
+    db = get_db()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        last_log_id = max(int(last_event_id), 0)
+    except ValueError:
+        last_log_id = 0
+    
+    yield 'retry: 3000\n\n'
+    last_status = None
+    idle_since = time.monotonic()
+    while True:
+        job = db.get_job(execution_id)
+        status = 'running' if job and job['status'] == 'leased' else 'queued' if job and job['status'] == 'queued' else None
+        if status and status != last_status:
+            last_status = status
+            yield format_sse('status', {
+                'status': status,
+                'trigger': job['trigger_source'],
+                'worker_id': job['worker_id']
+            })
+        
+        logs = db.get_execution_logs_after(execution_id, last_log_id)
+        for log in logs:
+            last_log_id = log['id']
+            yield format_sse('log', {
+                'level': log['level'],
+                'source': log['source'],
+                'message': log['message'],
+                'timestamp': log['timestamp']
+            }, log['id'])
+        
+        if status is None:
+            # 任务已结束：推送执行记录（worker 写入执行记录后才结束任务）
+            execution = db.get_execution(execution_id)
+            if execution:
+                yield format_sse('status', execution)
+            yield format_sse('end', {'execution_id': execution_id})
+            return
+        
+        if logs:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= 15:
+            idle_since = time.monotonic()
+            yield ': keepalive\n\n'
+        time.sleep(poll_interval)
+
 @spider_bp.route('/spiders/<int:spider_id>/api-call', methods=['POST'])
 def spider_api_call(spider_id):
     """规则爬虫API调用模式 - 直接返回爬取数据"""
@@ -410,7 +581,7 @@ def spider_api_call(spider_id):
         
         # 记录API调用开始
         start_time = datetime.now()
-        db.create_log(
+        log_writer.write(
             spider_id=spider_id,
             level='INFO',
             message=f'API调用开始 - 爬虫: "{spider["name"]}"',
@@ -430,7 +601,7 @@ def spider_api_call(spider_id):
             
             if result.get('success', False):
                 # 成功情况
-                db.create_log(
+                log_writer.write(
                     spider_id=spider_id,
                     level='INFO',
                     message=f'API调用成功 - 提取 {result.get("count", 0)} 条数据，耗时 {execution_time:.2f}秒',
@@ -452,7 +623,7 @@ def spider_api_call(spider_id):
             else:
                 # 失败情况
                 error_msg = result.get('error', result.get('message', '未知错误'))
-                db.create_log(
+                log_writer.write(
                     spider_id=spider_id,
                     level='ERROR',
                     message=f'API调用失败 - {error_msg}，耗时 {execution_time:.2f}秒',
@@ -477,7 +648,7 @@ def spider_api_call(spider_id):
             execution_time = (end_time - start_time).total_seconds()
             error_msg = f'爬虫执行异常: {str(e)}'
             
-            db.create_log(
+            log_writer.write(
                 spider_id=spider_id,
                 level='ERROR',
                 message=f'API调用异常 - {error_msg}，耗时 {execution_time:.2f}秒',
@@ -6,8 +6,7 @@ spider = db.get_spider(3)
 runner = SpiderRunner()
 
 if spider:
-    execution_id = "test-execution-id"
-    generated_code = runner._prepare_spider_code(spider, execution_id)
+    generated_code = runner._prepare_spider_code(spider)
     
     print("Generated spider code:")
     print("=" * 50)
@@ -0,0 +1,144 @@
+import collections
+import itertools
+import json
+import threading
+import time
+
+# 事件推送配置
+EVENT_BUFFER_SIZE = 1000    # 每个执行保留的最近事件数，用于 Last-Event-ID 断线续传
+CHANNEL_TTL = 300           # 执行结束后事件继续保留的时间（秒）
+KEEPALIVE_INTERVAL = 15     # 没有新事件时发送心跳注释的间隔（秒）
+
+
+def format_sse(event, data, event_id=None):
+    """格式化一条 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines.extend(f'data: {line}' for line in payload.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+class ExecutionChannel:
+    """单次执行的事件序列，事件 ID 从 1 开始连续递增"""
+
+    def __init__(self, spider_id, execution_id):
+        self.spider_id = spider_id
+        self.execution_id = execution_id
+        self.cond = threading.Condition()
+        self.events = collections.deque(maxlen=EVENT_BUFFER_SIZE)  # [(id, event, data)]
+        self.next_id = 1
+        self.state = {}  # 最近一次 status / progress 事件
+        self.closed_at = None
+
+    @property
+    def closed(self):
+        return self.closed_at is not None
+
+    def snapshot(self):
+        """当前状态，供新连接的订阅者先行展示"""
+        with self.cond:
+            return {'spider_id': self.spider_id, 'execution_id': self.execution_id,
+                    'last_event_id': self.next_id - 1, **self.state}
+
+    def _events_after(self, last_event_id):
+        """返回 last_event_id 之后的事件（调用方持有 cond）；缓冲区已丢弃的部分用 gap 事件表示"""
+        if not self.events:
+            return []
+        first_id = self.events[0][0]
+        if last_event_id >= first_id - 1:
+            return list(itertools.islice(self.events, last_event_id - first_id + 1, None))
+        gap = (first_id - 1, 'gap', {'missed': first_id - 1 - last_event_id})
+        return [gap] + list(self.events)
+
+
+class ExecutionEventHub:
+    """进程内的执行事件分发中心
+
+    运行器把日志行、状态变化和进度计数发布到对应执行的频道，任意数量的
+    SSE 连接从内存缓冲区读取，不访问数据库。
+    """
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def open(self, spider_id, execution_id):
+        """为一次执行创建频道，同时清理过期频道"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, channel in self._channels.items()
+                if channel.closed and now - channel.closed_at > CHANNEL_TTL
+            ]
+            for key in expired:
+                del self._channels[key]
+            channel = ExecutionChannel(spider_id, execution_id)
+            self._channels[execution_id] = channel
+            return channel
+
+    def get_channel(self, execution_id):
+        with self._lock:
+            return self._channels.get(execution_id)
+
+    def publish(self, execution_id, event, data):
+        """发布事件，频道不存在（如 API 调用）时忽略"""
+        channel = self.get_channel(execution_id)
+        if channel is None:
+            return
+        with channel.cond:
+            if channel.closed:
+                return
+            channel.events.append((channel.next_id, event, data))
+            channel.next_id += 1
+            if event in ('status', 'progress'):
+                channel.state[event] = data
+            channel.cond.notify_all()
+
+    def close(self, execution_id):
+        """发布 end 事件并结束频道，订阅者读完剩余事件后断开"""
+        channel = self.get_channel(execution_id)
+        if channel is None:
+            return
+        self.publish(execution_id, 'end', {'execution_id': execution_id})
+        with channel.cond:
+            channel.closed_at = time.monotonic()
+            channel.cond.notify_all()
+
+    def subscribe(self, execution_id, last_event_id=0, keepalive=KEEPALIVE_INTERVAL):
+        """依次产出 (id, event, data)；等待超过 keepalive 秒没有事件时产出 None"""
+        channel = self.get_channel(execution_id)
+        if channel is None:
+            return
+        while True:
+            with channel.cond:
+                events = channel._events_after(last_event_id)
+                if not events and not channel.closed:
+                    channel.cond.wait(keepalive)
+                    events = channel._events_after(last_event_id)
+                finished = channel.closed
+            if not events:
+                if finished:
+                    return
+                yield None
+                continue
+            for event in events:
+                yield event
+                last_event_id = event[0]
+                if event[1] == 'end':
+                    return
+
+
+_event_hub = None
+_event_hub_lock = threading.Lock()
+
+
+def get_event_hub():
+    """获取全局执行事件分发中心"""
+    global _event_hub
+    with _event_hub_lock:
+        if _event_hub is None:
+            _event_hub = ExecutionEventHub()
+        return _event_hub
@@ -0,0 +1,422 @@
+import gzip
+import heapq
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from database import get_db, search_matcher
+
+logger = logging.getLogger(__name__)
+
+# 日志归档配置
+ARCHIVE_DIR = 'log_archive'
+ARCHIVE_BLOCK_ROWS = 1000        # 每个压缩块的行数，读取时以块为单位解压
+ARCHIVE_DELETE_CHUNK = 500       # 归档后每个删除事务的行数
+ARCHIVE_DELETE_PAUSE = 0.05      # 删除事务之间的停顿（秒），让出写锁给日志写入
+ARCHIVE_COLUMNS = ('id', 'spider_id', 'level', 'message', 'timestamp', 'source', 'execution_id')
+
+
+def _row_key(row):
+    return (row['timestamp'], row['id'])
+
+
+def _day_bounds(day):
+    """某一天在 timestamp 列上的范围 [start, end)"""
+    start = datetime.strptime(day, '%Y-%m-%d')
+    return start.strftime('%Y-%m-%d %H:%M:%S'), (start + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LogArchive:
+    """按天、按爬虫分段的日志归档
+
+    超过热数据窗口的日志按 (爬虫, 日期) 写入 log_archive/spider_<id>/<日期>.jsonl.gz，
+    段文件由多个 gzip 成员组成，每个成员包含 ARCHIVE_BLOCK_ROWS 行按 (timestamp, id) 排序的 JSONL；
+    同名的 .idx.json 记录每个块的偏移、长度和键范围，以及整段的级别/来源计数，
+    查询时只需解压与时间范围、游标相交的块，统计时大多只读索引。
+    """
+
+    def __init__(self, base_dir=ARCHIVE_DIR, db=None):
+        self.base_dir = base_dir
+        self.db = db or get_db()
+        self._lock = threading.Lock()
+
+    # 路径与索引
+    def _spider_dir(self, spider_id):
+        return os.path.join(self.base_dir, f'spider_{spider_id}')
+
+    def _segment_path(self, spider_id, day):
+        return os.path.join(self._spider_dir(spider_id), f'{day}.jsonl.gz')
+
+    def _index_path(self, spider_id, day):
+        return os.path.join(self._spider_dir(spider_id), f'{day}.idx.json')
+
+    def _load_index(self, spider_id, day):
+        try:
+            with open(self._index_path(spider_id, day), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_index(self, spider_id, day, index):
+        path = self._index_path(spider_id, day)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def days(self, spider_id):
+        """已归档的日期列表（升序）"""
+        try:
+            names = os.listdir(self._spider_dir(spider_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.idx.json')] for name in names if name.endswith('.idx.json'))
+
+    def days_in_range(self, spider_id, start=None, end=None):
+        """与 [start, end] 时间范围相交的归档日期"""
+        start_day = start[:10] if start else None
+        end_day = end[:10] if end else None
+        return [
+            day for day in self.days(spider_id)
+            if (start_day is None or day >= start_day) and (end_day is None or day <= end_day)
+        ]
+
+    def has_range(self, spider_id, start=None, end=None):
+        """时间范围是否延伸到已归档的数据"""
+        return bool(self.days_in_range(spider_id, start, end))
+
+    # 写入
+    def archive(self, older_than_days, delete_chunk=ARCHIVE_DELETE_CHUNK, pause=ARCHIVE_DELETE_PAUSE):
+        """把早于 older_than_days 天（按整天对齐）的日志移入归档，返回归档摘要"""
+        cutoff_day = (datetime.utcnow() - timedelta(days=older_than_days)).strftime('%Y-%m-%d')
+        cutoff, _ = _day_bounds(cutoff_day)
+        summary = {'cutoff': cutoff, 'segments': 0, 'archived_rows': 0, 'deleted_rows': 0, 'bytes_written': 0}
+
+        with self._lock:
+            with self.db.get_connection() as conn:
+                groups = conn.execute('''
+                    SELECT DISTINCT spider_id, substr(timestamp, 1, 10) AS day
+                    FROM spider_logs WHERE timestamp < ?
+                    ORDER BY spider_id, day
+                ''', (cutoff,)).fetchall()
+
+            for spider_id, day in groups:
+                try:
+                    archived, ids, bytes_written = self._archive_segment(spider_id, day)
+                    deleted = self._delete_rows(ids, delete_chunk, pause)
+                except Exception as e:
+                    logger.error(f"Failed to archive logs of spider {spider_id} on {day}: {e}")
+                    continue
+                summary['segments'] += 1
+                summary['archived_rows'] += archived
+                summary['deleted_rows'] += deleted
+                summary['bytes_written'] += bytes_written
+
+        if summary['segments']:
+            logger.info(
+                f"Archived {summary['archived_rows']} log rows into {summary['segments']} segments "
+                f"({summary['bytes_written']} bytes) older than {cutoff}"
+            )
+        return summary
+
+    def _archive_segment(self, spider_id, day):
+        """把一个 (爬虫, 日期) 的日志追加写入段文件，返回 (新归档行数, 已归档的日志ID, 写入字节数)
+
+        先写段文件和索引、再删除数据库中的行；若中途退出，下次归档时
+        已在索引中的行只会被删除而不会重复写入。
+        """
+        day_start, day_end = _day_bounds(day)
+        os.makedirs(self._spider_dir(spider_id), exist_ok=True)
+        segment_path = self._segment_path(spider_id, day)
+
+        index = self._load_index(spider_id, day) or {
+            'spider_id': spider_id, 'day': day, 'rows': 0, 'levels': {}, 'sources': {},
+            'sorted': True, 'blocks': []
+        }
+        archived_ids = set()
+        if index['blocks']:
+            archived_ids = {row['id'] for block in index['blocks'] for row in self._read_block(segment_path, block)}
+
+        # 未被索引的尾部数据（上次写入后未保存索引）会被新块跳过
+        offset = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+        last_key = tuple(index['blocks'][-1]['last']) if index['blocks'] else None
+        ids = []
+        new_rows = 0
+        bytes_written = 0
+
+        with self.db.get_connection() as conn:
+            cursor = conn.execute(f'''
+                SELECT {', '.join(ARCHIVE_COLUMNS)} FROM spider_logs
+                WHERE spider_id = ? AND timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp, id
+            ''', (spider_id, day_start, day_end))
+
+            with open(segment_path, 'ab') as f:
+                while True:
+                    batch = cursor.fetchmany(ARCHIVE_BLOCK_ROWS)
+                    if not batch:
+                        break
+                    rows = []
+                    for values in batch:
+                        row = dict(zip(ARCHIVE_COLUMNS, values))
+                        ids.append(row['id'])
+                        if row['id'] not in archived_ids:
+                            rows.append(row)
+                    if not rows:
+                        continue
+
+                    data = gzip.compress(
+                        ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+                    )
+                    f.write(data)
+
+                    first, last = _row_key(rows[0]), _row_key(rows[-1])
+                    if last_key is not None and first < last_key:
+                        index['sorted'] = False
+                    last_key = last
+                    index['blocks'].append({
+                        'offset': offset, 'length': len(data), 'rows': len(rows),
+                        'first': list(first), 'last': list(last)
+                    })
+                    for row in rows:
+                        index['levels'][row['level']] = index['levels'].get(row['level'], 0) + 1
+                        source = row['source'] or 'unknown'
+                        index['sources'][source] = index['sources'].get(source, 0) + 1
+                    index['rows'] += len(rows)
+                    offset += len(data)
+                    new_rows += len(rows)
+                    bytes_written += len(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if new_rows:
+            self._save_index(spider_id, day, index)
+        return new_rows, ids, bytes_written
+
+    def _delete_rows(self, ids, delete_chunk, pause):
+        """分批删除已归档的行，每批一个短事务"""
+        deleted = 0
+        with self.db.get_connection() as conn:
+            for i in range(0, len(ids), delete_chunk):
+                chunk = ids[i:i + delete_chunk]
+                cursor = conn.execute(
+                    f"DELETE FROM spider_logs WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+                )
+                conn.commit()
+                deleted += cursor.rowcount
+                if pause:
+                    time.sleep(pause)
+        return deleted
+
+    def delete_spider(self, spider_id):
+        """删除爬虫的全部归档"""
+        with self._lock:
+            shutil.rmtree(self._spider_dir(spider_id), ignore_errors=True)
+
+    def clear(self):
+        """删除全部归档"""
+        with self._lock:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def delete_before(self, day, spider_id=None):
+        """删除早于某天的归档段，返回 (删除的段数, 释放的字节数)"""
+        if spider_id is None:
+            try:
+                spider_ids = [
+                    int(name[len('spider_'):]) for name in os.listdir(self.base_dir)
+                    if name.startswith('spider_') and name[len('spider_'):].isdigit()
+                ]
+            except FileNotFoundError:
+                return 0, 0
+        else:
+            spider_ids = [spider_id]
+
+        segments = freed = 0
+        with self._lock:
+            for sid in spider_ids:
+                for archived_day in self.days(sid):
+                    if archived_day >= day:
+                        break
+                    for path in (self._index_path(sid, archived_day), self._segment_path(sid, archived_day)):
+                        try:
+                            freed += os.path.getsize(path)
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+                    segments += 1
+        return segments, freed
+
+    # 读取
+    def _read_block(self, segment_path, block):
+        with open(segment_path, 'rb') as f:
+            f.seek(block['offset'])
+            data = f.read(block['length'])
+        return [json.loads(line) for line in gzip.decompress(data).decode('utf-8').splitlines() if line]
+
+    def _iter_day(self, spider_id, day, descending, before=None, after=None):
+        """按 (timestamp, id) 顺序读取一天的归档，跳过键范围之外的块"""
+        index = self._load_index(spider_id, day)
+        if not index:
+            return
+        segment_path = self._segment_path(spider_id, day)
+        blocks = [
+            block for block in index['blocks']
+            if (before is None or tuple(block['first']) < before) and (after is None or tuple(block['last']) > after)
+        ]
+
+        if index['sorted']:
+            # 块之间有序时逐块解压，内存中最多保留一个块
+            for block in (reversed(blocks) if descending else blocks):
+                rows = self._read_block(segment_path, block)
+                yield from (reversed(rows) if descending else rows)
+        else:
+            rows = [row for block in blocks for row in self._read_block(segment_path, block)]
+            rows.sort(key=_row_key, reverse=descending)
+            yield from rows
+
+    def iter_logs(self, spider_id, start=None, end=None, level=None, source=None, execution_id=None,
+                  search=None, descending=True, before=None, after=None):
+        """按 (timestamp, id) 顺序遍历归档日志，过滤条件与日志列表接口一致
+
+        before/after 为 (timestamp, id) 键，用于游标分页；search 与日志搜索的语法和语义一致（见 search_matcher）。
+        """
+        before = tuple(before) if before else None
+        after = tuple(after) if after else None
+        matches = search_matcher(search) if search else None
+        days = self.days_in_range(spider_id, start, end)
+        if descending:
+            days.reverse()
+
+        for day in days:
+            day_start, day_end = _day_bounds(day)
+            if before is not None and before[0] < day_start:
+                continue
+            if after is not None and after[0] >= day_end:
+                continue
+            for row in self._iter_day(spider_id, day, descending, before, after):
+                key = _row_key(row)
+                if before is not None and key >= before:
+                    continue
+                if after is not None and key <= after:
+                    continue
+                if start and row['timestamp'] < start:
+                    if descending:
+                        return
+                    continue
+                if end and row['timestamp'] > end:
+                    if descending:
+                        continue
+                    return
+                if level and row['level'] != level:
+                    continue
+                if source and row['source'] != source:
+                    continue
+                if execution_id and row['execution_id'] != execution_id:
+                    continue
+                if matches and not matches(row['message']):
+                    continue
+                yield row
+
+    def statistics(self, spider_id, start=None, end=None):
+        """归档日志的总数、级别/来源分布和每日数量
+
+        完全落在时间范围内的日期直接使用索引计数，只有首尾不完整的日期需要解压。
+        """
+        stats = {'total': 0, 'levels': {}, 'sources': {}, 'daily': {}}
+        for day in self.days_in_range(spider_id, start, end):
+            day_start, day_end = _day_bounds(day)
+            if (start is None or start <= day_start) and (end is None or end >= day_end):
+                index = self._load_index(spider_id, day)
+                if not index:
+                    continue
+                levels, sources, count = index['levels'], index['sources'], index['rows']
+            else:
+                levels, sources, count = {}, {}, 0
+                for row in self._iter_day(spider_id, day, descending=False):
+                    if (start and row['timestamp'] < start) or (end and row['timestamp'] > end):
+                        continue
+                    levels[row['level']] = levels.get(row['level'], 0) + 1
+                    row_source = row['source'] or 'unknown'
+                    sources[row_source] = sources.get(row_source, 0) + 1
+                    count += 1
+
+            if not count:
+                continue
+            stats['total'] += count
+            stats['daily'][day] = stats['daily'].get(day, 0) + count
+            for name, value in levels.items():
+                stats['levels'][name] = stats['levels'].get(name, 0) + value
+            for name, value in sources.items():
+                stats['sources'][name] = stats['sources'].get(name, 0) + value
+        return stats
+
+    def count_logs(self, spider_id, start=None, end=None, level=None, source=None, execution_id=None, search=None):
+        """归档日志条数：只按级别或来源过滤时使用索引计数，否则逐行过滤"""
+        if execution_id or search or (level and source):
+            return sum(1 for _ in self.iter_logs(
+                spider_id, start, end, level=level, source=source, execution_id=execution_id, search=search
+            ))
+        stats = self.statistics(spider_id, start, end)
+        if level:
+            return stats['levels'].get(level, 0)
+        if source:
+            return stats['sources'].get(source, 0)
+        return stats['total']
+
+    def summary(self):
+        """归档目录的段数、行数和占用字节数"""
+        result = {'spiders': 0, 'segments': 0, 'rows': 0, 'bytes': 0}
+        try:
+            names = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not (name.startswith('spider_') and name[len('spider_'):].isdigit()):
+                continue
+            spider_id = int(name[len('spider_'):])
+            days = self.days(spider_id)
+            if days:
+                result['spiders'] += 1
+            for day in days:
+                index = self._load_index(spider_id, day)
+                result['segments'] += 1
+                result['rows'] += index['rows'] if index else 0
+                for path in (self._segment_path(spider_id, day), self._index_path(spider_id, day)):
+                    try:
+                        result['bytes'] += os.path.getsize(path)
+                    except FileNotFoundError:
+                        pass
+        return result
+
+
+def merge_logs(streams, descending=True):
+    """合并多个已按 (timestamp, id) 排序的日志序列"""
+    return heapq.merge(*streams, key=_row_key, reverse=descending)
+
+
+_log_archive = None
+_log_archive_lock = threading.Lock()
+
+
+def get_log_archive():
+    """获取全局日志归档实例"""
+    global _log_archive
+    with _log_archive_lock:
+        if _log_archive is None:
+            _log_archive = LogArchive()
+        return _log_archive
+
+
+def run_log_archive():
+    """按系统设置 logArchiveDays 执行一次归档（供定时任务调用）"""
+    try:
+        settings = get_db().get_system_settings()
+        return get_log_archive().archive(int(settings.get('logArchiveDays', 7)))
+    except Exception as e:
+        logger.error(f"Log archive job failed: {e}")
+        return None
@@ -0,0 +1,214 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+# 日志写入服务配置
+LOG_QUEUE_SIZE = 20000      # 队列容量，满时生产者阻塞（背压）
+LOG_BATCH_SIZE = 500        # 一次提交的最大行数
+LOG_FLUSH_INTERVAL = 0.2    # 批次中第一条日志最多等待的时间（秒）
+LOG_PUT_TIMEOUT = 5         # 生产者最长阻塞时间，超时后改为同步写入
+LOG_COMMIT_RETRIES = 5      # 数据库被锁定（归档、分批删除占用写锁）时的重试次数
+LOG_RETRY_BACKOFF = 0.2     # 首次重试前的等待（秒），之后每次加倍
+
+_STOP = object()
+
+
+def _is_transient(error):
+    """数据库被其他连接锁定等可以稍后重试的错误"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class LogWriter:
+    """后台日志写入服务
+
+    生产者（路由、爬虫运行器）把日志放入有界队列后立即返回，
+    单个写入线程按批次大小或等待时间将日志合并为一次事务提交。
+    """
+
+    def __init__(self, db=None, max_queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, put_timeout=LOG_PUT_TIMEOUT):
+        self.db = db or get_db()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'errors': 0,
+            'retries': 0,
+            'dropped': 0,
+            'blocked_puts': 0,
+            'sync_writes': 0,
+            'max_queue_depth': 0,
+            'commit_latency_total': 0.0,
+            'commit_latency_max': 0.0,
+            'commit_latency_last': 0.0,
+        }
+
+    def start(self):
+        """启动写入线程"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='log-writer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def write(self, spider_id, level, message, source=None, execution_id=None):
+        """异步写入一条日志"""
+        self._put((spider_id, level, message, source, execution_id))
+
+    def write_many(self, records):
+        """异步写入多条 (spider_id, level, message, source, execution_id) 日志"""
+        for record in records:
+            self._put(record)
+
+    def _put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # 队列已满：阻塞生产者等待写入线程追上
+            with self._lock:
+                self._stats['blocked_puts'] += 1
+            try:
+                self._queue.put(record, timeout=self.put_timeout)
+            except queue.Full:
+                # 写入线程长时间无法追上时直接同步写入，保证日志不丢失；
+                # 写入失败只计数，不抛给读取爬虫输出的线程（否则它停止读取管道，爬虫会被阻塞）
+                with self._lock:
+                    self._stats['sync_writes'] += 1
+                self._write_records([record])
+                return
+
+        with self._lock:
+            self._stats['enqueued'] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+
+    def _run(self):
+        """写入线程主循环：按大小或时间合并提交"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        written = self._write_records(batch)
+        if not written:
+            return
+
+        latency = time.perf_counter() - start
+        with self._lock:
+            self._stats['written'] += written
+            self._stats['batches'] += 1
+            self._stats['commit_latency_total'] += latency
+            self._stats['commit_latency_last'] = latency
+            self._stats['commit_latency_max'] = max(self._stats['commit_latency_max'], latency)
+
+    def _write_records(self, records):
+        """在一个事务中写入日志，返回写入的行数（不抛出异常）
+
+        数据库被锁定时按退避重试；其他错误可能由个别行引起，把批次拆半分别写入，
+        最终只丢弃单独写入仍然失败的行。重试用尽后仍被锁定时放弃整批（拆小同样会被锁定）。
+        """
+        delay = LOG_RETRY_BACKOFF
+        attempt = 0
+        while True:
+            try:
+                self.db.create_logs_bulk(records, chunk_size=len(records))
+                return len(records)
+            except Exception as e:
+                error = e
+            if not _is_transient(error) or attempt >= LOG_COMMIT_RETRIES:
+                break
+            attempt += 1
+            with self._lock:
+                self._stats['retries'] += 1
+            time.sleep(delay)
+            delay *= 2
+
+        if len(records) > 1 and not _is_transient(error):
+            middle = len(records) // 2
+            return self._write_records(records[:middle]) + self._write_records(records[middle:])
+
+        with self._lock:
+            self._stats['errors'] += 1
+            self._stats['dropped'] += len(records)
+        logger.error(f"Failed to write {len(records)} log records: {error}")
+        return 0
+
+    def flush(self, timeout=None):
+        """等待队列中已有的日志全部提交，超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stop(self, timeout=10):
+        """提交剩余日志并停止写入线程"""
+        thread = self._thread
+        if not thread or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self):
+        """写入服务指标"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['commit_latency_avg'] = stats['commit_latency_total'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    """获取全局日志写入服务（首次调用时启动，进程退出时自动刷新）"""
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = LogWriter()
+            _log_writer.start()
+            atexit.register(_log_writer.stop)
+        return _log_writer
@@ -0,0 +1,168 @@
+import collections
+import os
+import threading
+
+# 输出采集配置
+LOG_BATCH_LINES = 200       # 攒够多少行写入一次日志表
+LOG_FLUSH_INTERVAL = 1.0    # 输出较少时最多间隔多久写入一次（秒），由等待进程的线程驱动
+MAX_LINE_CHARS = 64 * 1024  # 单次读取的最大字符数，超长的行会拆成多条日志
+TAIL_CHARS = 64 * 1024      # 每个输出流在内存中保留的末尾字符数
+READER_JOIN_TIMEOUT = 5     # 进程退出后等待读取线程读完管道的时间（秒）
+
+
+class StreamCapture:
+    """在后台线程中逐行读取子进程的一个输出流
+
+    内容边读边追加到磁盘文件（首次有输出时才创建），内存中只保留末尾 TAIL_CHARS 个字符。
+    """
+
+    def __init__(self, pipe, file_path=None, on_line=None, max_line_chars=MAX_LINE_CHARS, track_json=False):
+        self.pipe = pipe
+        self.file_path = file_path
+        self.on_line = on_line
+        self.max_line_chars = max_line_chars
+        self.track_json = track_json
+        self.lines = 0          # 非空行数
+        self.bytes = 0          # 输出的 UTF-8 字节数
+        self.file_created = False
+        self.last_json = None   # 最后一个完整的 JSON 对象行（API 调用结果）
+        self._tail = collections.deque()
+        self._tail_chars = 0
+        self._thread = threading.Thread(target=self._read, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def tail(self):
+        """输出末尾的内容"""
+        return ''.join(self._tail)
+
+    def _append_tail(self, chunk):
+        self._tail.append(chunk)
+        self._tail_chars += len(chunk)
+        while self._tail_chars > TAIL_CHARS and len(self._tail) > 1:
+            self._tail_chars -= len(self._tail.popleft())
+
+    def _read(self):
+        output_file = None
+        try:
+            while True:
+                chunk = self.pipe.readline(self.max_line_chars) if self.max_line_chars else self.pipe.readline()
+                if not chunk:
+                    break
+                self.bytes += len(chunk.encode('utf-8', errors='replace'))
+                if self.file_path:
+                    if output_file is None:
+                        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+                        output_file = open(self.file_path, 'w', encoding='utf-8')
+                        self.file_created = True
+                    output_file.write(chunk)
+                self._append_tail(chunk)
+
+                line = chunk.strip()
+                if not line:
+                    continue
+                self.lines += 1
+                if self.track_json and line.startswith('{') and line.endswith('}'):
+                    self.last_json = line
+                if self.on_line:
+                    self.on_line(line)
+        except Exception as e:
+            print(f"Error reading process output: {e}")
+        finally:
+            if output_file is not None:
+                output_file.close()
+            try:
+                self.pipe.close()
+            except Exception:
+                pass
+
+
+class OutputCapture:
+    """流式采集子进程的 stdout/stderr
+
+    stdout 作为运行日志、stderr 作为错误日志按批写入日志表，同时追加到
+    log_dir 下的 {execution_id}_stdout.log / {execution_id}_stderr.log。
+    等待进程的线程应定期调用 flush()，进程结束后调用 finish()。
+    listener 不为空时每读到一行即以 (level, source, line) 调用，用于实时推送。
+    """
+
+    def __init__(self, process, spider_id=None, execution_id=None, log_writer=None, log_dir=None,
+                 item_pattern=None, max_line_chars=MAX_LINE_CHARS, track_json=False, listener=None):
+        self.spider_id = spider_id
+        self.execution_id = execution_id
+        self.log_writer = log_writer
+        self.listener = listener
+        self.item_pattern = item_pattern
+        self.item_count = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+        def file_path(log_type):
+            if not log_dir:
+                return None
+            return os.path.join(log_dir, f'{execution_id}_{log_type}.log')
+
+        self.stdout = StreamCapture(
+            process.stdout, file_path('stdout'), self._on_stdout_line, max_line_chars, track_json
+        )
+        self.stderr = StreamCapture(
+            process.stderr, file_path('stderr'), self._on_stderr_line, max_line_chars
+        )
+
+    def start(self):
+        self.stdout.start()
+        self.stderr.start()
+        return self
+
+    def _on_stdout_line(self, line):
+        if self.item_pattern:
+            match = self.item_pattern.search(line)
+            if match:
+                self.item_count += int(match.group(1))
+        self._add(line, 'INFO', 'spider_output')
+
+    def _on_stderr_line(self, line):
+        self._add(line, 'ERROR', 'spider_error')
+
+    def _add(self, line, level, source):
+        if self.listener:
+            self.listener(level, source, line)
+        if not self.log_writer:
+            return
+        with self._lock:
+            self._pending.append((self.spider_id, level, line, source, self.execution_id))
+            if len(self._pending) < LOG_BATCH_LINES:
+                return
+            records, self._pending = self._pending, []
+        self.log_writer.write_many(records)
+
+    def flush(self):
+        """把已读取但未写入的日志行写入日志表"""
+        with self._lock:
+            records, self._pending = self._pending, []
+        if records:
+            self.log_writer.write_many(records)
+
+    def finish(self):
+        """等待读取线程读完管道并写入剩余日志"""
+        self.stdout.join(READER_JOIN_TIMEOUT)
+        self.stderr.join(READER_JOIN_TIMEOUT)
+        self.flush()
+        return self
+
+    @property
+    def output_bytes(self):
+        return self.stdout.bytes + self.stderr.bytes
+
+    def output_files(self):
+        """已写出的输出日志文件 {log_type: path}"""
+        return {
+            log_type: stream.file_path
+            for log_type, stream in (('stdout', self.stdout), ('stderr', self.stderr))
+            if stream.file_created
+        }
@@ -0,0 +1,118 @@
+import base64
+import heapq
+import itertools
+import json
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误"""
+
+
+def encode_cursor(values, direction='next'):
+    """把排序键的值编码为不透明的游标字符串"""
+    payload = json.dumps({'k': list(values), 'd': direction}, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，返回 (排序键的值, 方向)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values = payload['k']
+        direction = payload.get('d', 'next')
+    except Exception:
+        raise InvalidCursor('Invalid pagination cursor')
+
+    if not isinstance(values, list) or direction not in ('next', 'prev'):
+        raise InvalidCursor('Invalid pagination cursor')
+    return values, direction
+
+
+def parse_bool(value, default=False):
+    """解析 true/false 形式的查询参数，未传入时返回默认值"""
+    if value is None or value == '':
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _parse_page_cursor(cursor, key_count):
+    """返回 (方向, 排序键的值)，无游标时为首页"""
+    if not cursor:
+        return 'next', None
+    values, direction = decode_cursor(cursor)
+    if len(values) != key_count:
+        raise InvalidCursor('Invalid pagination cursor')
+    return direction, values
+
+
+def keyset_rows(conn, select_sql, conditions, params, keys, direction, values, count):
+    """读取游标之后的 count 行：next 方向按排序键倒序，prev 方向按正序"""
+    conditions = list(conditions)
+    params = list(params)
+    if values is not None:
+        columns = ', '.join(expr for expr, _ in keys)
+        placeholders = ', '.join('?' for _ in keys)
+        comparison = '<' if direction == 'next' else '>'
+        conditions.append(f'({columns}) {comparison} ({placeholders})')
+        params.extend(values)
+
+    order = 'DESC' if direction == 'next' else 'ASC'
+    order_clause = ', '.join(f'{expr} {order}' for expr, _ in keys)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    cursor_obj = conn.cursor()
+    cursor_obj.execute(f'{select_sql} {where_clause} ORDER BY {order_clause} LIMIT ?', params + [count])
+    return [dict(row) for row in cursor_obj.fetchall()]
+
+
+def _finish_page(rows, limit, direction, cursor, names):
+    """截取一页并生成前后游标"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # 向前翻页时按正序读取紧邻游标的行，再反转为倒序
+    if direction == 'prev':
+        rows.reverse()
+
+    def key_of(row):
+        return [row[name] for name in names]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == 'next':
+            if has_more:
+                next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+            if cursor:
+                prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+        else:
+            next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+            if has_more:
+                prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+
+    return rows, next_cursor, prev_cursor
+
+
+def keyset_page(conn, select_sql, conditions, params, keys, limit, cursor=None):
+    """按排序键倒序进行游标分页
+
+    select_sql 为不含 WHERE 的 SELECT ... FROM ... 语句；keys 为 [(SQL表达式, 结果列名)]，
+    最后一个键必须唯一（通常是 id）。每页只读取 limit + 1 行，不依赖 OFFSET，
+    翻到多深的页耗时都相同。返回 (行列表, next_cursor, prev_cursor)：
+    next_cursor 指向更早的数据，prev_cursor 指向更新的数据，没有时为 None。
+    """
+    direction, values = _parse_page_cursor(cursor, len(keys))
+    rows = keyset_rows(conn, select_sql, conditions, params, keys, direction, values, limit + 1)
+    return _finish_page(rows, limit, direction, cursor, [name for _, name in keys])
+
+
+def merged_keyset_page(fetchers, names, limit, cursor=None):
+    """对多个数据源（如数据库热数据和归档）合并做游标分页
+
+    fetchers 中每个函数接收 (方向, 排序键的值, 行数)，按 keyset_rows 相同的顺序返回行；
+    names 为排序键在结果中的列名。返回值与 keyset_page 相同。
+    """
+    direction, values = _parse_page_cursor(cursor, len(names))
+    streams = [fetch(direction, values, limit + 1) for fetch in fetchers]
+    merged = heapq.merge(*streams, key=lambda row: [row[name] for name in names], reverse=direction == 'next')
+    rows = list(itertools.islice(merged, limit + 1))
+    return _finish_page(rows, limit, direction, cursor, names)
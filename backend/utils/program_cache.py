@@ -0,0 +1,174 @@
+import hashlib
+import importlib.util
+import json
+import os
+import py_compile
+import threading
+import time
+import uuid
+
+# 程序缓存配置
+PROGRAM_CACHE_DIR = 'program_cache'
+PROGRAM_CACHE_MAX_ENTRIES = 512               # 最多缓存的程序数
+PROGRAM_CACHE_MAX_BYTES = 128 * 1024 * 1024   # 缓存目录的最大总字节数
+PROGRAM_CACHE_TEMP_MAX_AGE = 600              # 超过该时间（秒）的临时文件视为进程中途退出遗留
+
+
+class ProgramCache:
+    """按内容寻址的爬虫程序缓存
+
+    生成的包装源码和编译好的字节码以 (类型, 模板版本, 内容, 解释器版本) 的哈希为名
+    保存在缓存目录中。相同代码和配置的运行直接复用 .pyc，不再生成源码、写临时文件
+    和编译；.py 与 .pyc 放在一起，异常堆栈仍能显示源码行。按最近使用时间淘汰。
+    """
+
+    def __init__(self, base_dir=PROGRAM_CACHE_DIR, max_entries=PROGRAM_CACHE_MAX_ENTRIES,
+                 max_bytes=PROGRAM_CACHE_MAX_BYTES):
+        self.base_dir = os.path.abspath(base_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _digest(self, kind, version, parts):
+        payload = json.dumps([kind, version, parts], sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha256(payload.encode('utf-8'))
+        # 字节码与解释器版本相关
+        digest.update(importlib.util.MAGIC_NUMBER)
+        return digest.hexdigest()[:32]
+
+    def get_program(self, kind, version, parts, build):
+        """返回可直接交给解释器执行的程序路径
+
+        parts 为决定生成结果的全部内容（用户代码、配置等），build 在未命中时生成源码。
+        用户代码有语法错误时返回 .py，由解释器照常报告错误。
+        """
+        name = f'{kind}_{self._digest(kind, version, parts)}'
+        source_path = os.path.join(self.base_dir, name + '.py')
+        compiled_path = os.path.join(self.base_dir, name + '.pyc')
+
+        # 没有 .pyc 但有 .py 说明用户代码无法编译，同样视为命中
+        cached = compiled_path if os.path.exists(compiled_path) else source_path
+        try:
+            # 更新使用时间用于 LRU 淘汰
+            os.utime(source_path)
+            if cached == compiled_path:
+                os.utime(compiled_path)
+            with self._lock:
+                self._stats['hits'] += 1
+            return cached
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self._stats['misses'] += 1
+        os.makedirs(self.base_dir, exist_ok=True)
+        self._write_atomic(source_path, build().encode('utf-8'))
+
+        temp_compiled = f'{compiled_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            py_compile.compile(source_path, cfile=temp_compiled, dfile=source_path, doraise=True)
+            os.replace(temp_compiled, compiled_path)
+            program = compiled_path
+        except py_compile.PyCompileError:
+            program = source_path
+        finally:
+            if os.path.exists(temp_compiled):
+                os.unlink(temp_compiled)
+
+        self._evict()
+        return program
+
+    def _write_atomic(self, path, content):
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def _entries(self):
+        """缓存中的程序 {名称: (最近使用时间, 总字节数, [文件路径])}"""
+        entries = {}
+        try:
+            names = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return entries
+        for filename in names:
+            stem, ext = os.path.splitext(filename)
+            if ext not in ('.py', '.pyc'):
+                continue
+            path = os.path.join(self.base_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            used_at, size, paths = entries.get(stem, (0, 0, []))
+            entries[stem] = (max(used_at, stat.st_mtime), size + stat.st_size, paths + [path])
+        return entries
+
+    def _sweep_temp(self, max_age=PROGRAM_CACHE_TEMP_MAX_AGE):
+        """删除写入或编译时进程被终止而遗留的 .tmp 文件（正在写入的临时文件较新，不受影响）"""
+        try:
+            names = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return
+        cutoff = time.time() - max_age
+        for filename in names:
+            if not filename.endswith('.tmp'):
+                continue
+            path = os.path.join(self.base_dir, filename)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        """超出数量或大小上限时删除最久未使用的程序，同时清理遗留的临时文件"""
+        self._sweep_temp()
+        entries = self._entries()
+        total_bytes = sum(size for _, size, _ in entries.values())
+        if len(entries) <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        count = len(entries)
+        for stem, (_, size, paths) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            count -= 1
+            total_bytes -= size
+            with self._lock:
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            stats = dict(self._stats)
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries.values())
+        return stats
+
+    def clear(self):
+        self._sweep_temp()
+        for _, _, paths in self._entries().values():
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+
+_program_cache = None
+_program_cache_lock = threading.Lock()
+
+
+def get_program_cache():
+    """获取全局程序缓存"""
+    global _program_cache
+    with _program_cache_lock:
+        if _program_cache is None:
+            _program_cache = ProgramCache()
+        return _program_cache
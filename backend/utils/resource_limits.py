@@ -0,0 +1,155 @@
+"""
+爬虫进程的资源限制与资源用量统计
+
+限制通过 setrlimit 在子进程执行爬虫代码之前设置（冷启动时经 preexec_fn，
+fork 服务启动时在 fork 出的子进程中设置），用量取自回收子进程时 wait4 返回的 rusage。
+只依赖标准库，fork 服务以脚本方式运行时也会导入本模块；Windows 上没有 resource 模块，
+限制不生效，也不统计用量。
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 可配置的限制：{名称: (系统设置项, rlimit 名称, 换算倍数)}，值为 0 表示不限制
+LIMIT_SETTINGS = {
+    'cpu_seconds': ('spiderCpuLimitSeconds', 'RLIMIT_CPU', 1),
+    'memory_mb': ('spiderMemoryLimitMB', 'RLIMIT_AS', 1024 * 1024),
+    'open_files': ('spiderMaxOpenFiles', 'RLIMIT_NOFILE', 1),
+}
+# CPU 时间超过软限制时进程先收到 SIGXCPU，再多用这么多秒后被内核 SIGKILL
+CPU_HARD_LIMIT_GRACE = 5
+
+# 写入执行记录的用量字段
+USAGE_COLUMNS = ('cpu_user', 'cpu_system', 'max_rss_kb', 'io_read_blocks', 'io_write_blocks')
+
+
+def is_supported():
+    """当前平台是否支持资源限制和用量统计"""
+    return resource is not None
+
+
+def resolve_limits(system_settings, spider_config=None):
+    """合并系统默认限制和爬虫配置中的 resource_limits，返回生效的限制 {名称: 值}
+
+    爬虫配置的值优先；值为 0 或无效时不限制该项。
+    """
+    if isinstance(spider_config, str):
+        try:
+            spider_config = json.loads(spider_config)
+        except ValueError:
+            spider_config = {}
+    if not isinstance(spider_config, dict):
+        spider_config = {}
+    overrides = spider_config.get('resource_limits') or {}
+    if not isinstance(overrides, dict):
+        overrides = {}
+
+    limits = {}
+    for name, (setting, _, _) in LIMIT_SETTINGS.items():
+        value = overrides.get(name, (system_settings or {}).get(setting, 0))
+        try:
+            value = int(value or 0)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            limits[name] = value
+    return limits
+
+
+def apply_limits(limits):
+    """在子进程中设置资源限制（只会收紧，不会超过进程当前的硬限制）"""
+    if resource is None:
+        return
+    for name, value in (limits or {}).items():
+        if name not in LIMIT_SETTINGS:
+            continue
+        _, rlimit_name, scale = LIMIT_SETTINGS[name]
+        rlimit = getattr(resource, rlimit_name)
+        soft = int(value) * scale
+        hard = soft + CPU_HARD_LIMIT_GRACE if name == 'cpu_seconds' else soft
+        _, current_hard = resource.getrlimit(rlimit)
+        if current_hard != resource.RLIM_INFINITY:
+            hard = min(hard, current_hard)
+            soft = min(soft, hard)
+        resource.setrlimit(rlimit, (soft, hard))
+
+
+def make_preexec_fn(limits):
+    """返回用于 subprocess.Popen 的 preexec_fn，不需要限制时返回 None"""
+    if resource is None or not limits:
+        return None
+    return lambda: apply_limits(limits)
+
+
+def rusage_dict(rusage):
+    """把 wait4 返回的 struct rusage 转换为可序列化的字典"""
+    return {
+        'utime': rusage.ru_utime,
+        'stime': rusage.ru_stime,
+        'maxrss': rusage.ru_maxrss,
+        'minflt': rusage.ru_minflt,
+        'majflt': rusage.ru_majflt,
+        'inblock': rusage.ru_inblock,
+        'oublock': rusage.ru_oublock,
+        'nvcsw': rusage.ru_nvcsw,
+        'nivcsw': rusage.ru_nivcsw,
+    }
+
+
+def usage_fields(rusage):
+    """由 rusage 字典生成执行记录的用量字段，没有用量时返回空字典"""
+    if not rusage:
+        return {}
+    # macOS 的 ru_maxrss 单位为字节，Linux 为 KB
+    max_rss = rusage.get('maxrss', 0)
+    if sys.platform == 'darwin':
+        max_rss //= 1024
+    return {
+        'cpu_user': round(rusage.get('utime', 0), 3),
+        'cpu_system': round(rusage.get('stime', 0), 3),
+        'max_rss_kb': max_rss,
+        'io_read_blocks': rusage.get('inblock', 0),
+        'io_write_blocks': rusage.get('oublock', 0),
+    }
+
+
+def describe_limit_exit(returncode, limits, usage=None):
+    """进程因超出资源限制被终止时返回说明，否则返回 None"""
+    if resource is None or not limits or returncode is None or returncode >= 0:
+        return None
+    cpu_limit = limits.get('cpu_seconds')
+    if cpu_limit:
+        cpu_used = (usage or {}).get('cpu_user', 0) + (usage or {}).get('cpu_system', 0)
+        if returncode == -signal.SIGXCPU or (returncode == -signal.SIGKILL and cpu_used >= cpu_limit):
+            return f'CPU time limit exceeded ({cpu_limit}s)'
+    return None
+
+
+class AccountedPopen(subprocess.Popen):
+    """回收子进程时使用 wait4，在 rusage 属性中保存子进程的资源用量
+
+    与 fork 服务启动的进程一致：进程结束后 rusage 为 rusage_dict() 的结果；
+    不支持 wait4 的平台上为 None。
+    """
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        if not hasattr(os, 'wait4'):
+            return super()._try_wait(wait_flags)
+        try:
+            pid, status, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            # 子进程已被其他地方回收，无法得知退出状态
+            return self.pid, 0
+        if pid == self.pid:
+            self.rusage = rusage_dict(rusage)
+        return pid, status
@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from database import get_db
+from utils.log_archive import get_log_archive
+from utils.log_writer import get_log_writer
+
+logger = logging.getLogger(__name__)
+
+# 保留策略配置
+RETENTION_BATCH_SIZE = 1000        # 每个删除事务的行数
+RETENTION_BATCH_PAUSE = 0.05       # 批次之间的固定停顿（秒）
+RETENTION_MAX_QUEUE_DEPTH = 2000   # 日志写入队列积压超过该值时暂停清理
+RETENTION_MAX_BACKOFF = 5.0        # 每批之后因积压等待的最长时间（秒）
+VACUUM_PAGES_PER_STEP = 1000       # 每次 incremental_vacuum 归还的页数
+MANAGED_FILE_ROOTS = ('spider_files', 'spider_logs')  # 允许删除文件的目录，用户上传的文件不在其中
+
+
+def _utc_cutoff(days):
+    return (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class RetentionEngine:
+    """按系统设置清理过期数据并压缩数据库
+
+    logRetentionDays 作用于日志（数据库和归档）、爬虫输出日志文件、执行记录和运行统计，
+    fileRetentionDays 作用于爬虫生成的文件。所有删除都分批提交，每批之后检查
+    日志写入队列的积压，积压时让路给正在运行的爬虫。
+    """
+
+    def __init__(self, db=None, batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_BATCH_PAUSE):
+        self.db = db or get_db()
+        self.batch_size = batch_size
+        self.pause = pause
+        self.last_report = None
+        self._run_lock = threading.Lock()
+
+    def _throttle(self):
+        """批次之间停顿，日志写入积压时继续等待"""
+        if self.pause:
+            time.sleep(self.pause)
+        log_writer = get_log_writer()
+        deadline = time.monotonic() + RETENTION_MAX_BACKOFF
+        while log_writer.stats()['queue_depth'] > RETENTION_MAX_QUEUE_DEPTH and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+    def is_running(self):
+        return self._run_lock.locked()
+
+    def run(self, log_days=None, file_days=None, full_vacuum=False):
+        """执行一次清理，返回报告；已有清理在运行时返回 None
+
+        full_vacuum 为 True 时，对尚未启用增量自动清理的旧数据库执行一次完整 VACUUM
+        （会重写整个数据库文件并在期间阻塞写入，只应手动触发）。
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            settings = self.db.get_system_settings()
+            log_days = int(log_days or settings.get('logRetentionDays', 30))
+            file_days = int(file_days or settings.get('fileRetentionDays', 90))
+            return self._run(log_days, file_days, full_vacuum)
+        finally:
+            self._run_lock.release()
+
+    def _run(self, log_days, file_days, full_vacuum):
+        started = time.monotonic()
+        size_before = self._storage_size()
+        log_cutoff = _utc_cutoff(log_days)
+        file_cutoff = _utc_cutoff(file_days)
+        report = {
+            'started_at': datetime.utcnow().isoformat(),
+            'log_retention_days': log_days,
+            'file_retention_days': file_days,
+            'log_cutoff': log_cutoff,
+            'file_cutoff': file_cutoff,
+        }
+
+        # 日志：数据库中的热数据和归档段
+        report['logs_deleted'] = self.db.delete_in_batches(
+            'spider_logs', 'timestamp < ?', (log_cutoff,),
+            batch_size=self.batch_size, throttle=self._throttle
+        )
+        segments, archive_bytes = get_log_archive().delete_before(log_cutoff[:10])
+        report['archive_segments_deleted'] = segments
+        report['archive_bytes_freed'] = archive_bytes
+
+        # 文件：爬虫输出日志文件按日志保留天数，其余生成文件按文件保留天数
+        log_files = self._purge_files("file_type = 'log'", log_cutoff)
+        data_files = self._purge_files("(file_type IS NULL OR file_type != 'log')", file_cutoff)
+        report['file_rows_deleted'] = log_files[0] + data_files[0]
+        report['files_unlinked'] = log_files[1] + data_files[1]
+        report['file_bytes_freed'] = log_files[2] + data_files[2]
+        report['dirs_removed'] = self._remove_empty_dirs()
+
+        # 运行历史
+        report['executions_deleted'] = self.db.delete_in_batches(
+            'spider_executions', 'started_at < ?', (log_cutoff,),
+            batch_size=self.batch_size, throttle=self._throttle
+        )
+        with self.db.get_connection() as conn:
+            # 运行统计的小时为本地时间
+            local_cutoff = (datetime.now() - timedelta(days=log_days)).strftime('%Y-%m-%d %H:00:00')
+            cursor = conn.execute('DELETE FROM spider_run_stats WHERE hour < ?', (local_cutoff,))
+            conn.commit()
+            report['run_stats_deleted'] = cursor.rowcount
+
+        # 压缩数据库
+        report['database'] = self._compact(full_vacuum)
+        size_after = self._storage_size()
+        report['database']['size_before'] = size_before
+        report['database']['size_after'] = size_after
+
+        report['reclaimed_bytes'] = (
+            max(size_before - size_after, 0) + report['archive_bytes_freed'] + report['file_bytes_freed']
+        )
+        report['duration'] = round(time.monotonic() - started, 3)
+        report['finished_at'] = datetime.utcnow().isoformat()
+        self.last_report = report
+
+        logger.info(
+            f"Retention removed {report['logs_deleted']} logs, {report['file_rows_deleted']} files, "
+            f"{report['executions_deleted']} executions; reclaimed {report['reclaimed_bytes']} bytes "
+            f"in {report['duration']}s"
+        )
+        return report
+
+    def _is_managed(self, path):
+        """文件是否位于爬虫生成的目录中"""
+        abs_path = os.path.abspath(path)
+        return any(abs_path.startswith(os.path.abspath(root) + os.sep) for root in MANAGED_FILE_ROOTS)
+
+    def _purge_files(self, type_condition, cutoff):
+        """删除过期的文件记录及磁盘文件，返回 (删除的记录数, 删除的文件数, 释放的字节数)"""
+        rows_deleted = files_unlinked = bytes_freed = 0
+        last_id = 0
+        while True:
+            with self.db.get_connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT id, file_path FROM spider_files
+                    WHERE id > ? AND created_at < ? AND {type_condition}
+                    ORDER BY id LIMIT ?
+                ''', (last_id, cutoff, self.batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+
+            ids = []
+            for row in rows:
+                path = row['file_path']
+                if not path or not self._is_managed(path):
+                    continue
+                size = _file_size(path)
+                try:
+                    os.remove(path)
+                    files_unlinked += 1
+                    bytes_freed += size
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    # 删除失败时保留记录，下次再试
+                    logger.warning(f"Failed to remove expired file {path}: {e}")
+                    continue
+                ids.append(row['id'])
+
+            if ids:
+                with self.db.get_connection() as conn:
+                    conn.execute(f"DELETE FROM spider_files WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+                    conn.commit()
+                rows_deleted += len(ids)
+            self._throttle()
+
+        return rows_deleted, files_unlinked, bytes_freed
+
+    def _remove_empty_dirs(self):
+        """删除生成目录中的空子目录（保留根目录）"""
+        removed = 0
+        for root in MANAGED_FILE_ROOTS:
+            if not os.path.isdir(root):
+                continue
+            for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+                if os.path.abspath(dirpath) == os.path.abspath(root):
+                    continue
+                try:
+                    if not os.listdir(dirpath):
+                        os.rmdir(dirpath)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _storage_size(self):
+        """数据库文件和 WAL 文件的总字节数"""
+        return _file_size(self.db.db_path) + _file_size(self.db.db_path + '-wal')
+
+    def _compact(self, full_vacuum):
+        """归还空闲页并更新查询优化器统计"""
+        result = {'pages_vacuumed': 0, 'full_vacuum': False}
+        with self.db.get_connection() as conn:
+            auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            freelist_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            result['auto_vacuum'] = {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum, auto_vacuum)
+            result['freelist_before'] = freelist_before
+
+            if auto_vacuum == 2:
+                # 分步归还空闲页，每步之后让出写锁
+                while True:
+                    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                    if not freelist:
+                        break
+                    step = min(freelist, VACUUM_PAGES_PER_STEP)
+                    # execute() 对不返回列的语句只执行一步（只归还一页），executescript 会执行到结束
+                    conn.executescript(f'PRAGMA incremental_vacuum({step});')
+                    result['pages_vacuumed'] += step
+                    self._throttle()
+            elif full_vacuum and freelist_before:
+                # 连接已设置 auto_vacuum=INCREMENTAL，VACUUM 之后即切换为增量模式
+                conn.execute('VACUUM')
+                result['full_vacuum'] = True
+
+            conn.execute('PRAGMA optimize')
+            # 把 WAL 中的内容写回主库并截断 WAL 文件，使文件尺寸真正缩小
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            result['freelist_after'] = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return result
+
+
+_retention_engine = None
+_retention_engine_lock = threading.Lock()
+
+
+def get_retention_engine():
+    """获取全局保留策略引擎"""
+    global _retention_engine
+    with _retention_engine_lock:
+        if _retention_engine is None:
+            _retention_engine = RetentionEngine()
+        return _retention_engine
+
+
+def run_retention():
+    """按系统设置执行一次清理（供定时任务调用）"""
+    try:
+        return get_retention_engine().run()
+    except Exception as e:
+        logger.error(f"Retention job failed: {e}")
+        return None
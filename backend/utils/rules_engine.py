@@ -0,0 +1,782 @@
+"""
+规则爬虫引擎
+
+规则模式的爬虫（config.type == 'rules'）只有固定的流程：请求页面、解析 HTML、按规则列表
+提取字段。这里在调用线程（执行队列的工作线程）中直接完成，不再为每次调用生成程序并启动
+解释器。返回结果的格式与原先子进程输出的 JSON 相同。
+
+配置了 URL 列表、URL 模板或下一页链接时，在一个事件循环中并发抓取各页面，每个页面到达后
+立即提取，结果按页面顺序合并。
+
+页面只用 lxml 解析一次：CSS 规则经 cssselect 转换为 XPath，与 XPath 规则一起编译为
+etree.XPath 并按规则集缓存。选择器无法转换（或未安装 cssselect）时退回 BeautifulSoup 提取。
+
+requests 请求使用 spider_runtime 的会话（连接池、keep-alive 和压缩），失败重试仍由这里按
+规则配置的 retries/delay 进行，会话本身不自动重试。传入 HttpCache 时发送条件请求，
+跳过未变化页面模式下，服务器返回 304 的页面直接使用上次的提取结果。
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+from lxml import html, etree
+
+from utils import spider_runtime
+
+try:
+    import aiohttp
+except ImportError:  # 未安装 aiohttp 时在线程池中用 requests 并发请求
+    aiohttp = None
+
+try:
+    import cssselect
+    from cssselect import HTMLTranslator
+    from cssselect.parser import CombinedSelector
+except ImportError:  # 未安装 cssselect 时只使用 BeautifulSoup 提取
+    HTMLTranslator = None
+
+# 每个线程编译规则集的缓存条数（编译好的 XPath 对象不在线程之间共享）
+COMPILED_RULES_CACHE_SIZE = 128
+
+# 多页面抓取的默认值，括号中为规则配置里覆盖默认值的键
+CRAWL_CONCURRENCY = 8            # 同时进行的请求数（concurrency）
+CRAWL_PER_HOST_CONCURRENCY = 4   # 同一主机同时进行的请求数（per_host_concurrency）
+CRAWL_MAX_FOLLOW_PAGES = 100     # 最多沿下一页链接抓取的页数（max_pages）
+CRAWL_MAX_PAGES = 1000           # URL 列表和模板生成的页面数上限
+
+# 每个线程复用一个会话和编译好的规则集，连续调用同一站点时复用连接
+_local = threading.local()
+
+
+class RulesTimeout(Exception):
+    """规则爬虫超过了执行时间"""
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = spider_runtime.create_session(retries=0)
+        _local.session = session
+    return session
+
+
+def _stats_delta(before, after):
+    return {
+        'http_requests': after['requests'] - before['requests'],
+        'http_connections': after['connections'] - before['connections'],
+    }
+
+
+def _remaining(deadline):
+    """距离截止时间的秒数，已超时时抛出 RulesTimeout"""
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise RulesTimeout()
+    return remaining
+
+
+def fetch_page(url, headers=None, timeout=30, retries=3, delay=1, deadline=None, log=None):
+    """请求页面并返回响应文本，失败时按 delay 间隔重试，最终失败返回 None"""
+    response = _fetch_response(url, headers, timeout, retries, delay, deadline, log)
+    return response.text if response is not None else None
+
+
+def _fetch_response(url, headers=None, timeout=30, retries=3, delay=1, deadline=None, log=None):
+    log = log or (lambda level, message: None)
+    for attempt in range(retries + 1):
+        remaining = _remaining(deadline)
+        request_timeout = timeout if remaining is None else min(timeout, remaining)
+        try:
+            response = _session().get(url, headers=headers, timeout=request_timeout)
+            response.raise_for_status()
+            return response
+        except Exception as e:
+            if attempt < retries:
+                log('WARNING', f'请求失败，第{attempt + 1}次重试: {str(e)}')
+                remaining = _remaining(deadline)
+                time.sleep(delay if remaining is None else min(delay, remaining))
+            else:
+                _remaining(deadline)
+                log('ERROR', f'请求最终失败: {str(e)}')
+    return None
+
+
+def _extract_xpath(element, extract_type, attr_name):
+    if extract_type == 'text':
+        if hasattr(element, 'text_content'):
+            return element.text_content().strip()
+        return str(element).strip()
+    if extract_type == 'attr' and attr_name:
+        if hasattr(element, 'get'):
+            return element.get(attr_name, '')
+        return ''
+    if extract_type == 'html':
+        if hasattr(element, 'text_content'):
+            return etree.tostring(element, encoding='unicode')
+        return str(element)
+    return None
+
+
+def _extract_css(element, extract_type, attr_name):
+    if extract_type == 'text':
+        return element.get_text().strip()
+    if extract_type == 'attr' and attr_name:
+        return element.get(attr_name, '')
+    if extract_type == 'html':
+        return str(element)
+    return None
+
+
+def _extract_item(rules, soup, tree, base_element=None, log=None):
+    """按规则提取一条数据；base_element 不为空时在该元素的上下文中查找"""
+    item = {}
+    for rule in rules:
+        field = rule.get('field', '')
+        selector = rule.get('selector', '')
+        selector_type = rule.get('selectorType', 'css')
+        extract_type = rule.get('type', 'text')
+        attr_name = rule.get('attr', '')
+
+        if not field or not selector:
+            continue
+
+        try:
+            if selector_type == 'xpath':
+                # 在当前元素的上下文中查找，元素不支持 xpath 时全局查找
+                if base_element is not None and hasattr(base_element, 'xpath'):
+                    elements = base_element.xpath(selector)
+                else:
+                    elements = tree.xpath(selector)
+                if elements:
+                    value = _extract_xpath(elements[0], extract_type, attr_name)
+                    if value is not None:
+                        item[field] = value
+            else:
+                if base_element is None:
+                    elements = soup.select(selector)
+                else:
+                    elements = base_element.select(selector)
+                    # 当前元素中没找到时，检查当前元素本身是否匹配
+                    if not elements and base_element.select_one(selector.split()[-1]):
+                        elements = [base_element]
+                if elements:
+                    value = _extract_css(elements[0], extract_type, attr_name)
+                    if value is not None:
+                        item[field] = value
+        except Exception as e:
+            if log:
+                log('ERROR', f'提取字段 {field} 时出错: {str(e)}')
+            item[field] = ''
+    return item
+
+
+def extract_data_by_rules(soup, tree, rules, log=None):
+    """根据规则提取数据（BeautifulSoup 路径，规则无法编译时使用）
+
+    用第一个规则匹配到的所有元素作为数据项，在每个元素的上下文中提取各字段；
+    第一个规则没有匹配时在整个页面中提取一条数据。
+    """
+    results = []
+    if not rules:
+        return results
+
+    first_rule = rules[0]
+    try:
+        if first_rule.get('selectorType') == 'xpath':
+            base_elements = tree.xpath(first_rule['selector'])
+        else:
+            base_elements = soup.select(first_rule['selector'])
+    except Exception as e:
+        if log:
+            kind = 'XPath' if first_rule.get('selectorType') == 'xpath' else 'CSS'
+            log('ERROR', f'{kind}选择器错误: {str(e)}')
+        return results
+
+    if not base_elements:
+        item = _extract_item(rules, soup, tree, log=log)
+        if item:
+            results.append(item)
+        return results
+
+    for base_element in base_elements:
+        item = _extract_item(rules, soup, tree, base_element, log=log)
+        if item:
+            results.append(item)
+    return results
+
+
+def _ancestor_step(translator, tree):
+    """把只含后代和子元素组合符的选择器转换为“目标元素[祖先条件]”形式的 XPath 步骤
+
+    cssselect 的转换结果（a/descendant-or-self::*/b）在 libxml2 中从每个中间节点分别求值再合并，
+    大页面上耗时随节点数平方增长；写成 b[ancestor::a] 只需扫描一遍文档。
+    """
+    if isinstance(tree, CombinedSelector):
+        left = _ancestor_step(translator, tree.selector)
+        right = _ancestor_step(translator, tree.subselector)
+        axis = 'parent' if tree.combinator == '>' else 'ancestor'
+        return f'{right}[{axis}::{left}]'
+    return str(translator.xpath(tree))
+
+
+def _css_xpath(translator, selector):
+    """把 CSS 选择器编译为在整个文档上求值的 XPath"""
+    selectors = cssselect.parse(selector)
+    if any(part.pseudo_element for part in selectors):
+        raise ValueError(f'Pseudo-elements are not supported: {selector}')
+    if all(combinator in (' ', '>') for combinator in _combinators(selectors)):
+        expression = ' | '.join(
+            'descendant-or-self::' + _ancestor_step(translator, part.parsed_tree) for part in selectors
+        )
+    else:
+        # 含兄弟组合符（+、~）时使用 cssselect 的转换
+        expression = translator.css_to_xpath(selector)
+    return etree.XPath(expression)
+
+
+def _combinators(selectors):
+    for part in selectors:
+        tree = part.parsed_tree
+        while isinstance(tree, CombinedSelector):
+            yield tree.combinator
+            tree = tree.selector
+
+
+def _compile(rules):
+    """把规则集编译为 {'base': XPath, 'base_type': 类型, 'fields': [...]}，无法编译时返回 None"""
+    if HTMLTranslator is None:
+        return None
+    translator = HTMLTranslator()
+    try:
+        compiled = {'base': None, 'base_type': None, 'fields': []}
+        if rules:
+            first_rule = rules[0]
+            compiled['base_type'] = 'xpath' if first_rule.get('selectorType') == 'xpath' else 'css'
+            if compiled['base_type'] == 'xpath':
+                compiled['base'] = etree.XPath(first_rule['selector'])
+            else:
+                compiled['base'] = _css_xpath(translator, first_rule['selector'])
+        for rule in rules:
+            field = rule.get('field', '')
+            selector = rule.get('selector', '')
+            if not field or not selector:
+                continue
+            entry = {
+                'field': field,
+                'selector_type': 'xpath' if rule.get('selectorType', 'css') == 'xpath' else 'css',
+                'type': rule.get('type', 'text'),
+                'attr': rule.get('attr', '')
+            }
+            if entry['selector_type'] == 'xpath':
+                entry['xpath'] = etree.XPath(selector)
+            else:
+                entry['xpath'] = _css_xpath(translator, selector)
+                # 数据项中没有匹配时，数据项包含与最后一段选择器匹配的元素则取数据项本身
+                entry['last_xpath'] = _css_xpath(translator, selector.split()[-1])
+            compiled['fields'].append(entry)
+        return compiled
+    except Exception:
+        return None
+
+
+def compile_rules(rules):
+    """获取规则集编译后的 XPath（按规则内容缓存），无法编译时返回 None"""
+    key = json.dumps(rules, sort_keys=True, ensure_ascii=False)
+    cache = getattr(_local, 'compiled_rules', None)
+    if cache is None:
+        cache = _local.compiled_rules = {}
+    if key not in cache:
+        if len(cache) >= COMPILED_RULES_CACHE_SIZE:
+            cache.clear()
+        cache[key] = _compile(rules)
+    return cache[key]
+
+
+def _first_descendant_matches(xpath, tree, bases):
+    """在整个文档中求值 CSS 规则，返回 {数据项元素: 其后代中按文档顺序第一个匹配的元素}
+
+    与在每个数据项中分别查找的结果相同，但整个文档只求值一次。
+    """
+    first = {}
+    for match in xpath(tree):
+        for ancestor in match.iterancestors():
+            if ancestor in bases and ancestor not in first:
+                first[ancestor] = match
+    return first
+
+
+def _css_value(element, extract_type, attr_name):
+    if extract_type == 'text':
+        return element.text_content().strip()
+    if extract_type == 'attr' and attr_name:
+        return element.get(attr_name, '')
+    if extract_type == 'html':
+        return etree.tostring(element, encoding='unicode', with_tail=False)
+    return None
+
+
+def extract_with_lxml(tree, compiled, log=None):
+    """用编译好的规则集从 lxml 文档中提取数据，结果与 extract_data_by_rules 相同"""
+    results = []
+    if compiled['base'] is None:
+        return results
+
+    try:
+        base_elements = compiled['base'](tree)
+    except Exception as e:
+        if log:
+            kind = 'XPath' if compiled['base_type'] == 'xpath' else 'CSS'
+            log('ERROR', f'{kind}选择器错误: {str(e)}')
+        return results
+
+    if not base_elements:
+        # 在整个页面中提取一条数据
+        item = {}
+        for entry in compiled['fields']:
+            try:
+                elements = entry['xpath'](tree)
+                if elements:
+                    if entry['selector_type'] == 'xpath':
+                        value = _extract_xpath(elements[0], entry['type'], entry['attr'])
+                    else:
+                        value = _css_value(elements[0], entry['type'], entry['attr'])
+                    if value is not None:
+                        item[entry['field']] = value
+            except Exception as e:
+                if log:
+                    log('ERROR', f'提取字段 {entry["field"]} 时出错: {str(e)}')
+                item[entry['field']] = ''
+        if item:
+            results.append(item)
+        return results
+
+    bases = set(element for element in base_elements if isinstance(element, etree._Element))
+    # CSS 规则在整个文档中只求值一次，再按祖先归属到各数据项
+    css_matches = {}
+    for entry in compiled['fields']:
+        if entry['selector_type'] == 'css':
+            try:
+                css_matches[entry['field']] = (
+                    _first_descendant_matches(entry['xpath'], tree, bases),
+                    _first_descendant_matches(entry['last_xpath'], tree, bases)
+                )
+            except Exception as e:
+                if log:
+                    log('ERROR', f'提取字段 {entry["field"]} 时出错: {str(e)}')
+                css_matches[entry['field']] = None
+
+    for base_element in base_elements:
+        item = {}
+        for entry in compiled['fields']:
+            field = entry['field']
+            try:
+                if entry['selector_type'] == 'xpath':
+                    if isinstance(base_element, etree._Element):
+                        elements = entry['xpath'](base_element)
+                    else:
+                        elements = entry['xpath'](tree)
+                    if elements:
+                        value = _extract_xpath(elements[0], entry['type'], entry['attr'])
+                        if value is not None:
+                            item[field] = value
+                    continue
+
+                matches = css_matches[field]
+                if matches is None or base_element not in bases:
+                    item[field] = ''
+                    continue
+                element = matches[0].get(base_element)
+                if element is None and base_element in matches[1]:
+                    element = base_element
+                if element is not None:
+                    value = _css_value(element, entry['type'], entry['attr'])
+                    if value is not None:
+                        item[field] = value
+            except Exception as e:
+                if log:
+                    log('ERROR', f'提取字段 {field} 时出错: {str(e)}')
+                item[field] = ''
+        if item:
+            results.append(item)
+    return results
+
+
+def _compile_link(next_page):
+    """编译“下一页”链接选择器，next_page 为 CSS 选择器字符串或 {'selector', 'selectorType', 'attr'}"""
+    if isinstance(next_page, str):
+        next_page = {'selector': next_page}
+    selector = next_page.get('selector', '')
+    if next_page.get('selectorType') == 'xpath':
+        return etree.XPath(selector), next_page.get('attr') or 'href'
+    if HTMLTranslator is None:
+        raise ValueError('CSS next page selectors require cssselect')
+    return _css_xpath(HTMLTranslator(), selector), next_page.get('attr') or 'href'
+
+
+def extract_page(text, rules, log=None, next_link=None, base_url=None):
+    """解析页面并按规则提取数据，返回 (数据列表, 下一页地址)
+
+    规则可以编译时只用 lxml 解析一次；next_link 为 _compile_link 的结果，不为空时同时查找下一页链接。
+    """
+    log = log or (lambda level, message: None)
+    compiled = compile_rules(rules)
+    try:
+        tree = html.fromstring(text)
+        soup = BeautifulSoup(text, 'html.parser') if compiled is None else None
+        log('INFO', 'HTML解析完成')
+    except Exception as e:
+        log('ERROR', f'HTML解析失败: {str(e)}')
+        return [], None
+
+    next_url = None
+    if next_link is not None:
+        try:
+            xpath, attr_name = next_link
+            found = xpath(tree)
+            if found:
+                href = found[0].get(attr_name) if isinstance(found[0], etree._Element) else str(found[0])
+                if href and href.strip():
+                    next_url = urljoin(base_url or '', href.strip())
+        except Exception as e:
+            log('ERROR', f'下一页链接选择器错误: {str(e)}')
+
+    try:
+        if compiled is None:
+            results = extract_data_by_rules(soup, tree, rules, log)
+        else:
+            results = extract_with_lxml(tree, compiled, log)
+        log('INFO', f'数据提取完成，共提取 {len(results)} 条记录')
+        return results, next_url
+    except Exception as e:
+        log('ERROR', f'数据提取失败: {str(e)}')
+        return [], next_url
+
+
+def parse_and_extract(text, rules, log=None):
+    """解析页面并按规则提取数据"""
+    return extract_page(text, rules, log)[0]
+
+
+def _extraction_key(config):
+    """标识提取规则和下一页链接选择器，规则修改后不复用缓存的提取结果"""
+    payload = json.dumps([config.get('rules', []), config.get('next_page')], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _extract_cached(text, rules, log, next_link, url, cache, unchanged, key):
+    """提取页面，返回 (数据列表, 下一页地址, 是否复用了上次的结果)
+
+    跳过未变化页面模式下，未变化的页面复用缓存中同一规则的提取结果，其他页面提取后记入缓存。
+    """
+    if cache is None or not cache.skip_unchanged:
+        return extract_page(text, rules, log, next_link, url) + (False,)
+    if unchanged:
+        extracted = cache.extracted(url, key)
+        if extracted is not None:
+            log('INFO', f'页面未变化，使用上次的提取结果: {url}')
+            return extracted + (True,)
+    items, next_url = extract_page(text, rules, log, next_link, url)
+    cache.store_extracted(url, key, items, next_url)
+    return items, next_url, False
+
+
+def is_multi_page(config):
+    """配置是否需要抓取多个页面（URL 列表、URL 模板或下一页链接）"""
+    return bool(config.get('urls') or config.get('url_template') or config.get('next_page'))
+
+
+def crawl_urls(config):
+    """由配置生成要抓取的页面地址（去重，保持顺序，最多 CRAWL_MAX_PAGES 个）
+
+    url 和 urls 列表中的地址依次抓取；url_template 中的 {page} 依次替换为
+    pages 范围 {'start', 'end', 'step'}（包含 end）中的页码。
+    """
+    urls = []
+    if config.get('url'):
+        urls.append(config['url'])
+    urls.extend(url for url in config.get('urls') or [] if isinstance(url, str) and url)
+
+    template = config.get('url_template')
+    if template:
+        pages = config.get('pages') or {}
+        start = int(pages.get('start', 1))
+        end = int(pages.get('end', start))
+        step = int(pages.get('step', 1)) or 1
+        stop = end + 1 if step > 0 else end - 1
+        for page in range(start, stop, step):
+            urls.append(template.replace('{page}', str(page)))
+            # 避免过大的页码范围生成过多地址
+            if len(urls) >= CRAWL_MAX_PAGES * 2:
+                break
+
+    return list(dict.fromkeys(urls))[:CRAWL_MAX_PAGES]
+
+
+class _Crawler:
+    """在一个事件循环中并发抓取多个页面，每个页面到达后立即提取数据
+
+    同时进行的请求数受全局和每个主机的上限约束；安装了 aiohttp 时用它发送请求，
+    否则在线程池中用 requests 请求。
+    """
+
+    def __init__(self, config, log, cache=None):
+        self.rules = config.get('rules', [])
+        self.headers = config.get('headers', {}) or {}
+        self.timeout = config.get('timeout', 30)
+        self.retries = config.get('retries', 3)
+        self.delay = config.get('delay', 1)
+        self.concurrency = max(1, int(config.get('concurrency') or CRAWL_CONCURRENCY))
+        self.per_host = max(1, int(config.get('per_host_concurrency') or CRAWL_PER_HOST_CONCURRENCY))
+        self.max_follow = int(config.get('max_pages') or CRAWL_MAX_FOLLOW_PAGES)
+        self.log = log
+        self.next_page = None
+        if config.get('next_page'):
+            try:
+                _compile_link(config['next_page'])
+                self.next_page = config['next_page']
+            except Exception as e:
+                log('ERROR', f'下一页链接选择器错误: {str(e)}')
+        # 编译后的 XPath 不能在线程间共享，提取线程各自编译下一页链接选择器
+        self.thread_links = threading.local()
+        self.results = {}   # {(初始页面序号, 翻页深度): 数据列表}
+        self.seen = set()
+        self.pages = 0
+        self.failed_pages = 0
+        self.followed = 0
+        self.session = None
+        self.executor = None
+        self.sync_session = None
+        self.http_stats = {'http_requests': 0, 'http_connections': 0}
+        self.cache = cache
+        self.extraction_key = _extraction_key(config)
+        self.reused_pages = 0
+
+    async def run(self, urls):
+        self.global_limit = asyncio.Semaphore(self.concurrency)
+        self.host_limits = {}
+        self.seen.update(urls)
+        if aiohttp is not None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=self.headers,
+                trace_configs=[self._trace_config()]
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='rules-crawl')
+            # 线程池中的请求共用一个会话，每个主机保留的连接数与并发数相同
+            self.sync_session = spider_runtime.create_session(
+                pool_maxsize=max(self.concurrency, spider_runtime.POOL_MAXSIZE), retries=0, cache=self.cache
+            )
+        try:
+            await asyncio.gather(*(self._crawl(url, (index, 0)) for index, url in enumerate(urls)))
+        finally:
+            if self.session is not None:
+                await self.session.close()
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+            if self.sync_session is not None:
+                stats = spider_runtime.session_stats(self.sync_session)
+                self.http_stats = {'http_requests': stats['requests'], 'http_connections': stats['connections']}
+                self.sync_session.close()
+
+    def _trace_config(self):
+        """统计 aiohttp 发出的请求数和新建的连接数"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.http_stats['http_requests'] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.http_stats['http_connections'] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    def data(self):
+        """按页面顺序（初始页面顺序，其后为各自的翻页）合并的数据"""
+        return [item for key in sorted(self.results) for item in self.results[key]]
+
+    async def _crawl(self, url, key):
+        while url is not None:
+            fetched = await self._fetch(url)
+            if fetched is None:
+                self.failed_pages += 1
+                return
+            self.pages += 1
+            text, unchanged = fetched
+            # 解析和提取是 CPU 密集操作，放到线程中执行，避免阻塞事件循环中其他页面的请求
+            items, next_url, reused = await asyncio.get_running_loop().run_in_executor(
+                None, self._extract, text, url, unchanged
+            )
+            self.reused_pages += reused
+            self.results[key] = items
+
+            # 沿下一页链接继续抓取（同一链条内只能依次进行）
+            if next_url is None or next_url in self.seen or self.followed >= self.max_follow:
+                return
+            self.seen.add(next_url)
+            self.followed += 1
+            url, key = next_url, (key[0], key[1] + 1)
+
+    def _extract(self, text, url, unchanged):
+        next_link = None
+        if self.next_page is not None:
+            next_link = getattr(self.thread_links, 'link', None)
+            if next_link is None:
+                next_link = self.thread_links.link = _compile_link(self.next_page)
+        return _extract_cached(
+            text, self.rules, self.log, next_link, url, self.cache, unchanged, self.extraction_key
+        )
+
+    async def _fetch(self, url):
+        host = urlsplit(url).netloc
+        host_limit = self.host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        for attempt in range(self.retries + 1):
+            try:
+                # 先取得主机的名额再占用全局名额，等待某个主机时不阻塞其他主机的请求
+                async with host_limit:
+                    async with self.global_limit:
+                        return await self._get(url)
+            except Exception as e:
+                if attempt < self.retries:
+                    self.log('WARNING', f'请求 {url} 失败，第{attempt + 1}次重试: {str(e)}')
+                    await asyncio.sleep(self.delay)
+                else:
+                    self.log('ERROR', f'请求 {url} 最终失败: {str(e)}')
+        return None
+
+    async def _get(self, url, revalidate=True):
+        """请求页面，返回 (文本, 是否为未变化的缓存页面)"""
+        if self.session is None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._get_sync, url)
+
+        entry = self.cache.lookup(url) if self.cache is not None and revalidate else None
+        headers = self.cache.validators(entry) if entry is not None else None
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                body = self.cache.body(entry)
+                if body is not None:
+                    return body.decode(entry.get('encoding') or 'utf-8', errors='replace'), True
+            else:
+                response.raise_for_status()
+                body = await response.read()
+                try:
+                    encoding = response.get_encoding()
+                except Exception:
+                    encoding = 'utf-8'
+                if self.cache is not None and response.status == 200 and not response.history:
+                    self.cache.store(url, response.headers, body, encoding)
+                return body.decode(encoding, errors='replace'), False
+        # 缓存的正文已被淘汰：不带验证器重新请求
+        return await self._get(url, revalidate=False)
+
+    def _get_sync(self, url):
+        response = self.sync_session.get(url, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text, response.from_cache
+
+
+def crawl(config, deadline=None, log=None, stats=None, cache=None):
+    """并发抓取配置中的所有页面，返回 (数据列表, 抓取的页面数, 失败的页面数)
+
+    stats 不为空时写入发出的请求数（http_requests）、新建的连接数（http_connections）和
+    服务器返回 304 的次数（http_not_modified）。cache 为 HttpCache 时发送条件请求。
+    """
+    log = log or (lambda level, message: None)
+    urls = crawl_urls(config)
+    crawler = _Crawler(config, log, cache)
+    not_modified = cache.not_modified if cache is not None else 0
+    log('INFO', f'开始爬取 {len(urls)} 个页面（并发 {crawler.concurrency}，每个主机 {crawler.per_host}）')
+
+    async def run():
+        await asyncio.wait_for(crawler.run(urls), _remaining(deadline))
+
+    try:
+        asyncio.run(run())
+    except asyncio.TimeoutError:
+        raise RulesTimeout()
+    finally:
+        if stats is not None:
+            stats.update(crawler.http_stats)
+            if cache is not None:
+                stats['http_not_modified'] = cache.not_modified - not_modified
+    log('INFO', f'抓取完成：成功 {crawler.pages} 个页面，失败 {crawler.failed_pages} 个'
+                + (f'，{crawler.reused_pages} 个未变化' if crawler.reused_pages else ''))
+    return crawler.data(), crawler.pages, crawler.failed_pages
+
+
+def run_rules(config, timeout=None, log=None, stats=None, cache=None):
+    """执行规则爬虫，返回 {'success', 'data', 'count', ...}
+
+    配置了 urls、url_template 或 next_page 时并发抓取多个页面，见 crawl。
+    timeout 为整个调用（含重试）的最长秒数，超过时抛出 RulesTimeout。
+    stats 不为空时写入本次调用的请求数和新建连接数（复用线程会话的连接时不计入新建），
+    cache 为爬虫的 HttpCache 时发送条件请求。
+    """
+    log = log or (lambda level, message: None)
+    deadline = time.monotonic() + timeout if timeout else None
+    url = config.get('url', '')
+    rules = config.get('rules', [])
+    pages = None
+
+    if is_multi_page(config):
+        results, pages, failed_pages = crawl(config, deadline, log, stats, cache)
+    else:
+        log('INFO', f'开始爬取: {url}')
+        session = _session()
+        before = spider_runtime.session_stats(session)
+        session.http_cache = cache
+        try:
+            response = _fetch_response(
+                url,
+                headers=config.get('headers', {}),
+                timeout=config.get('timeout', 30),
+                retries=config.get('retries', 3),
+                delay=config.get('delay', 1),
+                deadline=deadline,
+                log=log
+            )
+        finally:
+            session.http_cache = None
+            if stats is not None:
+                stats.update(_stats_delta(before, spider_runtime.session_stats(session)))
+                if cache is not None:
+                    stats['http_not_modified'] = cache.not_modified
+        results = []
+        if response is not None:
+            results = _extract_cached(
+                response.text, rules, log, None, url, cache, response.from_cache, _extraction_key(config)
+            )[0]
+    _remaining(deadline)
+
+    if results:
+        result = {
+            'success': True,
+            'data': results,
+            'count': len(results),
+            'url': url,
+            'timestamp': datetime.now().timestamp(),
+            'message': f'成功提取 {len(results)} 条数据'
+        }
+    else:
+        result = {
+            'success': False,
+            'data': [],
+            'count': 0,
+            'message': '未提取到有效数据'
+        }
+    if pages is not None:
+        result['pages'] = pages
+        result['failed_pages'] = failed_pages
+    return result
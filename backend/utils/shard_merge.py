@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+# 按行拼接的文本格式
+LINE_FORMATS = ('.jsonl', '.ndjson', '.txt', '.log')
+# 复制文件时的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def merge_shard_outputs(output_dir, shard_dirs):
+    """把分片运行各分片目录中的输出合并到 output_dir，返回合并后的文件相对路径列表
+
+    shard_dirs 为 output_dir 下各分片目录名（按分片顺序）。同一相对路径的文件按分片顺序合并：
+    JSON 数组拼接为一个数组，CSV 只保留第一个表头，JSON Lines 和文本按行拼接；
+    只有一个分片输出的文件直接移动；其他格式或无法合并的文件保留为 <名称>_shard<序号><扩展名>。
+    合并完成后删除分片目录。
+    """
+    groups = {}
+    for shard_index, shard_dir in enumerate(shard_dirs):
+        shard_path = os.path.join(output_dir, shard_dir)
+        for root, _, files in os.walk(shard_path):
+            for file in files:
+                path = os.path.join(root, file)
+                groups.setdefault(os.path.relpath(path, shard_path), []).append((shard_index, path))
+
+    merged = []
+    for rel_path, sources in sorted(groups.items()):
+        target = os.path.join(output_dir, rel_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            if len(sources) == 1:
+                shutil.move(sources[0][1], target)
+                merged.append(rel_path)
+            elif _merge_files(target, [path for _, path in sources]):
+                merged.append(rel_path)
+            else:
+                stem, ext = os.path.splitext(rel_path)
+                for shard_index, path in sources:
+                    shutil.move(path, os.path.join(output_dir, f'{stem}_shard{shard_index}{ext}'))
+                    merged.append(f'{stem}_shard{shard_index}{ext}')
+        except Exception as e:
+            logger.warning(f"Failed to merge shard outputs for {rel_path}: {e}")
+
+    for shard_dir in shard_dirs:
+        shutil.rmtree(os.path.join(output_dir, shard_dir), ignore_errors=True)
+    return merged
+
+
+def _merge_files(target, paths):
+    """按扩展名合并多个文件到 target，格式不支持合并时返回 False"""
+    ext = os.path.splitext(target)[1].lower()
+    if ext == '.json':
+        return _merge_json(target, paths)
+    if ext == '.csv':
+        _concat_files(target, paths, skip_header=True)
+        return True
+    if ext in LINE_FORMATS:
+        _concat_files(target, paths)
+        return True
+    return False
+
+
+def _merge_json(target, paths):
+    """拼接 JSON 数组，任一文件不是数组时不合并"""
+    items = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            return False
+        if not isinstance(data, list):
+            return False
+        items.extend(data)
+    with open(target, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False, indent=2)
+    return True
+
+
+def _concat_files(target, paths, skip_header=False):
+    """按顺序拼接文件，skip_header 时后续文件与第一个文件相同的首行（CSV 表头）被跳过"""
+    header = None
+    with open(target, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                first_line = f.readline()
+                if header is None:
+                    header = first_line
+                elif skip_header and first_line == header:
+                    first_line = b''
+                out.write(first_line)
+                last = first_line
+                while True:
+                    chunk = f.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    last = chunk
+            # 保证下一个文件从新行开始
+            if last and not last.endswith(b'\n'):
+                out.write(b'\n')
@@ -2,26 +2,164 @@ import threading
 import subprocess
 import time
 import uuid
+import queue
+import itertools
 import os
 import sys
+import signal
 from datetime import datetime
-import tempfile
 import json
+import re
 from database import get_db
+from utils.log_writer import get_log_writer
+from utils.output_capture import OutputCapture, LOG_FLUSH_INTERVAL
+from utils.execution_events import get_event_hub
+from utils.program_cache import get_program_cache
+from utils import resource_limits, rules_engine, spider_runtime
+from utils.shard_merge import merge_shard_outputs
+from utils import zygote
+
+# 预置 save_data 写出的保存记录，用于统计每次运行保存的数据条数
+SAVED_ITEMS_PATTERN = re.compile(r'Data saved to .+ \((\d+) items\)')
+
+# 爬虫进程导入共享 HTTP 会话模块（utils/spider_runtime.py）的目录
+SPIDER_RUNTIME_PATH = os.path.dirname(os.path.abspath(spider_runtime.__file__))
+
+# HTTP 条件请求缓存的根目录，每个爬虫一个子目录
+HTTP_CACHE_ROOT = 'http_cache'
+
+# 生成爬虫程序的模板版本，修改包装代码模板时需递增以使缓存的程序失效
+PROGRAM_TEMPLATE_VERSION = 5
+
+# 超时和停止：先向爬虫进程组发送 SIGTERM，宽限期后仍未退出则 SIGKILL
+TERMINATE_GRACE_PERIOD = 10   # 秒
+API_CALL_TIMEOUT = 300        # API调用未单独配置超时时的默认超时（秒）
+
+# 分片运行的最大分片数
+MAX_SHARDS = 32
+
+# 各触发来源的默认优先级（数值越小越先执行），同优先级按提交顺序执行
+TRIGGER_PRIORITIES = {
+    'manual': 0,
+    'api': 0,
+    'schedule': 10,
+}
+
+
+class ExecutionQueue:
+    """有界执行队列
+
+    固定数量的工作线程按 (优先级, 提交顺序) 从队列中取任务执行，同时运行的
+    爬虫进程数不超过工作线程数（系统设置 maxConcurrentSpiders）。
+    """
+    
+    def __init__(self, size):
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._active = 0
+        self.resize(size)
+    
+    def resize(self, size):
+        """调整工作线程数：增加时立即启动新线程，减少时多余的线程在完成当前任务后退出"""
+        size = max(1, int(size))
+        with self._lock:
+            delta = size - self._size
+            self._size = size
+        if delta > 0:
+            for _ in range(delta):
+                threading.Thread(target=self._worker, name='spider-worker', daemon=True).start()
+        else:
+            # 退出标记的优先级最高，空闲线程会立刻取到它
+            for _ in range(-delta):
+                self._queue.put((float('-inf'), next(self._counter), None))
+    
+    def submit(self, func, priority=0):
+        """提交任务，返回任务对象（可传给 cancel 和 position）"""
+        job = {'func': func, 'priority': priority, 'seq': next(self._counter), 'cancelled': False}
+        self._queue.put((priority, job['seq'], job))
+        return job
+    
+    def cancel(self, job):
+        """取消尚未开始的任务，工作线程取到时直接跳过"""
+        job['cancelled'] = True
+    
+    def position(self, job):
+        """任务在队列中的位置（从 1 开始），不在队列中时返回 None"""
+        with self._queue.mutex:
+            pending = sorted(
+                (priority, seq) for priority, seq, item in self._queue.queue
+                if item is not None and not item['cancelled']
+            )
+        try:
+            return pending.index((job['priority'], job['seq'])) + 1
+        except ValueError:
+            return None
+    
+    def stats(self):
+        """队列状态"""
+        with self._queue.mutex:
+            pending = sum(1 for _, _, item in self._queue.queue if item is not None and not item['cancelled'])
+        with self._lock:
+            return {'size': self._size, 'active': self._active, 'pending': pending}
+    
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if job['cancelled']:
+                continue
+            with self._lock:
+                self._active += 1
+            try:
+                job['func']()
+            except Exception as e:
+                print(f"Error in spider worker: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+
+_execution_queue = None
+_execution_queue_lock = threading.Lock()
+
+
+def get_execution_queue():
+    """获取全局执行队列，工作线程数取自系统设置 maxConcurrentSpiders"""
+    global _execution_queue
+    with _execution_queue_lock:
+        if _execution_queue is None:
+            size = get_db().get_system_settings().get('maxConcurrentSpiders', 3)
+            _execution_queue = ExecutionQueue(size)
+        return _execution_queue
+
 
 class SpiderRunner:
     """爬虫运行器"""
     
     def __init__(self):
         self.running_spiders = {}  # {spider_id: {'process': process, 'execution_id': id, 'start_time': time}}
+        self.api_calls = {}  # {execution_id: run_info}，排队中和运行中的 API 调用
         self.lock = threading.Lock()
+        self.log_writer = get_log_writer()
+        self.event_hub = get_event_hub()
     
-    def run_spider(self, spider_id):
-        """运行爬虫"""
+    def run_spider(self, spider_id, trigger='manual', priority=None, shards=1):
+        """提交爬虫运行，trigger 为触发来源（manual/schedule/api）
+
+        运行进入全局执行队列，有空闲的工作线程时才启动进程；priority 为空时按触发来源取默认优先级。
+        启用 worker 进程时运行写入数据库任务队列，由 worker 进程领取执行。
+        shards 大于 1 时为分片运行：同时启动 shards 个爬虫进程，见 _submit_sharded。
+        """
         db = get_db()
+        shards = int(shards or 1)
+        if shards < 1 or shards > MAX_SHARDS:
+            raise ValueError(f"shards must be between 1 and {MAX_SHARDS}")
         
         with self.lock:
-            if spider_id in self.running_spiders:
+            if spider_id in self.running_spiders or db.get_active_job(spider_id):
                 spider = db.get_spider(spider_id)
                 raise Exception(f"Spider {spider['name'] if spider else spider_id} is already running")
             
@@ -32,96 +170,538 @@ class SpiderRunner:
             
             # 生成执行ID
             execution_id = str(uuid.uuid4())
+            if priority is None:
+                priority = TRIGGER_PRIORITIES.get(trigger, 0)
+            
+            if shards > 1:
+                return self._submit_sharded(spider_id, execution_id, trigger, priority, shards)
+            
+            if self._use_worker_processes():
+                db.enqueue_job(spider_id, execution_id, trigger, priority)
+                db.update_spider_status(spider_id, 'queued')
+                return execution_id
+            
+            # 记录排队信息，开始执行时再补充开始时间
+            run_info = {
+                'execution_id': execution_id,
+                'queued_at': datetime.utcnow(),
+                'start_time': None,
+                'status': 'queued',
+                'trigger': trigger
+            }
+            self.running_spiders[spider_id] = run_info
+            db.update_spider_status(spider_id, 'queued')
+            self.event_hub.open(spider_id, execution_id)
+            self.event_hub.publish(execution_id, 'status', {
+                'status': 'queued',
+                'trigger': trigger,
+                'queued_at': run_info['queued_at'].isoformat()
+            })
+            
+            run_info['job'] = get_execution_queue().submit(
+                lambda: self._start_queued(spider_id, run_info), priority
+            )
+            
+            return execution_id
+    
+    def _submit_sharded(self, spider_id, execution_id, trigger, priority, shard_count):
+        """提交分片运行（调用方持有 self.lock）
+
+        每个分片是一个独立的爬虫进程，环境变量 SHARD_INDEX/SHARD_COUNT 告诉爬虫处理哪一部分任务
+        （代码中可用 shard_items()/in_shard() 划分）。各分片分别进入执行队列，占用各自的执行槽位，
+        分片数超过空闲槽位时分批运行。每个分片有自己的执行记录，全部结束后合并输出文件和统计，
+        写入 execution_id 对应的父执行记录。分片运行始终在本进程中执行，不交给 worker 进程。
+        """
+        db = get_db()
+        queued_at = datetime.utcnow()
+        run_info = {
+            'execution_id': execution_id,
+            'queued_at': queued_at,
+            'start_time': None,
+            'status': 'queued',
+            'trigger': trigger,
+            'shards': []
+        }
+        for index in range(shard_count):
+            run_info['shards'].append({
+                'execution_id': str(uuid.uuid4()),
+                'parent_execution_id': execution_id,
+                'parent': run_info,
+                'index': index,
+                'count': shard_count,
+                'queued_at': queued_at,
+                'start_time': None,
+                'status': 'queued',
+                'trigger': trigger
+            })
+        self.running_spiders[spider_id] = run_info
+        db.update_spider_status(spider_id, 'queued')
+        self.event_hub.open(spider_id, execution_id)
+        self.event_hub.publish(execution_id, 'status', {
+            'status': 'queued',
+            'trigger': trigger,
+            'queued_at': queued_at.isoformat(),
+            'shards': self._shard_summary(run_info)
+        })
+        
+        for shard in run_info['shards']:
+            shard['job'] = get_execution_queue().submit(
+                lambda shard=shard: self._start_shard(spider_id, run_info, shard), priority
+            )
+        run_info['job'] = run_info['shards'][0]['job']
+        
+        return execution_id
+    
+    def _shard_summary(self, run_info):
+        """分片运行中各状态的分片数"""
+        summary = {}
+        for shard in run_info['shards']:
+            summary[shard['status']] = summary.get(shard['status'], 0) + 1
+        return summary
+    
+    def _start_queued(self, spider_id, run_info):
+        """工作线程取到任务后开始运行（排队期间被停止的运行直接跳过）"""
+        db = get_db()
+        execution_id = run_info['execution_id']
+        
+        with self.lock:
+            if run_info['status'] != 'queued':
+                return
+            spider = db.get_spider(spider_id)
+            if not spider:
+                if self.running_spiders.get(spider_id) is run_info:
+                    del self.running_spiders[spider_id]
+                self.event_hub.close(execution_id)
+                return
+            run_info['status'] = 'running'
+            run_info['start_time'] = datetime.utcnow()
+            run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+            run_info['thread'] = threading.current_thread()
+            self.event_hub.publish(execution_id, 'status', {
+                'status': 'running',
+                'trigger': run_info['trigger'],
+                'queued_at': run_info['queued_at'].isoformat(),
+                'start_time': run_info['start_time'].isoformat(),
+                'queue_wait': run_info['queue_wait']
+            })
             
             # 更新爬虫状态
             db.update_spider_status(spider_id, 'running')
             db.increment_spider_run_count(spider_id)
+            self._record_run_stats(spider_id, runs=1)
             
             # 记录开始日志
-            db.create_log(
+            self.log_writer.write(
                 spider_id=spider_id,
                 level='INFO',
                 message=f'Spider "{spider["name"]}" started with execution ID: {execution_id}',
                 source='spider_runner',
                 execution_id=execution_id
             )
+        
+        self._execute_spider(spider, execution_id, run_info)
+    
+    def _execute_spider(self, spider, execution_id, run_info):
+        """执行爬虫代码"""
+        try:
+            output_dir = os.path.join('spider_files', f'spider_{spider["id"]}', execution_id)
+            capture, return_code, usage, limits = self._run_spider_process(spider, execution_id, run_info, output_dir)
             
-            # 在新线程中运行爬虫
-            thread = threading.Thread(
-                target=self._execute_spider,
-                args=(spider, execution_id)
+            # 处理输出
+            self._handle_spider_output(
+                spider, execution_id, capture, return_code, run_info,
+                usage=usage,
+                limits=limits
             )
-            thread.daemon = True
-            thread.start()
             
-            # 记录运行信息
-            self.running_spiders[spider_id] = {
-                'thread': thread,
-                'execution_id': execution_id,
-                'start_time': datetime.utcnow(),
-                'status': 'running'
+        except Exception as e:
+            import traceback
+            error_details = f"{str(e)}\n\nFull traceback:\n{traceback.format_exc()}"
+            self._handle_spider_error(spider, execution_id, error_details, run_info)
+        finally:
+            # 清理运行信息（手动停止时已被 stop_spider 清理，可能已有新的运行）
+            with self.lock:
+                if self.running_spiders.get(spider["id"]) is run_info:
+                    del self.running_spiders[spider["id"]]
+    
+    def _run_spider_process(self, spider, execution_id, run_info, output_dir, extra_env=None, shard=None):
+        """启动爬虫进程并等待结束，返回 (capture, 退出码, 资源用量字段, 生效的资源限制)
+
+        shard 为分片运行中的分片信息：日志和进度推送到父执行的频道，日志事件带有分片序号。
+        """
+        channel = shard['parent_execution_id'] if shard else execution_id
+        
+        # 获取包装好的爬虫程序（相同代码和配置复用已编译的缓存）
+        program = self._get_spider_program(spider)
+        
+        # 创建输出目录
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 设置环境变量（子进程的工作目录就是输出目录，OUTPUT_DIR 需要使用绝对路径）
+        env = os.environ.copy()
+        env['SPIDER_ID'] = str(spider["id"])
+        env['EXECUTION_ID'] = execution_id
+        env['OUTPUT_DIR'] = os.path.abspath(output_dir)
+        # 关闭子进程的输出缓冲，使输出逐行到达
+        env['PYTHONUNBUFFERED'] = '1'
+        env['PYTHONIOENCODING'] = 'utf-8'
+        env['SPIDER_RUNTIME_PATH'] = SPIDER_RUNTIME_PATH
+        env.update(self._http_cache_env(spider))
+        env.update(extra_env or {})
+        
+        # 运行爬虫（按系统设置和爬虫配置限制 CPU 时间、内存和打开的文件数）
+        limits = self._resource_limits(spider)
+        process = self._spawn_process(program, env, output_dir, limits)
+        
+        # 更新进程信息（启动期间已被停止的运行立即终止）
+        with self.lock:
+            run_info['process'] = process
+            if run_info['status'] == 'stopped':
+                self._begin_termination(run_info)
+        
+        # 运行超时时间（秒），0 表示不限制
+        timeout = self._execution_timeout(spider)
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        def publish_line(level, source, line):
+            event = {
+                'level': level,
+                'source': source,
+                'message': line,
+                'timestamp': datetime.utcnow().isoformat()
             }
-            
-            return execution_id
+            if shard:
+                event['shard'] = shard['index']
+            self.event_hub.publish(channel, 'log', event)
+            http_stats = _parse_http_stats(line)
+            if http_stats:
+                run_info['http_stats'] = http_stats
+        
+        # 边运行边读取输出：日志按批写入，输出日志文件逐步追加
+        capture = OutputCapture(
+            process, spider["id"], execution_id, self.log_writer,
+            log_dir=os.path.join('spider_logs', f'spider_{spider["id"]}'),
+            item_pattern=SAVED_ITEMS_PATTERN,
+            listener=publish_line
+        ).start()
+        run_info['capture'] = capture
+        
+        # 等待进程完成，期间定期写入已读取的日志并推送进度
+        while True:
+            try:
+                process.wait(timeout=LOG_FLUSH_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                capture.flush()
+                self._publish_progress(execution_id, run_info, shard)
+                self._check_termination(spider, execution_id, run_info, deadline, timeout)
+        
+        # 停止或超时的运行，清理爬虫启动的、仍在运行的子进程
+        if run_info['status'] in ('stopped', 'timeout'):
+            _signal_process_group(process, force=True)
+        capture.finish()
+        self._publish_progress(execution_id, run_info, shard)
+        
+        return capture, process.returncode, resource_limits.usage_fields(process.rusage), limits
     
-    def _execute_spider(self, spider, execution_id):
-        """执行爬虫代码"""
+    def _start_shard(self, spider_id, run_info, shard):
+        """工作线程取到分片后开始运行，第一个开始的分片同时使父执行进入运行状态"""
+        db = get_db()
+        execution_id = run_info['execution_id']
+        
+        with self.lock:
+            if shard['status'] != 'queued':
+                return
+            spider = db.get_spider(spider_id)
+            if not spider:
+                for other in run_info['shards']:
+                    other['status'] = 'stopped'
+                if self.running_spiders.get(spider_id) is run_info:
+                    del self.running_spiders[spider_id]
+                self.event_hub.close(execution_id)
+                return
+            now = datetime.utcnow()
+            if run_info['status'] == 'queued':
+                run_info['status'] = 'running'
+                run_info['start_time'] = now
+                run_info['queue_wait'] = (now - run_info['queued_at']).total_seconds()
+                self.event_hub.publish(execution_id, 'status', {
+                    'status': 'running',
+                    'trigger': run_info['trigger'],
+                    'queued_at': run_info['queued_at'].isoformat(),
+                    'start_time': now.isoformat(),
+                    'queue_wait': run_info['queue_wait'],
+                    'shards': self._shard_summary(run_info)
+                })
+                
+                db.update_spider_status(spider_id, 'running')
+                db.increment_spider_run_count(spider_id)
+                self._record_run_stats(spider_id, runs=1)
+                self.log_writer.write(
+                    spider_id=spider_id,
+                    level='INFO',
+                    message=f'Spider "{spider["name"]}" started with execution ID: {execution_id} ({len(run_info["shards"])} shards)',
+                    source='spider_runner',
+                    execution_id=execution_id
+                )
+            shard['status'] = 'running'
+            shard['start_time'] = now
+            shard['queue_wait'] = (now - shard['queued_at']).total_seconds()
+            shard['thread'] = threading.current_thread()
+        
+        self._execute_shard(spider, run_info, shard)
+    
+    def _execute_shard(self, spider, run_info, shard):
+        """运行一个分片并写入分片的执行记录"""
+        spider_id = spider["id"]
+        fields = {}
         try:
-            # 创建临时文件保存爬虫代码
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
-                # 添加必要的导入和工具函数
-                spider_code = self._prepare_spider_code(spider, execution_id)
-                f.write(spider_code)
-                temp_file = f.name
-            
-            # 创建输出目录
-            output_dir = os.path.join('spider_files', f'spider_{spider["id"]}', execution_id)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 设置环境变量
-            env = os.environ.copy()
-            env['SPIDER_ID'] = str(spider["id"])
-            env['EXECUTION_ID'] = execution_id
-            env['OUTPUT_DIR'] = output_dir
+            output_dir = os.path.join(
+                'spider_files', f'spider_{spider_id}', run_info['execution_id'], f'shard_{shard["index"]}'
+            )
+            capture, return_code, usage, limits = self._run_spider_process(
+                spider, shard['execution_id'], shard, output_dir,
+                extra_env={'SHARD_INDEX': str(shard['index']), 'SHARD_COUNT': str(shard['count'])},
+                shard=shard
+            )
+            for log_type, log_file in capture.output_files().items():
+                self._save_output_log(spider_id, shard['execution_id'], log_type, log_file)
             
-            # 运行爬虫
-            process = subprocess.Popen(
-                [sys.executable, temp_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                cwd=output_dir
+            if shard['status'] in ('stopped', 'timeout'):
+                status = shard['status']
+            else:
+                status = 'success' if return_code == 0 else 'failed'
+            fields = dict(
+                exit_code=return_code,
+                stdout_lines=capture.stdout.lines,
+                stderr_lines=capture.stderr.lines,
+                output_bytes=capture.output_bytes,
+                item_count=capture.item_count,
+                error_message=(
+                    self._failure_message(capture, return_code, limits, usage) if status == 'failed'
+                    else f'Execution timed out after {self._execution_timeout(spider):g}s' if status == 'timeout'
+                    else None
+                ),
+                **shard.get('http_stats', {}),
+                **usage
             )
+        except Exception as e:
+            import traceback
+            status = 'error'
+            fields = {'error_message': f"{str(e)}\n\nFull traceback:\n{traceback.format_exc()}"[-2000:]}
+            print(f"Spider {spider_id} shard {shard['index']} execution error: {e}")
+        
+        shard['status'] = status
+        shard['result'] = self._record_execution(
+            spider_id, shard['execution_id'], shard, status, publish=False,
+            parent_execution_id=run_info['execution_id'],
+            shard_index=shard['index'],
+            shard_count=shard['count'],
+            **fields
+        )
+        self.event_hub.publish(run_info['execution_id'], 'shard', {
+            'shard': shard['index'],
+            'execution_id': shard['execution_id'],
+            'status': status
+        })
+        self._finish_shard(spider, run_info, shard)
+    
+    def _finish_shard(self, spider, run_info, shard):
+        """分片结束；最后一个结束的分片负责合并结果"""
+        with self.lock:
+            shard['finished'] = True
+            if run_info.get('finalizing') or not all(other.get('finished') for other in run_info['shards']):
+                return
+            run_info['finalizing'] = True
+        self._finalize_sharded(spider, run_info)
+    
+    def _finalize_sharded(self, spider, run_info):
+        """所有分片结束后合并输出文件和统计，写入父执行记录"""
+        db = get_db()
+        spider_id = spider["id"]
+        spider_name = spider["name"]
+        execution_id = run_info['execution_id']
+        try:
+            if run_info['start_time'] is None:
+                # 分片都在排队时被停止
+                run_info['start_time'] = datetime.utcnow()
+                run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+            shards = run_info['shards']
+            results = [shard.get('result') or {} for shard in shards]
             
-            # 更新进程信息
-            with self.lock:
-                if spider["id"] in self.running_spiders:
-                    self.running_spiders[spider["id"]]['process'] = process
+            # 把各分片目录中的输出合并到父执行的输出目录
+            output_dir = os.path.join('spider_files', f'spider_{spider_id}', execution_id)
+            merge_shard_outputs(output_dir, [f'shard_{shard["index"]}' for shard in shards])
+            file_count = self._scan_output_files(spider_id, execution_id)
             
-            # 等待进程完成
-            stdout, stderr = process.communicate()
+            totals = {
+                field: sum(result.get(field) or 0 for result in results)
+                for field in ('stdout_lines', 'stderr_lines', 'output_bytes', 'item_count')
+            }
+            for field in ('http_requests', 'http_connections', 'http_not_modified'):
+                if any(result.get(field) is not None for result in results):
+                    totals[field] = sum(result.get(field) or 0 for result in results)
+            usage = {}
+            if any(result.get('cpu_user') is not None for result in results):
+                for field in resource_limits.USAGE_COLUMNS:
+                    values = [result.get(field) or 0 for result in results]
+                    # 峰值内存取各分片的最大值，其余用量累加
+                    usage[field] = max(values) if field == 'max_rss_kb' else sum(values)
+                usage['cpu_user'] = round(usage['cpu_user'], 3)
+                usage['cpu_system'] = round(usage['cpu_system'], 3)
             
-            # 处理输出
-            self._handle_spider_output(spider, execution_id, stdout, stderr, process.returncode)
+            statuses = [shard['status'] for shard in shards]
+            failed = [shard for shard in shards if shard['status'] not in ('success', 'stopped')]
+            duration = self._run_duration(run_info)
+            if run_info['status'] == 'stopped':
+                status = 'stopped'
+            elif 'timeout' in statuses:
+                status = 'timeout'
+            elif not failed:
+                status = 'success'
+            else:
+                status = 'failed'
             
-            # 清理临时文件
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+            error_message = None
+            if status == 'success':
+                db.update_spider_status(spider_id, 'inactive')
+                db.increment_spider_success_count(spider_id)
+                self._record_run_stats(spider_id, successes=1, duration=duration)
+                self.log_writer.write(
+                    spider_id=spider_id,
+                    level='INFO',
+                    message=f'Spider "{spider_name}" completed successfully ({len(shards)} shards, {totals["item_count"]} items)',
+                    source='spider_runner',
+                    execution_id=execution_id
+                )
+            elif status != 'stopped':
+                error_message = '\n'.join(
+                    f'Shard {shard["index"]} {shard["status"]}: {(shard.get("result") or {}).get("error_message") or ""}'.strip()
+                    for shard in failed
+                )[-2000:]
+                db.update_spider_status(spider_id, 'error')
+                db.increment_spider_error_count(spider_id)
+                self._record_run_stats(spider_id, errors=1, duration=duration)
+                self.log_writer.write(
+                    spider_id=spider_id,
+                    level='ERROR',
+                    message=f'Spider "{spider_name}" {status}: {len(failed)} of {len(shards)} shards did not succeed',
+                    source='spider_runner',
+                    execution_id=execution_id
+                )
             
+            exit_codes = [result.get('exit_code') for result in results if result.get('exit_code')]
+            self._record_execution(
+                spider_id, execution_id, run_info, status,
+                exit_code=exit_codes[0] if exit_codes else (0 if status == 'success' else None),
+                file_count=file_count,
+                error_message=error_message,
+                shard_count=len(shards),
+                **totals,
+                **usage
+            )
         except Exception as e:
-            import traceback
-            error_details = f"{str(e)}\n\nFull traceback:\n{traceback.format_exc()}"
-            self._handle_spider_error(spider, execution_id, error_details)
+            print(f"Error finalizing sharded run {execution_id}: {e}")
+            self.event_hub.close(execution_id)
         finally:
-            # 清理运行信息
             with self.lock:
-                if spider["id"] in self.running_spiders:
-                    del self.running_spiders[spider["id"]]
+                if self.running_spiders.get(spider_id) is run_info:
+                    del self.running_spiders[spider_id]
+    
+    def _spawn_process(self, script, env, cwd=None, limits=None):
+        """启动爬虫进程：优先从预热的 fork 服务派生，不可用时冷启动新的解释器
+
+        返回的进程对象结束后 rusage 属性为资源用量（不支持的平台上为 None）。
+        """
+        if zygote.is_supported() and get_db().get_system_settings().get('useZygote', True):
+            process = zygote.get_zygote().spawn(script, env, cwd or os.getcwd(), limits=limits)
+            if process is not None:
+                return process
+        return resource_limits.AccountedPopen(
+            [sys.executable, script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            env=env,
+            cwd=cwd,
+            preexec_fn=resource_limits.make_preexec_fn(limits),
+            # 新会话使爬虫及其子进程属于同一进程组，超时和停止时可一并终止
+            start_new_session=True
+        )
+    
+    def _execution_timeout(self, spider, default=None):
+        """爬虫单次运行的超时时间（秒），0 表示不限制
+
+        爬虫配置中的 execution_timeout 优先，其次为 default，最后为系统设置的 executionTimeoutMinutes。
+        """
+        config = (spider or {}).get('config') or {}
+        if isinstance(config, str):
+            try:
+                config = json.loads(config)
+            except ValueError:
+                config = {}
+        value = config.get('execution_timeout') if isinstance(config, dict) else None
+        if value is None:
+            if default is not None:
+                return default
+            value = get_db().get_system_settings().get('executionTimeoutMinutes', 0) * 60
+        try:
+            return max(0, float(value))
+        except (TypeError, ValueError):
+            return 0
+    
+    def _begin_termination(self, run_info):
+        """向运行中的爬虫进程组发送 SIGTERM，宽限期后由等待线程强制结束（调用方持有 self.lock）"""
+        process = run_info.get('process')
+        if process is None or 'kill_at' in run_info:
+            return
+        _signal_process_group(process)
+        run_info['kill_at'] = time.monotonic() + TERMINATE_GRACE_PERIOD
     
-    def _prepare_spider_code(self, spider, execution_id):
+    def _check_termination(self, spider, execution_id, run_info, deadline, timeout):
+        """在等待进程的线程中检查运行是否超时、停止宽限期是否已过"""
+        now = time.monotonic()
+        with self.lock:
+            if deadline is not None and now >= deadline and run_info['status'] == 'running':
+                run_info['status'] = 'timeout'
+                self._begin_termination(run_info)
+                self.log_writer.write(
+                    spider_id=spider["id"],
+                    level='ERROR',
+                    message=f'Spider "{spider["name"]}" exceeded the execution timeout of {timeout:g}s and is being terminated',
+                    source='spider_runner',
+                    execution_id=execution_id
+                )
+            kill_at = run_info.get('kill_at')
+            if kill_at is not None and now >= kill_at and not run_info.get('killed'):
+                run_info['killed'] = True
+                _signal_process_group(run_info['process'], force=True)
+    
+    def _http_cache(self, spider):
+        """爬虫在本进程中使用的 HTTP 缓存，未启用时为 None"""
+        settings = spider_runtime.resolve_cache_settings(get_db().get_system_settings(), (spider or {}).get('config'))
+        if settings is None:
+            return None
+        return spider_runtime.HttpCache(HTTP_CACHE_ROOT, spider["id"], **settings)
+    
+    def _http_cache_env(self, spider):
+        """爬虫进程启用 HTTP 缓存的环境变量（由 spider_runtime.cache_from_env 读取），未启用时为空"""
+        settings = spider_runtime.resolve_cache_settings(get_db().get_system_settings(), (spider or {}).get('config'))
+        if settings is None:
+            return {}
+        return {
+            'HTTP_CACHE_DIR': os.path.abspath(HTTP_CACHE_ROOT),
+            'HTTP_CACHE_MAX_BYTES': str(settings['max_bytes']),
+            'HTTP_CACHE_SKIP_UNCHANGED': '1' if settings['skip_unchanged'] else '0'
+        }
+    
+    def _resource_limits(self, spider):
+        """爬虫进程生效的资源限制：系统默认值，爬虫配置中的 resource_limits 优先"""
+        return resource_limits.resolve_limits(get_db().get_system_settings(), (spider or {}).get('config'))
+    
+    def _prepare_spider_code(self, spider):
         """准备爬虫代码"""
         # 添加工具函数和导入
         helper_code = f'''
@@ -133,16 +713,46 @@ from datetime import datetime
 from pathlib import Path
 
 # 爬虫运行环境变量
-SPIDER_ID = {spider["id"]}
-EXECUTION_ID = "{execution_id}"
+SPIDER_ID = int(os.environ.get('SPIDER_ID', '0'))
+EXECUTION_ID = os.environ.get('EXECUTION_ID', '')
 OUTPUT_DIR = os.environ.get('OUTPUT_DIR', '.')
+# 分片运行时本进程的分片序号（从 0 开始）和分片总数，普通运行为 0 和 1
+SHARD_INDEX = int(os.environ.get('SHARD_INDEX', '0'))
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '1'))
 
 # 工具函数
+def shard_items(items):
+    """按位置划分任务列表，返回本分片负责的部分（普通运行时返回全部）"""
+    return [item for index, item in enumerate(items) if index % SHARD_COUNT == SHARD_INDEX]
+
+def in_shard(key):
+    """按 key（如 URL）的稳定哈希判断是否由本分片处理"""
+    import zlib
+    return zlib.crc32(str(key).encode('utf-8')) % SHARD_COUNT == SHARD_INDEX
+
 def log_message(level, message):
     """记录日志"""
     timestamp = datetime.now().isoformat()
     print(f"[{{{{{{timestamp}}}}}}] [{{{{{{level}}}}}}] {{{{{{message}}}}}}")
 
+# 共享的 HTTP 会话：连接池复用 keep-alive 连接，自动重试并接受压缩响应，
+# 爬虫代码可直接使用 session.get(...)；进程退出时输出请求数和连接复用统计
+if os.environ.get('SPIDER_RUNTIME_PATH'):
+    sys.path.append(os.environ['SPIDER_RUNTIME_PATH'])
+try:
+    import spider_runtime
+    session = spider_runtime.get_session()
+    spider_runtime.report_stats_at_exit(log_message)
+except ImportError:
+    session = requests.Session()
+
+# 爬虫配置 http_cache 开启 skip_unchanged 时，未变化（服务器返回 304）的页面可跳过解析
+HTTP_CACHE_SKIP_UNCHANGED = os.environ.get('HTTP_CACHE_SKIP_UNCHANGED') == '1'
+
+def page_unchanged(response):
+    """跳过未变化页面模式下，response 是 session 从缓存取得的未变化页面时返回 True"""
+    return HTTP_CACHE_SKIP_UNCHANGED and getattr(response, 'from_cache', False)
+
 def save_data(data, filename, format='json'):
     """保存数据到文件"""
     filepath = os.path.join(OUTPUT_DIR, filename)
@@ -163,10 +773,11 @@ def save_data(data, filename, format='json'):
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(str(data))
         
-        log_message('INFO', f'Data saved to {{{{filename}}}}')
+        item_count = len(data) if isinstance(data, (list, tuple)) else 1
+        log_message('INFO', f'Data saved to {{filename}} ({{item_count}} items)')
         return filepath
     except Exception as e:
-        log_message('ERROR', f'Failed to save data to {{{{filename}}}}: {{{{e}}}}')
+        log_message('ERROR', f'Failed to save data to {{filename}}: {{e}}')
         return None
 
 def get_config():
@@ -206,49 +817,32 @@ except Exception as e:
         
         return helper_code + user_code + footer_code
     
-    def _handle_spider_output(self, spider, execution_id, stdout, stderr, return_code):
-        """处理爬虫输出"""
+    def _handle_spider_output(self, spider, execution_id, capture, return_code, run_info, usage=None, limits=None):
+        """处理爬虫输出（输出日志已在运行期间写入），usage 为进程的资源用量字段"""
         db = get_db()
         try:
             spider_id = spider["id"]
             spider_name = spider["name"]
             
-            # 保存输出日志
-            if stdout:
-                self._save_output_log(spider_id, execution_id, 'stdout', stdout)
-                # 将所有stdout内容作为运行日志记录
-                stdout_lines = stdout.strip().split('\n')
-                for line in stdout_lines:
-                    line = line.strip()
-                    if line:  # 只记录非空行
-                        db.create_log(
-                            spider_id=spider_id,
-                            level='INFO',
-                            message=line,
-                            source='spider_output',
-                            execution_id=execution_id
-                        )
-            
-            if stderr:
-                self._save_output_log(spider_id, execution_id, 'stderr', stderr)
-                # 将所有stderr内容作为错误日志记录
-                stderr_lines = stderr.strip().split('\n')
-                for line in stderr_lines:
-                    line = line.strip()
-                    if line:  # 只记录非空行
-                        db.create_log(
-                            spider_id=spider_id,
-                            level='ERROR',
-                            message=line,
-                            source='spider_error',
-                            execution_id=execution_id
-                        )
+            # 登记输出日志文件
+            for log_type, log_file in capture.output_files().items():
+                self._save_output_log(spider_id, execution_id, log_type, log_file)
             
-            # 更新爬虫状态
-            if return_code == 0:
+            # 更新爬虫状态（手动停止的运行已由 stop_spider 更新）
+            duration = self._run_duration(run_info)
+            if run_info['status'] == 'stopped':
+                status = 'stopped'
+            elif run_info['status'] == 'timeout':
+                status = 'timeout'
+                db.update_spider_status(spider_id, 'error')
+                db.increment_spider_error_count(spider_id)
+                self._record_run_stats(spider_id, errors=1, duration=duration)
+            elif return_code == 0:
+                status = 'success'
                 db.update_spider_status(spider_id, 'inactive')
                 db.increment_spider_success_count(spider_id)
-                db.create_log(
+                self._record_run_stats(spider_id, successes=1, duration=duration)
+                self.log_writer.write(
                     spider_id=spider_id,
                     level='INFO',
                     message=f'Spider "{spider_name}" completed successfully',
@@ -256,23 +850,52 @@ except Exception as e:
                     execution_id=execution_id
                 )
             else:
+                status = 'failed'
                 db.update_spider_status(spider_id, 'error')
                 db.increment_spider_error_count(spider_id)
-                db.create_log(
+                self._record_run_stats(spider_id, errors=1, duration=duration)
+                limit_message = resource_limits.describe_limit_exit(return_code, limits, usage)
+                self.log_writer.write(
                     spider_id=spider_id,
                     level='ERROR',
-                    message=f'Spider "{spider_name}" failed with exit code {return_code}',
+                    message=f'Spider "{spider_name}" failed with exit code {return_code}'
+                            + (f': {limit_message}' if limit_message else ''),
                     source='spider_runner',
                     execution_id=execution_id
                 )
             
             # 扫描输出文件
-            self._scan_output_files(spider_id, execution_id)
+            file_count = self._scan_output_files(spider_id, execution_id)
+            
+            self._record_execution(
+                spider_id, execution_id, run_info, status,
+                exit_code=return_code,
+                stdout_lines=capture.stdout.lines,
+                stderr_lines=capture.stderr.lines,
+                output_bytes=capture.output_bytes,
+                item_count=capture.item_count,
+                file_count=file_count,
+                error_message=(
+                    self._failure_message(capture, return_code, limits, usage) if status == 'failed'
+                    else f'Execution timed out after {self._execution_timeout(spider):g}s' if status == 'timeout'
+                    else None
+                ),
+                **run_info.get('http_stats', {}),
+                **(usage or {})
+            )
             
         except Exception as e:
             print(f"Error handling spider output: {e}")
     
-    def _handle_spider_error(self, spider, execution_id, error_message):
+    def _failure_message(self, capture, return_code, limits, usage):
+        """失败运行的错误信息：超出资源限制的说明加上 stderr 的末尾"""
+        stderr_tail = capture.stderr.tail().strip()
+        limit_message = resource_limits.describe_limit_exit(return_code, limits, usage)
+        if limit_message:
+            stderr_tail = f'{limit_message}\n{stderr_tail}'.strip()
+        return stderr_tail[-2000:] or None
+    
+    def _handle_spider_error(self, spider, execution_id, error_message, run_info):
         """处理爬虫错误"""
         db = get_db()
         try:
@@ -281,6 +904,8 @@ except Exception as e:
             
             db.update_spider_status(spider_id, 'error')
             db.increment_spider_error_count(spider_id)
+            self._record_run_stats(spider_id, errors=1, duration=self._run_duration(run_info))
+            self._record_execution(spider_id, execution_id, run_info, 'error', error_message=str(error_message)[-2000:])
             
             # 记录详细的错误信息
             import traceback
@@ -290,7 +915,7 @@ except Exception as e:
             if hasattr(error_message, '__traceback__'):
                 detailed_error += f'\n\nTraceback:\n{traceback.format_exc()}'
             
-            db.create_log(
+            self.log_writer.write(
                 spider_id=spider_id,
                 level='ERROR',
                 message=detailed_error,
@@ -306,17 +931,64 @@ except Exception as e:
             import traceback
             print(traceback.format_exc())
     
-    def _save_output_log(self, spider_id, execution_id, log_type, content):
-        """保存输出日志到文件"""
+    def _run_duration(self, run_info):
+        """运行已持续的秒数"""
+        return (datetime.utcnow() - run_info['start_time']).total_seconds()
+    
+    def _publish_progress(self, execution_id, run_info, shard=None):
+        """推送运行进度计数（分片运行推送父执行下各分片的合计）"""
+        if shard:
+            run_info = shard['parent']
+            execution_id = run_info['execution_id']
+        captures = [info['capture'] for info in run_info.get('shards', [run_info]) if info.get('capture')]
+        progress = {
+            'duration': self._run_duration(run_info),
+            'stdout_lines': sum(capture.stdout.lines for capture in captures),
+            'stderr_lines': sum(capture.stderr.lines for capture in captures),
+            'output_bytes': sum(capture.output_bytes for capture in captures),
+            'item_count': sum(capture.item_count for capture in captures)
+        }
+        if 'shards' in run_info:
+            progress['shards'] = self._shard_summary(run_info)
+        self.event_hub.publish(execution_id, 'progress', progress)
+    
+    def _record_execution(self, spider_id, execution_id, run_info, status, publish=True, **fields):
+        """写入执行记录并推送最终状态，失败不影响爬虫运行，返回写入的记录
+
+        publish 为 False 时只写入记录（分片的执行记录，由父执行统一推送）。
+        """
+        finished_at = datetime.utcnow()
+        execution = dict(
+            id=execution_id,
+            spider_id=spider_id,
+            trigger_source=run_info.get('trigger', 'manual'),
+            status=status,
+            started_at=run_info['start_time'].strftime('%Y-%m-%d %H:%M:%S'),
+            finished_at=finished_at.strftime('%Y-%m-%d %H:%M:%S'),
+            duration=(finished_at - run_info['start_time']).total_seconds(),
+            queue_wait=run_info.get('queue_wait', 0),
+            **fields
+        )
+        try:
+            get_db().create_execution(**execution)
+        except Exception as e:
+            print(f"Error recording execution {execution_id}: {e}")
+        if publish:
+            self.event_hub.publish(execution_id, 'status', execution)
+            self.event_hub.close(execution_id)
+        return execution
+    
+    def _record_run_stats(self, spider_id, **counts):
+        """更新按小时汇总的运行统计，失败不影响爬虫运行"""
+        try:
+            get_db().record_run_stats(spider_id, **counts)
+        except Exception as e:
+            print(f"Error recording run stats: {e}")
+    
+    def _save_output_log(self, spider_id, execution_id, log_type, log_file):
+        """登记运行期间写出的输出日志文件"""
         db = get_db()
         try:
-            log_dir = os.path.join('spider_logs', f'spider_{spider_id}')
-            os.makedirs(log_dir, exist_ok=True)
-            
-            log_file = os.path.join(log_dir, f'{execution_id}_{log_type}.log')
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
             # 创建文件记录
             db.create_file(
                 spider_id=spider_id,
@@ -332,8 +1004,8 @@ except Exception as e:
     
     def _parse_log_messages(self, spider_id, execution_id, output):
         """解析日志消息"""
-        db = get_db()
         try:
+            records = []
             lines = output.split('\n')
             for line in lines:
                 line = line.strip()
@@ -347,29 +1019,26 @@ except Exception as e:
                         if len(parts) >= 3:
                             level = parts[1][1:]  # 移除开头的 [
                             message = parts[2]
-                            
-                            db.create_log(
-                                spider_id=spider_id,
-                                level=level,
-                                message=message,
-                                source='spider',
-                                execution_id=execution_id
-                            )
+                            records.append((spider_id, level, message, 'spider', execution_id))
                     except:
                         pass
+            
+            self.log_writer.write_many(records)
         except Exception as e:
             print(f"Error parsing log messages: {e}")
     
     def _scan_output_files(self, spider_id, execution_id):
-        """扫描输出文件"""
+        """扫描输出文件，返回输出目录中的文件数"""
         db = get_db()
+        file_count = 0
         try:
             output_dir = os.path.join('spider_files', f'spider_{spider_id}', execution_id)
             if not os.path.exists(output_dir):
-                return
+                return 0
             
             for root, dirs, files in os.walk(output_dir):
                 for file in files:
+                    file_count += 1
                     file_path = os.path.join(root, file)
                     rel_path = os.path.relpath(file_path, output_dir)
                     
@@ -386,6 +1055,7 @@ except Exception as e:
                         )
         except Exception as e:
             print(f"Error scanning output files: {e}")
+        return file_count
     
     def stop_spider(self, spider_id):
         """停止爬虫"""
@@ -393,28 +1063,33 @@ except Exception as e:
         
         with self.lock:
             if spider_id not in self.running_spiders:
-                raise Exception("Spider is not running")
+                job = db.get_active_job(spider_id)
+                if job is None:
+                    raise Exception("Spider is not running")
+                self._cancel_job(spider_id, job)
+                return
             
             spider_info = self.running_spiders[spider_id]
+            if 'shards' in spider_info:
+                self._stop_sharded(spider_id, spider_info)
+                return
+            if spider_info['status'] == 'queued':
+                self._cancel_queued(spider_id, spider_info)
+                return
+            if spider_info['status'] == 'timeout':
+                # 已因超时在终止中
+                return
+            spider_info['status'] = 'stopped'
             
-            # 终止进程
-            if 'process' in spider_info and spider_info['process']:
-                try:
-                    spider_info['process'].terminate()
-                    # 等待进程结束
-                    spider_info['process'].wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # 强制杀死进程
-                    spider_info['process'].kill()
-                except:
-                    pass
+            # 终止进程组：先 SIGTERM，宽限期后仍未退出由等待线程 SIGKILL，这里不阻塞
+            self._begin_termination(spider_info)
             
             # 更新状态
             spider = db.get_spider(spider_id)
             if spider:
                 db.update_spider_status(spider_id, 'stopped')
                 
-                db.create_log(
+                self.log_writer.write(
                     spider_id=spider_id,
                     level='WARNING',
                     message=f'Spider "{spider["name"]}" was stopped manually',
@@ -425,81 +1100,419 @@ except Exception as e:
             # 清理运行信息
             del self.running_spiders[spider_id]
     
+    def _cancel_queued(self, spider_id, run_info):
+        """停止尚在排队的运行（调用方持有 self.lock）"""
+        db = get_db()
+        get_execution_queue().cancel(run_info['job'])
+        run_info['status'] = 'stopped'
+        run_info['start_time'] = datetime.utcnow()
+        run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+        del self.running_spiders[spider_id]
+        
+        db.update_spider_status(spider_id, 'stopped')
+        self.log_writer.write(
+            spider_id=spider_id,
+            level='WARNING',
+            message='Queued spider run was cancelled before it started',
+            source='spider_runner',
+            execution_id=run_info['execution_id']
+        )
+        self._record_execution(spider_id, run_info['execution_id'], run_info, 'stopped')
+    
+    def _stop_sharded(self, spider_id, run_info):
+        """停止分片运行：取消排队中的分片，终止运行中的分片（调用方持有 self.lock）
+
+        父执行记录在所有分片结束后写入；没有运行中的分片时在后台线程中立即合并。
+        """
+        db = get_db()
+        run_info['status'] = 'stopped'
+        now = datetime.utcnow()
+        for shard in run_info['shards']:
+            if shard['status'] == 'queued':
+                get_execution_queue().cancel(shard['job'])
+                shard['status'] = 'stopped'
+                shard['start_time'] = now
+                shard['queue_wait'] = (now - shard['queued_at']).total_seconds()
+                shard['result'] = self._record_execution(
+                    spider_id, shard['execution_id'], shard, 'stopped', publish=False,
+                    parent_execution_id=run_info['execution_id'],
+                    shard_index=shard['index'],
+                    shard_count=shard['count']
+                )
+                shard['finished'] = True
+            elif shard['status'] == 'running':
+                shard['status'] = 'stopped'
+                self._begin_termination(shard)
+        del self.running_spiders[spider_id]
+        
+        spider = db.get_spider(spider_id)
+        db.update_spider_status(spider_id, 'stopped')
+        self.log_writer.write(
+            spider_id=spider_id,
+            level='WARNING',
+            message=f'Spider "{spider["name"] if spider else spider_id}" was stopped manually',
+            source='spider_runner',
+            execution_id=run_info['execution_id']
+        )
+        
+        if spider and not run_info.get('finalizing') and all(shard.get('finished') for shard in run_info['shards']):
+            run_info['finalizing'] = True
+            threading.Thread(target=self._finalize_sharded, args=(spider, run_info), daemon=True).start()
+    
+    def _use_worker_processes(self):
+        return bool(get_db().get_system_settings().get('useWorkerProcesses', False))
+    
+    def _job_run_info(self, job):
+        """由任务队列中的任务构造运行信息"""
+        return {
+            'execution_id': job['execution_id'],
+            'queued_at': datetime.strptime(job['created_at'], '%Y-%m-%d %H:%M:%S'),
+            'start_time': None,
+            'status': 'queued',
+            'trigger': job['trigger_source'],
+            'job_id': job['id']
+        }
+    
+    def _job_status(self, job, now=None):
+        """任务队列中的任务对应的运行状态，格式与 get_spider_status 相同"""
+        now = now or datetime.utcnow()
+        queued_at = datetime.strptime(job['created_at'], '%Y-%m-%d %H:%M:%S')
+        if job['status'] == 'queued':
+            queued = [(item['priority'], item['id']) for item in get_db().get_active_jobs() if item['status'] == 'queued']
+            return {
+                'is_running': False,
+                'is_queued': True,
+                'execution_id': job['execution_id'],
+                'queued_at': queued_at.isoformat(),
+                'queue_wait': (now - queued_at).total_seconds(),
+                'queue_position': queued.index((job['priority'], job['id'])) + 1 if (job['priority'], job['id']) in queued else None
+            }
+        start_time = datetime.strptime(job['started_at'], '%Y-%m-%d %H:%M:%S')
+        return {
+            'is_running': True,
+            'is_queued': False,
+            'execution_id': job['execution_id'],
+            'queued_at': queued_at.isoformat(),
+            'start_time': start_time.isoformat(),
+            'duration': (now - start_time).total_seconds(),
+            'queue_wait': (start_time - queued_at).total_seconds(),
+            'worker_id': job['worker_id']
+        }
+    
+    def _cancel_job(self, spider_id, job):
+        """停止交给 worker 进程的运行：排队中的直接取消，执行中的由 worker 在下次心跳时终止"""
+        db = get_db()
+        previous = db.cancel_job(job['execution_id'])
+        if previous == 'queued':
+            run_info = self._job_run_info(job)
+            run_info['status'] = 'stopped'
+            run_info['start_time'] = datetime.utcnow()
+            run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+            db.update_spider_status(spider_id, 'stopped')
+            self.log_writer.write(
+                spider_id=spider_id,
+                level='WARNING',
+                message='Queued spider run was cancelled before it started',
+                source='spider_runner',
+                execution_id=job['execution_id']
+            )
+            self._record_execution(spider_id, job['execution_id'], run_info, 'stopped')
+        elif previous == 'leased':
+            self.log_writer.write(
+                spider_id=spider_id,
+                level='WARNING',
+                message=f'Stop requested; worker {job["worker_id"]} will terminate the run',
+                source='spider_runner',
+                execution_id=job['execution_id']
+            )
+    
+    def run_job(self, job):
+        """在 worker 进程中执行从任务队列领取的运行，阻塞直到运行结束，返回执行记录的状态"""
+        spider_id = job['spider_id']
+        run_info = self._job_run_info(job)
+        with self.lock:
+            if spider_id in self.running_spiders:
+                return 'error'
+            self.running_spiders[spider_id] = run_info
+        self.event_hub.open(spider_id, job['execution_id'])
+        self._start_queued(spider_id, run_info)
+        # 任务结束前确保本次运行的日志都已写入，轮询推送的订阅者不会漏掉最后的日志
+        self.log_writer.flush(timeout=10)
+        
+        execution = get_db().get_execution(job['execution_id'])
+        return execution['status'] if execution else 'error'
+    
+    def record_abandoned_job(self, job):
+        """记录因 worker 失联（租约多次过期）被放弃或已请求取消的任务"""
+        db = get_db()
+        run_info = self._job_run_info(job)
+        run_info['start_time'] = datetime.strptime(job['started_at'], '%Y-%m-%d %H:%M:%S') if job['started_at'] else datetime.utcnow()
+        run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+        spider_id = job['spider_id']
+        if job['status'] == 'cancelled':
+            db.update_spider_status(spider_id, 'stopped')
+            self._record_execution(spider_id, job['execution_id'], run_info, 'stopped')
+            return
+        
+        message = f'Worker {job["worker_id"]} stopped renewing its lease; gave up after {job["attempts"]} attempts'
+        db.update_spider_status(spider_id, 'error')
+        db.increment_spider_error_count(spider_id)
+        self._record_run_stats(spider_id, errors=1)
+        self.log_writer.write(
+            spider_id=spider_id,
+            level='ERROR',
+            message=message,
+            source='spider_runner',
+            execution_id=job['execution_id']
+        )
+        self._record_execution(spider_id, job['execution_id'], run_info, 'error', error_message=message)
+    
     def get_spider_status(self, spider_id):
-        """获取爬虫运行状态"""
+        """获取爬虫运行状态（排队中的运行 is_running 为 False、is_queued 为 True）"""
         with self.lock:
             if spider_id in self.running_spiders:
                 spider_info = self.running_spiders[spider_id]
-                return {
+                if spider_info['status'] == 'queued':
+                    return {
+                        'is_running': False,
+                        'is_queued': True,
+                        'execution_id': spider_info['execution_id'],
+                        'queued_at': spider_info['queued_at'].isoformat(),
+                        'queue_wait': (datetime.utcnow() - spider_info['queued_at']).total_seconds(),
+                        'queue_position': get_execution_queue().position(spider_info['job'])
+                    }
+                status = {
                     'is_running': True,
+                    'is_queued': False,
                     'execution_id': spider_info['execution_id'],
                     'start_time': spider_info['start_time'].isoformat(),
-                    'duration': (datetime.utcnow() - spider_info['start_time']).total_seconds()
-                }
-            else:
-                return {
-                    'is_running': False
+                    'duration': (datetime.utcnow() - spider_info['start_time']).total_seconds(),
+                    'queue_wait': spider_info.get('queue_wait', 0)
                 }
+                if 'shards' in spider_info:
+                    status['shards'] = [
+                        {'index': shard['index'], 'execution_id': shard['execution_id'], 'status': shard['status']}
+                        for shard in spider_info['shards']
+                    ]
+                return status
+        
+        # 交给 worker 进程执行的运行
+        job = get_db().get_active_job(spider_id)
+        if job:
+            return self._job_status(job)
+        return {
+            'is_running': False,
+            'is_queued': False
+        }
     
     def get_all_running_spiders(self):
-        """获取所有正在运行的爬虫"""
+        """获取所有正在运行的爬虫（不含排队中的）"""
+        leased = [job['spider_id'] for job in get_db().get_active_jobs() if job['status'] == 'leased']
+        with self.lock:
+            return [spider_id for spider_id, info in self.running_spiders.items() if info['status'] != 'queued'] + leased
+    
+    def get_queued_spiders(self):
+        """获取所有排队中的爬虫"""
+        queued = [job['spider_id'] for job in get_db().get_active_jobs() if job['status'] == 'queued']
+        with self.lock:
+            return [spider_id for spider_id, info in self.running_spiders.items() if info['status'] == 'queued'] + queued
+    
+    def get_active_executions(self):
+        """获取所有排队中和运行中的执行（含 API 调用和 worker 进程中的运行），按提交时间排序"""
+        now = datetime.utcnow()
+        jobs = get_db().get_active_jobs()
+        with self.lock:
+            entries = [(spider_id, info) for spider_id, info in self.running_spiders.items()]
+            entries += [(info['spider_id'], info) for info in self.api_calls.values()]
+            executions = []
+            for spider_id, info in entries:
+                executions.append({
+                    'spider_id': spider_id,
+                    'execution_id': info['execution_id'],
+                    'trigger': info.get('trigger', 'manual'),
+                    'status': info['status'],
+                    'queued_at': info['queued_at'].isoformat(),
+                    'start_time': info['start_time'].isoformat() if info['start_time'] else None,
+                    'queue_wait': info['queue_wait'] if info['start_time'] else (now - info['queued_at']).total_seconds(),
+                    'duration': (now - info['start_time']).total_seconds() if info['start_time'] else 0
+                })
+        for job in jobs:
+            status = self._job_status(job, now)
+            executions.append({
+                'spider_id': job['spider_id'],
+                'execution_id': job['execution_id'],
+                'trigger': job['trigger_source'],
+                'status': 'running' if status['is_running'] else 'queued',
+                'queued_at': status['queued_at'],
+                'start_time': status.get('start_time'),
+                'queue_wait': status['queue_wait'],
+                'duration': status.get('duration', 0),
+                'worker_id': job['worker_id']
+            })
+        executions.sort(key=lambda execution: execution['queued_at'])
+        return executions
+    
+    def execute_spider_api_call(self, spider_id, spider_code, priority=None):
+        """执行爬虫API调用 - 直接返回数据而不保存文件
+
+        调用与普通运行共用执行队列，受同一并发上限约束；调用方阻塞直到调用完成。
+        排队超过调用的超时时间时取消排队中的任务并返回超时结果，开始运行后由运行本身的超时约束。
+        """
+        execution_id = str(uuid.uuid4())
+        run_info = {
+            'execution_id': execution_id,
+            'spider_id': spider_id,
+            'queued_at': datetime.utcnow(),
+            'start_time': None,
+            'status': 'queued',
+            'trigger': 'api'
+        }
+        done = threading.Event()
+        timeout = self._execution_timeout(get_db().get_spider(spider_id) or {}, default=API_CALL_TIMEOUT)
+        
+        def run_call():
+            try:
+                with self.lock:
+                    # 排队等待已超时的调用被取消后，工作线程仍可能取到它
+                    if run_info['status'] != 'queued':
+                        return
+                    run_info['status'] = 'running'
+                    run_info['start_time'] = datetime.utcnow()
+                    run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+                run_info['result'] = self._run_api_call(spider_id, spider_code, run_info)
+            finally:
+                done.set()
+        
         with self.lock:
-            return list(self.running_spiders.keys())
+            self.api_calls[execution_id] = run_info
+        try:
+            if priority is None:
+                priority = TRIGGER_PRIORITIES['api']
+            job = get_execution_queue().submit(run_call, priority)
+            if not done.wait(timeout or None):
+                with self.lock:
+                    expired = run_info['status'] == 'queued'
+                    if expired:
+                        get_execution_queue().cancel(job)
+                        run_info['status'] = 'timeout'
+                        run_info['start_time'] = datetime.utcnow()
+                        run_info['queue_wait'] = (run_info['start_time'] - run_info['queued_at']).total_seconds()
+                if expired:
+                    message = f'爬虫执行超时（排队超过{timeout:g}秒）'
+                    self._record_run_stats(spider_id, runs=1, api_calls=1, errors=1)
+                    self._record_execution(spider_id, execution_id, run_info, 'timeout', error_message=message)
+                    return {'success': False, 'data': [], 'count': 0, 'timeout': True, 'error': message}
+                # 已开始运行：运行本身受同一超时约束
+                done.wait()
+        finally:
+            with self.lock:
+                self.api_calls.pop(execution_id, None)
+        
+        if 'result' not in run_info:
+            return {'success': False, 'data': [], 'count': 0, 'error': '执行异常: API调用未完成'}
+        return run_info['result']
     
-    def execute_spider_api_call(self, spider_id, spider_code):
-        """执行爬虫API调用 - 直接返回数据而不保存文件"""
+    def _run_api_call(self, spider_id, spider_code, run_info):
+        """在工作线程中执行API调用并记录统计和执行记录"""
+        self._record_run_stats(spider_id, runs=1, api_calls=1)
+        output_stats = {}
+        result = self._execute_api_call(spider_id, spider_code, output_stats)
+        duration = self._run_duration(run_info)
+        
+        if result.get('success', False):
+            status = 'success'
+            self._record_run_stats(spider_id, successes=1, duration=duration)
+        else:
+            status = 'timeout' if result.get('timeout') else 'failed'
+            self._record_run_stats(spider_id, errors=1, duration=duration)
+        
+        self._record_execution(
+            spider_id, run_info['execution_id'], run_info, status,
+            item_count=result.get('count', 0) or 0,
+            error_message=None if status == 'success' else str(result.get('error', ''))[-2000:] or None,
+            **output_stats
+        )
+        return result
+    
+    def _execute_api_call(self, spider_id, spider_code, output_stats=None):
+        """在子进程中运行API调用版本的爬虫代码并解析JSON结果
+
+        输出边运行边读取，内存中只保留最后一个 JSON 结果行和输出末尾；
+        output_stats 不为空时写入输出行数、字节数和进程的资源用量。
+        超时时间取爬虫配置的 execution_timeout，未配置时为 API_CALL_TIMEOUT。
+        """
+        timeout = API_CALL_TIMEOUT
         try:
-            # 创建临时文件保存爬虫代码
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
-                # 准备API调用版本的爬虫代码
-                api_spider_code = self._prepare_api_spider_code(spider_code, spider_id)
-                f.write(api_spider_code)
-                temp_file = f.name
+            spider = get_db().get_spider(spider_id) or {}
+            timeout = self._execution_timeout(spider, default=API_CALL_TIMEOUT)
+            
+            # 规则模式的爬虫由规则引擎在当前线程中执行
+            config = spider.get('config') or {}
+            if isinstance(config, str):
+                try:
+                    config = json.loads(config)
+                except ValueError:
+                    config = {}
+            if isinstance(config, dict) and config.get('type') == 'rules':
+                return self._execute_rules_call(config, timeout, output_stats, cache=self._http_cache(spider))
+            
+            # 获取API调用版本的爬虫程序（相同代码复用已编译的缓存）
+            program = self._get_api_program(spider_code)
             
             # 设置环境变量
             env = os.environ.copy()
             env['SPIDER_ID'] = str(spider_id)
             env['API_CALL_MODE'] = 'true'
+            env['PYTHONIOENCODING'] = 'utf-8'
+            env['SPIDER_RUNTIME_PATH'] = SPIDER_RUNTIME_PATH
+            env.update(self._http_cache_env(spider))
+            
+            http_stats = {}
+            
+            def read_stats(level, source, line):
+                http_stats.update(_parse_http_stats(line) or {})
             
             # 运行爬虫
-            process = subprocess.Popen(
-                [sys.executable, temp_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env
-            )
+            process = self._spawn_process(program, env, limits=self._resource_limits(spider))
+            # 结果是完整的一行 JSON，stdout 不拆分长行
+            capture = OutputCapture(process, max_line_chars=None, track_json=True, listener=read_stats).start()
             
-            # 等待进程完成（带超时处理）
+            # 等待进程完成，超时后终止整个进程组（SIGTERM，宽限期后 SIGKILL）
             try:
-                stdout, stderr = process.communicate(timeout=300)  # 5分钟超时
+                process.wait(timeout=timeout or None)
             except subprocess.TimeoutExpired:
-                process.kill()
-                stdout, stderr = process.communicate()
-                raise subprocess.TimeoutExpired(process.args, 300)
+                _signal_process_group(process)
+                try:
+                    process.wait(timeout=TERMINATE_GRACE_PERIOD)
+                except subprocess.TimeoutExpired:
+                    pass
+                _signal_process_group(process, force=True)
+                process.wait()
+                raise
+            finally:
+                capture.finish()
+                if output_stats is not None:
+                    output_stats.update(
+                        stdout_lines=capture.stdout.lines,
+                        stderr_lines=capture.stderr.lines,
+                        output_bytes=capture.output_bytes,
+                        **http_stats,
+                        **resource_limits.usage_fields(process.rusage)
+                    )
             
-            # 清理临时文件
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+            stdout = capture.stdout.tail()
+            stderr = capture.stderr.tail()
             
             # 处理结果
             if process.returncode == 0:
-                # 尝试从stdout解析JSON结果
+                # 使用stdout中最后一个JSON对象行作为结果
                 try:
-                    # 查找JSON输出（通常在最后一行）
-                    lines = stdout.strip().split('\n')
                     result_json = None
-                    
-                    for line in reversed(lines):
-                        line = line.strip()
-                        if line.startswith('{') and line.endswith('}'):
-                            try:
-                                result_json = json.loads(line)
-                                break
-                            except:
-                                continue
+                    if capture.stdout.last_json:
+                        try:
+                            result_json = json.loads(capture.stdout.last_json)
+                        except ValueError:
+                            result_json = None
                     
                     if result_json:
                         return result_json
@@ -535,12 +1548,13 @@ except Exception as e:
                     'stderr': stderr
                 }
                 
-        except subprocess.TimeoutExpired:
+        except (subprocess.TimeoutExpired, rules_engine.RulesTimeout):
             return {
                 'success': False,
                 'data': [],
                 'count': 0,
-                'error': '爬虫执行超时（超过5分钟）'
+                'timeout': True,
+                'error': f'爬虫执行超时（超过{timeout:g}秒）'
             }
         except Exception as e:
             return {
@@ -550,23 +1564,51 @@ except Exception as e:
                 'error': f'执行异常: {str(e)}'
             }
     
-    def _prepare_api_spider_code(self, spider_code, spider_id):
+    def _execute_rules_call(self, config, timeout, output_stats=None, cache=None):
+        """在当前线程中执行规则爬虫，结果格式与子进程执行的 API 调用相同
+
+        请求超时受整个调用的剩余时间约束，超时后返回 timeout 结果；规则爬虫不启动进程，
+        资源限制不适用，也不记录进程的资源用量。cache 为爬虫的 HTTP 缓存（未启用时为 None）。
+        """
+        messages = []
+        http_stats = {}
+        try:
+            result = rules_engine.run_rules(
+                config, timeout=timeout,
+                log=lambda level, message: messages.append(f'[{level}] {message}'),
+                stats=http_stats,
+                cache=cache
+            )
+        finally:
+            if output_stats is not None:
+                output_stats.update(
+                    stdout_lines=0,
+                    stderr_lines=len(messages),
+                    output_bytes=sum(len(message.encode('utf-8')) for message in messages),
+                    **http_stats
+                )
+        if not result['success']:
+            # 与子进程模式中失败结果附带的 stderr 对应
+            result['stderr'] = '\n'.join(messages[-50:])
+        return result
+    
+    def _get_spider_program(self, spider):
+        """获取爬虫的可执行程序（按代码和配置缓存）"""
+        return get_program_cache().get_program(
+            'spider', PROGRAM_TEMPLATE_VERSION,
+            [spider["code"], spider.get("config", {})],
+            lambda: self._prepare_spider_code(spider)
+        )
+    
+    def _get_api_program(self, spider_code):
+        """获取API调用版本的可执行程序（按代码缓存）"""
+        return get_program_cache().get_program(
+            'api', PROGRAM_TEMPLATE_VERSION, [spider_code],
+            lambda: self._prepare_api_spider_code(spider_code)
+        )
+    
+    def _prepare_api_spider_code(self, spider_code):
         """准备API调用版本的爬虫代码"""
-        # 获取爬虫配置
-        from database import get_db
-        db = get_db()
-        spider = db.get_spider(spider_id)
-        config = spider.get('config', {})
-        if isinstance(config, str):
-            try:
-                config = json.loads(config)
-            except:
-                config = {}
-        
-        # 检查是否为规则模式
-        if config.get('type') == 'rules':
-            return self._generate_rules_spider_code(config, spider_id)
-        
         # API调用版本的辅助代码
         helper_code = f'''
 import os
@@ -578,7 +1620,7 @@ from bs4 import BeautifulSoup
 import time
 
 # 爬虫运行环境变量
-SPIDER_ID = {spider_id}
+SPIDER_ID = int(os.environ.get('SPIDER_ID', '0'))
 API_CALL_MODE = True
 
 # 全局变量用于存储API模式下的数据
@@ -590,6 +1632,23 @@ def log_message(level, message):
     timestamp = datetime.now().isoformat()
     print(f"[{{timestamp}}] [{{level}}] {{message}}", file=sys.stderr)
 
+# 共享的 HTTP 会话（与普通运行相同）
+if os.environ.get('SPIDER_RUNTIME_PATH'):
+    sys.path.append(os.environ['SPIDER_RUNTIME_PATH'])
+try:
+    import spider_runtime
+    session = spider_runtime.get_session()
+    spider_runtime.report_stats_at_exit(log_message)
+except ImportError:
+    session = requests.Session()
+
+# 爬虫配置 http_cache 开启 skip_unchanged 时，未变化（服务器返回 304）的页面可跳过解析
+HTTP_CACHE_SKIP_UNCHANGED = os.environ.get('HTTP_CACHE_SKIP_UNCHANGED') == '1'
+
+def page_unchanged(response):
+    """跳过未变化页面模式下，response 是 session 从缓存取得的未变化页面时返回 True"""
+    return HTTP_CACHE_SKIP_UNCHANGED and getattr(response, 'from_cache', False)
+
 def get_config():
     """获取爬虫配置"""
     return {{}}
@@ -676,280 +1735,63 @@ except Exception as e:
 '''
         
         return helper_code + indented_user_code + save_data_override + footer_code
-    
-    def _generate_rules_spider_code(self, config, spider_id):
-        """根据规则配置生成爬虫代码"""
-        import json
-        
-        url = config.get('url', '')
-        rules = config.get('rules', [])
-        headers = config.get('headers', {})
-        delay = config.get('delay', 1)
-        timeout = config.get('timeout', 30)
-        retries = config.get('retries', 3)
-        
-        # 生成规则爬虫代码
-        code = f'''
-import os
-import sys
-import json
-import requests
-from datetime import datetime
-from bs4 import BeautifulSoup
-from lxml import html, etree
-import time
 
-# 爬虫运行环境变量
-SPIDER_ID = {spider_id}
-API_CALL_MODE = True
 
-# 全局变量用于存储API模式下的数据
-_api_results = []
+def _signal_process_group(process, force=False):
+    """向爬虫进程所在的进程组发送 SIGTERM（force 时 SIGKILL），包括爬虫自己启动的子进程
 
-# 工具函数
-def log_message(level, message):
-    """记录日志"""
-    timestamp = datetime.now().isoformat()
-    print(f"[{{timestamp}}] [{{level}}] {{message}}", file=sys.stderr)
+    爬虫进程启动时会成为新会话的首进程，进程组号等于其 pid；不支持进程组的平台只终止爬虫进程本身。
+    """
+    if not hasattr(os, 'killpg'):
+        if force:
+            process.kill()
+        else:
+            process.terminate()
+        return
+    sig = signal.SIGKILL if force else signal.SIGTERM
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        # 进程组已不存在（或子进程尚未建立新会话）
+        process.send_signal(sig)
+    except PermissionError:
+        pass
 
-def save_data(data, filename, format='json'):
-    """API模式下不保存文件，将数据存储到全局变量"""
-    global _api_results
-    _api_results = data if isinstance(data, list) else [data]
-    log_message('INFO', f'数据准备完成，共 {{len(_api_results)}} 条记录')
-    return _api_results
 
-def extract_data_by_rules(soup, tree, rules):
-    """根据规则提取数据"""
-    results = []
-    
-    # 找到所有可能的数据项
-    # 先尝试用第一个规则找到所有匹配的元素作为基础
-    if not rules:
-        return results
-    
-    first_rule = rules[0]
-    base_elements = []
-    
-    if first_rule.get('selectorType') == 'xpath':
-        try:
-            base_elements = tree.xpath(first_rule['selector'])
-        except Exception as e:
-            log_message('ERROR', f'XPath选择器错误: {{str(e)}}')
-            return results
-    else:
-        try:
-            base_elements = soup.select(first_rule['selector'])
-        except Exception as e:
-            log_message('ERROR', f'CSS选择器错误: {{str(e)}}')
-            return results
-    
-    # 如果没有找到基础元素，尝试提取单个数据项
-    if not base_elements:
-        item = {{}}
-        for rule in rules:
-            field = rule.get('field', '')
-            selector = rule.get('selector', '')
-            selector_type = rule.get('selectorType', 'css')
-            extract_type = rule.get('type', 'text')
-            attr_name = rule.get('attr', '')
-            
-            if not field or not selector:
-                continue
-            
-            try:
-                if selector_type == 'xpath':
-                    elements = tree.xpath(selector)
-                    if elements:
-                        element = elements[0]
-                        if extract_type == 'text':
-                            if hasattr(element, 'text_content'):
-                                item[field] = element.text_content().strip()
-                            else:
-                                item[field] = str(element).strip()
-                        elif extract_type == 'attr' and attr_name:
-                            if hasattr(element, 'get'):
-                                item[field] = element.get(attr_name, '')
-                            else:
-                                item[field] = ''
-                        elif extract_type == 'html':
-                            if hasattr(element, 'text_content'):
-                                item[field] = etree.tostring(element, encoding='unicode')
-                            else:
-                                item[field] = str(element)
-                else:
-                    elements = soup.select(selector)
-                    if elements:
-                        element = elements[0]
-                        if extract_type == 'text':
-                            item[field] = element.get_text().strip()
-                        elif extract_type == 'attr' and attr_name:
-                            item[field] = element.get(attr_name, '')
-                        elif extract_type == 'html':
-                            item[field] = str(element)
-            except Exception as e:
-                log_message('ERROR', f'提取字段 {{field}} 时出错: {{str(e)}}')
-                item[field] = ''
-        
-        if item:
-            results.append(item)
-    else:
-        # 对每个基础元素提取所有字段
-        for base_element in base_elements:
-            item = {{}}
-            
-            for rule in rules:
-                field = rule.get('field', '')
-                selector = rule.get('selector', '')
-                selector_type = rule.get('selectorType', 'css')
-                extract_type = rule.get('type', 'text')
-                attr_name = rule.get('attr', '')
-                
-                if not field or not selector:
-                    continue
-                
-                try:
-                    if selector_type == 'xpath':
-                        # 对于XPath，在当前元素的上下文中查找
-                        if hasattr(base_element, 'xpath'):
-                            elements = base_element.xpath(selector)
-                        else:
-                            # 如果base_element不支持xpath，使用全局查找
-                            elements = tree.xpath(selector)
-                        
-                        if elements:
-                            element = elements[0]
-                            if extract_type == 'text':
-                                if hasattr(element, 'text_content'):
-                                    item[field] = element.text_content().strip()
-                                else:
-                                    item[field] = str(element).strip()
-                            elif extract_type == 'attr' and attr_name:
-                                if hasattr(element, 'get'):
-                                    item[field] = element.get(attr_name, '')
-                                else:
-                                    item[field] = ''
-                            elif extract_type == 'html':
-                                if hasattr(element, 'text_content'):
-                                    item[field] = etree.tostring(element, encoding='unicode')
-                                else:
-                                    item[field] = str(element)
-                    else:
-                        # 对于CSS选择器，在当前元素的上下文中查找
-                        elements = base_element.select(selector)
-                        if not elements:
-                            # 如果在当前元素中没找到，检查当前元素本身是否匹配
-                            if base_element.select_one(selector.split()[-1]):
-                                elements = [base_element]
-                        
-                        if elements:
-                            element = elements[0]
-                            if extract_type == 'text':
-                                item[field] = element.get_text().strip()
-                            elif extract_type == 'attr' and attr_name:
-                                item[field] = element.get(attr_name, '')
-                            elif extract_type == 'html':
-                                item[field] = str(element)
-                except Exception as e:
-                    log_message('ERROR', f'提取字段 {{field}} 时出错: {{str(e)}}')
-                    item[field] = ''
-            
-            if item:
-                results.append(item)
-    
-    return results
+def _parse_http_stats(line):
+    """解析爬虫进程退出时输出的共享 HTTP 会话统计行，返回执行记录字段（不是统计行时为 None）"""
+    if 'HTTP session:' not in line:
+        return None
+    match = spider_runtime.STATS_PATTERN.search(line)
+    if not match:
+        return None
+    fields = {'http_requests': int(match.group(1)), 'http_connections': int(match.group(2))}
+    if match.group(3) is not None:
+        fields['http_not_modified'] = int(match.group(3))
+    return fields
 
-def spider_main():
-    """规则爬虫主函数"""
-    url = "{url}"
-    headers = {json.dumps(headers)}
-    delay = {delay}
-    timeout = {timeout}
-    retries = {retries}
-    rules = {json.dumps(rules)}
-    
-    log_message('INFO', f'开始爬取: {{url}}')
-    
-    # 请求网页
-    for attempt in range(retries + 1):
-        try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            break
-        except Exception as e:
-            if attempt < retries:
-                log_message('WARNING', f'请求失败，第{{attempt + 1}}次重试: {{str(e)}}')
-                time.sleep(delay)
-            else:
-                log_message('ERROR', f'请求最终失败: {{str(e)}}')
-                return []
-    
-    # 解析HTML
-    try:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        tree = html.fromstring(response.text)
-        log_message('INFO', 'HTML解析完成')
-    except Exception as e:
-        log_message('ERROR', f'HTML解析失败: {{str(e)}}')
-        return []
-    
-    # 根据规则提取数据
+
+_spider_runner = None
+_spider_runner_lock = threading.Lock()
+
+
+def get_spider_runner():
+    """获取全局爬虫运行器，所有入口（接口、定时任务、API调用）都通过它提交运行"""
+    global _spider_runner
+    with _spider_runner_lock:
+        if _spider_runner is None:
+            _spider_runner = SpiderRunner()
+        return _spider_runner
+
+
+def run_scheduled_spider(spider_id):
+    """定时任务入口：提交一次 schedule 触发的运行，上一次运行未结束时跳过"""
     try:
-        results = extract_data_by_rules(soup, tree, rules)
-        log_message('INFO', f'数据提取完成，共提取 {{len(results)}} 条记录')
-        
-        # 保存数据
-        save_data(results, 'spider_results.json')
-        return results
+        get_spider_runner().run_spider(spider_id, trigger='schedule')
     except Exception as e:
-        log_message('ERROR', f'数据提取失败: {{str(e)}}')
-        return []
-
-# 执行爬虫
-try:
-    log_message('INFO', '规则爬虫开始执行')
-    
-    # 执行spider_main函数
-    results = spider_main()
-    
-    # 输出结果
-    if results:
-        print(json.dumps({{
-            'success': True,
-            'data': results,
-            'count': len(results),
-            'url': "{url}",
-            'timestamp': datetime.now().timestamp(),
-            'message': f'成功提取 {{len(results)}} 条数据'
-        }}, ensure_ascii=False))
-    else:
-        print(json.dumps({{
-            'success': False,
-            'data': [],
-            'count': 0,
-            'message': '未提取到有效数据'
-        }}, ensure_ascii=False))
-    
-    log_message('INFO', '规则爬虫执行完成')
-    
-except Exception as e:
-    import traceback
-    error_msg = f'规则爬虫执行失败: {{str(e)}}'
-    traceback_msg = traceback.format_exc()
-    
-    log_message('ERROR', error_msg)
-    log_message('ERROR', f'详细错误信息:\\n{{traceback_msg}}')
-    
-    # 输出错误结果到stdout
-    print(json.dumps({{
-        'success': False,
-        'data': [],
-        'count': 0,
-        'error': error_msg,
-        'traceback': traceback_msg
-    }}, ensure_ascii=False))
-    
-    sys.exit(1)
-'''
-        
-        return code
\ No newline at end of file
+        get_log_writer().write(
+            spider_id=spider_id,
+            level='WARNING',
+            message=f'Scheduled run skipped: {e}',
+            source='scheduler'
+        )
@@ -0,0 +1,410 @@
+"""
+爬虫运行时的 HTTP 会话
+
+提供预先配置好的 requests 会话：连接池复用 keep-alive 连接，urllib3 Retry 对连接错误和
+429/5xx 响应按指数退避重试（只重试幂等请求），接受 gzip（安装了 brotli 时还有 br）压缩。
+会话记录请求数和新建的连接数，用于统计连接复用情况。
+
+启用 HTTP 缓存时，GET 请求带上次响应的 ETag/Last-Modified 发送条件请求，服务器返回 304 时
+使用磁盘上缓存的正文，见 HttpCache。
+
+注入爬虫代码的辅助代码把本目录（由环境变量 SPIDER_RUNTIME_PATH 传入）追加到 sys.path
+后导入本模块，因此只依赖 requests 和标准库；Web 进程中的规则引擎也使用这里的会话。
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = 10                         # 保留连接池的主机数
+POOL_MAXSIZE = 10                             # 每个主机保留的空闲连接数
+RETRY_TOTAL = 3                               # 连接错误和 RETRY_STATUSES 响应的重试次数
+RETRY_BACKOFF = 0.5                           # 重试间隔的退避系数（秒）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# HTTP 缓存
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024      # 缓存目录总大小上限，系统设置 httpCacheMaxMB 可修改
+HTTP_CACHE_EVICT_RATIO = 0.9                  # 超过上限时淘汰到上限的这个比例，避免每次写入都淘汰
+
+# 爬虫进程退出时输出的统计行，运行器从输出中解析后写入执行记录
+STATS_MESSAGE = ('HTTP session: {requests} requests, {connections} connections opened, {reused} reused, '
+                 '{not_modified} not modified')
+STATS_PATTERN = re.compile(r'HTTP session: (\d+) requests, (\d+) connections opened(?:, \d+ reused, (\d+) not modified)?')
+
+
+def _brotli_available():
+    for name in ('brotli', 'brotlicffi'):
+        try:
+            __import__(name)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+# urllib3 只有安装了 brotli 才能解码 br 响应
+ACCEPT_ENCODING = 'gzip, deflate, br' if _brotli_available() else 'gzip, deflate'
+
+
+class CountingAdapter(HTTPAdapter):
+    """记录用到的 urllib3 连接池，由连接池的计数得到请求数和新建连接数"""
+
+    def __init__(self, *args, **kwargs):
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _track(self, pool):
+        with self._pools_lock:
+            # 保留引用：被淘汰的连接池的计数仍然计入统计
+            self._pools[id(pool)] = pool
+        return pool
+
+    def get_connection(self, url, proxies=None):
+        return self._track(super().get_connection(url, proxies))
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        # requests 2.32 起发送请求时调用此方法
+        return self._track(super().get_connection_with_tls_context(request, verify, proxies, cert))
+
+    def stats(self):
+        with self._pools_lock:
+            pools = list(self._pools.values())
+        return {
+            'requests': sum(pool.num_requests for pool in pools),
+            'connections': sum(pool.num_connections for pool in pools),
+        }
+
+
+# 各缓存根目录的估算总大小，同一进程中的 HttpCache 共用
+_cache_usage = {}
+_cache_usage_lock = threading.Lock()
+
+
+def _cache_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _write_atomic(path, data):
+    """先写临时文件再替换，其他进程不会读到写了一半的文件"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class HttpCache:
+    """磁盘上的 HTTP 条件请求缓存
+
+    root 下每个爬虫一个目录（spider_<id>），每个 URL 两个文件：<sha1>.json 为元数据（ETag、
+    Last-Modified、正文编码，跳过未变化页面模式下还有上次的提取结果），<sha1>.body 为正文。
+    只缓存带 ETag 或 Last-Modified 的 200 响应。命中时更新元数据文件的修改时间，根目录总大小
+    超过 max_bytes 时按修改时间从旧到新淘汰。多个进程可以共用同一个根目录。
+    """
+
+    def __init__(self, root, spider_id, max_bytes=HTTP_CACHE_MAX_BYTES, skip_unchanged=False):
+        self.root = os.path.abspath(root)
+        self.directory = os.path.join(self.root, f'spider_{spider_id}')
+        self.max_bytes = max_bytes
+        # 页面未变化（304）时复用上次的提取结果，不再解析
+        self.skip_unchanged = skip_unchanged
+        self.not_modified = 0
+
+    def _path(self, url, suffix):
+        return os.path.join(self.directory, _cache_key(url) + suffix)
+
+    def lookup(self, url):
+        """URL 的缓存元数据，没有缓存时为 None"""
+        try:
+            with open(self._path(url, '.json'), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def validators(self, entry):
+        """条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body(self, entry):
+        """服务器返回 304 时读取缓存的正文并标记为最近使用，正文已被淘汰或不完整时为 None"""
+        try:
+            with open(self._path(entry['url'], '.body'), 'rb') as f:
+                body = f.read()
+            if len(body) != entry.get('size'):
+                return None
+            os.utime(self._path(entry['url'], '.json'))
+        except OSError:
+            return None
+        self.not_modified += 1
+        return body
+
+    def store(self, url, headers, body, encoding=None):
+        """缓存 200 响应的正文，响应没有验证器或不允许缓存时忽略"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified or 'no-store' in headers.get('Cache-Control', '').lower():
+            return
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': headers.get('Content-Type'),
+            'encoding': encoding,
+            'size': len(body),
+            'stored_at': time.time()
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_atomic(self._path(url, '.body'), body)
+            meta = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+            _write_atomic(self._path(url, '.json'), meta)
+        except OSError:
+            return
+        self._grow(len(body) + len(meta))
+
+    def store_extracted(self, url, key, items, next_url=None):
+        """把页面的提取结果记入缓存元数据，key 标识提取规则（规则变化后不复用）"""
+        entry = self.lookup(url)
+        if entry is None:
+            return
+        entry['extracted'] = {'key': key, 'items': items, 'next_url': next_url}
+        meta = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        try:
+            _write_atomic(self._path(url, '.json'), meta)
+        except OSError:
+            return
+        self._grow(len(meta))
+
+    def extracted(self, url, key):
+        """上次对该页面、同一规则的提取结果 (数据列表, 下一页地址)，没有时为 None"""
+        extracted = (self.lookup(url) or {}).get('extracted')
+        if not extracted or extracted.get('key') != key:
+            return None
+        return extracted['items'], extracted.get('next_url')
+
+    def _grow(self, size):
+        with _cache_usage_lock:
+            usage = _cache_usage.get(self.root)
+            if usage is not None and usage + size <= self.max_bytes:
+                _cache_usage[self.root] = usage + size
+                return
+        # 首次写入或估算超过上限：扫描目录，必要时淘汰
+        self.evict()
+
+    def evict(self):
+        """扫描根目录，总大小超过上限时淘汰最久未使用的条目，返回释放的字节数"""
+        entries = {}
+        total = 0
+        try:
+            spider_dirs = [entry.path for entry in os.scandir(self.root) if entry.is_dir()]
+        except OSError:
+            spider_dirs = []
+        for spider_dir in spider_dirs:
+            try:
+                files = list(os.scandir(spider_dir))
+            except OSError:
+                continue
+            for file in files:
+                stem, ext = os.path.splitext(file.path)
+                if ext not in ('.json', '.body'):
+                    continue
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                item = entries.setdefault(stem, [0, 0])
+                item[0] += stat.st_size
+                if ext == '.json' or not item[1]:
+                    item[1] = stat.st_mtime
+                total += stat.st_size
+
+        freed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * HTTP_CACHE_EVICT_RATIO
+            for stem, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total - freed <= target:
+                    break
+                # 先删元数据，其他进程不会再用到这个条目的正文
+                for ext in ('.json', '.body'):
+                    try:
+                        os.remove(stem + ext)
+                    except OSError:
+                        pass
+                freed += size
+        with _cache_usage_lock:
+            _cache_usage[self.root] = total - freed
+        return freed
+
+
+def resolve_cache_settings(system_settings, spider_config=None):
+    """爬虫生效的 HTTP 缓存设置 {'max_bytes', 'skip_unchanged'}，未启用时为 None
+
+    系统设置 httpCacheEnabled 为默认开关；爬虫配置的 http_cache 为 false 时关闭，为对象时
+    可设置 enabled 和 skip_unchanged（页面未变化时跳过提取）。
+    """
+    if isinstance(spider_config, str):
+        try:
+            spider_config = json.loads(spider_config)
+        except ValueError:
+            spider_config = {}
+    if not isinstance(spider_config, dict):
+        spider_config = {}
+    system_settings = system_settings or {}
+    options = spider_config.get('http_cache')
+    if not isinstance(options, dict):
+        options = {} if options is None else {'enabled': bool(options)}
+
+    if not options.get('enabled', system_settings.get('httpCacheEnabled', True)):
+        return None
+    try:
+        max_mb = float(system_settings.get('httpCacheMaxMB') or 0)
+    except (TypeError, ValueError):
+        max_mb = 0
+    return {
+        'max_bytes': int(max_mb * 1024 * 1024) if max_mb > 0 else HTTP_CACHE_MAX_BYTES,
+        'skip_unchanged': bool(options.get('skip_unchanged', False))
+    }
+
+
+def cache_from_env():
+    """按运行器传入的环境变量创建爬虫进程的缓存，未启用时为 None"""
+    root = os.environ.get('HTTP_CACHE_DIR')
+    if not root:
+        return None
+    return HttpCache(
+        root, os.environ.get('SPIDER_ID', '0'),
+        max_bytes=int(os.environ.get('HTTP_CACHE_MAX_BYTES') or HTTP_CACHE_MAX_BYTES),
+        skip_unchanged=os.environ.get('HTTP_CACHE_SKIP_UNCHANGED') == '1'
+    )
+
+
+def _cached_response(request, response, entry, body):
+    """用 304 响应和缓存的正文构造 200 响应"""
+    cached = requests.Response()
+    cached.status_code = 200
+    cached.reason = 'OK'
+    cached.headers = CaseInsensitiveDict(response.headers)
+    if entry.get('content_type'):
+        cached.headers['Content-Type'] = entry['content_type']
+    cached._content = body
+    cached.encoding = entry.get('encoding')
+    cached.url = request.url
+    cached.request = request
+    cached.elapsed = response.elapsed
+    cached.connection = response.connection
+    cached.cookies = response.cookies
+    cached.from_cache = True
+    return cached
+
+
+class CachingSession(requests.Session):
+    """http_cache 不为空时，GET 请求带上缓存的验证器发送条件请求
+
+    服务器返回 304 时返回用缓存正文构造的 200 响应，其 from_cache 为 True；
+    其他响应的 from_cache 为 False。调用方自己带了条件请求头时不经过缓存。
+    """
+
+    http_cache = None
+
+    def send(self, request, **kwargs):
+        cache = self.http_cache
+        if (cache is None or request.method != 'GET'
+                or 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers):
+            response = super().send(request, **kwargs)
+            response.from_cache = getattr(response, 'from_cache', False)
+            return response
+
+        entry = cache.lookup(request.url)
+        if entry is not None:
+            request.headers.update(cache.validators(entry))
+        response = super().send(request, **kwargs)
+        if getattr(response, 'from_cache', False):
+            # 重定向后的响应已由内层的 send 处理
+            return response
+        if response.status_code == 304 and entry is not None:
+            body = cache.body(entry)
+            if body is not None:
+                response.close()
+                return _cached_response(request, response, entry, body)
+            # 正文已被淘汰：不带验证器重新请求
+            response.close()
+            for header in ('If-None-Match', 'If-Modified-Since'):
+                request.headers.pop(header, None)
+            response = super().send(request, **kwargs)
+
+        response.from_cache = False
+        if response.status_code == 200 and not response.history and not kwargs.get('stream'):
+            cache.store(request.url, response.headers, response.content, response.encoding)
+        return response
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                   retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF, cache=None):
+    """创建带连接池、重试和压缩的会话，retries 为 0 时不自动重试，cache 为 HttpCache 时启用条件请求"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        # 重试用尽后返回最后的响应，由调用方 raise_for_status
+        raise_on_status=False
+    )
+    adapter = CountingAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = CachingSession()
+    session.http_cache = cache
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return session
+
+
+def session_stats(session):
+    """会话的请求数、新建连接数和复用连接的请求数"""
+    adapters = {id(adapter): adapter for adapter in session.adapters.values() if isinstance(adapter, CountingAdapter)}
+    stats = {'requests': 0, 'connections': 0}
+    for adapter in adapters.values():
+        for key, value in adapter.stats().items():
+            stats[key] += value
+    stats['reused'] = max(0, stats['requests'] - stats['connections'])
+    cache = getattr(session, 'http_cache', None)
+    stats['not_modified'] = cache.not_modified if cache is not None else 0
+    return stats
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """获取进程内共享的会话"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(cache=cache_from_env())
+        return _session
+
+
+def report_stats_at_exit(log):
+    """进程退出时用 log(level, message) 输出共享会话的统计（没有发出请求时不输出）"""
+    def report():
+        if _session is None:
+            return
+        stats = session_stats(_session)
+        if stats['requests']:
+            log('INFO', STATS_MESSAGE.format(**stats))
+    atexit.register(report)
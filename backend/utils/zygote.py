@@ -0,0 +1,423 @@
+"""
+爬虫进程的预热 fork 服务（zygote）
+
+常驻的辅助进程预先导入爬虫常用的模块（requests、bs4、lxml、pandas），
+每次运行时 fork 出一个子进程执行爬虫脚本，省去解释器启动和模块导入的时间。
+子进程拥有独立的会话（进程组）、工作目录、环境变量和标准输出/错误管道，
+与直接启动 python 进程的行为一致。仅支持 POSIX 系统，不可用时调用方退回冷启动。
+
+服务端以脚本方式运行：python zygote.py <socket路径>
+"""
+
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from utils.resource_limits import apply_limits, rusage_dict
+except ImportError:  # 以脚本方式运行服务端时 utils 目录就是 sys.path[0]
+    from resource_limits import apply_limits, rusage_dict
+
+# 预先导入的模块（导入失败的跳过）
+PRELOAD_MODULES = ('json', 'csv', 'requests', 'bs4', 'lxml.html', 'lxml.etree', 'pandas')
+STARTUP_TIMEOUT = 60        # 等待服务启动（完成预导入）的最长时间（秒）
+REQUEST_MAX_BYTES = 1 << 20
+RESTART_COOLDOWN = 30       # 服务启动失败后多久内不再尝试（秒）
+
+
+def _send_message(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+class _MessageReader:
+    """从连接中逐条读取以换行分隔的 JSON 消息"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b''
+
+    def read(self, timeout=None):
+        """读取一条消息；超时抛出 socket.timeout，连接关闭返回 None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b'\n' not in self.buffer:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                self.sock.settimeout(remaining)
+            else:
+                self.sock.settimeout(None)
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return json.loads(line)
+
+
+# ---------------------------------------------------------------------------
+# 服务端
+# ---------------------------------------------------------------------------
+
+def _run_child(request, fds, listener, connections, wakeup_fds):
+    """在 fork 出的子进程中执行爬虫脚本，不返回"""
+    code = 1
+    try:
+        # 恢复默认的信号处理，关闭服务端持有的描述符
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        listener.close()
+        for conn in connections:
+            conn.close()
+        for fd in wakeup_fds:
+            os.close(fd)
+        os.setsid()
+
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in (devnull, *fds):
+            os.close(fd)
+
+        env = request['env']
+        os.environ.clear()
+        os.environ.update(env)
+        os.chdir(request['cwd'])
+
+        # 与 python script.py 的启动状态保持一致
+        script = request['script']
+        sys.argv = [script]
+        sys.path[0] = os.path.dirname(os.path.abspath(script))
+        for path in reversed([p for p in env.get('PYTHONPATH', '').split(os.pathsep) if p]):
+            if path not in sys.path:
+                sys.path.insert(1, path)
+        encoding = env.get('PYTHONIOENCODING', 'utf-8').split(':')[0] or 'utf-8'
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', encoding=encoding, errors='backslashreplace', buffering=1, closefd=False)
+        sys.stderr = open(2, 'w', encoding=encoding, errors='backslashreplace', buffering=1, closefd=False)
+        import random
+        random.seed()
+
+        import runpy
+        try:
+            apply_limits(request.get('limits'))
+            runpy.run_path(script, run_name='__main__')
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        import atexit
+        atexit._run_exitfuncs()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(code & 0xFF)
+
+
+def serve(socket_path):
+    """服务端主循环：单线程处理 fork 请求并回收子进程"""
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    listener.listen(64)
+
+    # SIGCHLD 通过管道唤醒 select，及时回收子进程
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, 'accept')
+    selector.register(wakeup_r, selectors.EVENT_READ, 'wakeup')
+    selector.register(sys.stdin, selectors.EVENT_READ, 'parent')
+    children = {}  # {pid: 连接}
+
+    print('ready', flush=True)
+
+    while True:
+        for key, _ in selector.select():
+            if key.data == 'parent':
+                # 父进程退出（stdin 关闭）时结束服务，已运行的子进程不受影响
+                if not sys.stdin.buffer.read1(4096):
+                    return
+            elif key.data == 'wakeup':
+                try:
+                    os.read(wakeup_r, 4096)
+                except BlockingIOError:
+                    pass
+            elif key.data == 'accept':
+                conn, _ = listener.accept()
+                try:
+                    conn.settimeout(10)
+                    message, fds, _, _ = socket.recv_fds(conn, REQUEST_MAX_BYTES, 2)
+                    request = json.loads(message)
+                    if len(fds) != 2:
+                        raise ValueError('expected stdout and stderr descriptors')
+                except Exception as e:
+                    try:
+                        _send_message(conn, {'error': str(e)})
+                    except OSError:
+                        pass
+                    conn.close()
+                    continue
+
+                try:
+                    pid = os.fork()
+                except OSError as e:
+                    for fd in fds:
+                        os.close(fd)
+                    try:
+                        _send_message(conn, {'error': str(e)})
+                    except OSError:
+                        pass
+                    conn.close()
+                    continue
+                if pid == 0:
+                    _run_child(request, fds, listener, list(children.values()) + [conn], (wakeup_r, wakeup_w))
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                try:
+                    _send_message(conn, {'pid': pid})
+                except OSError:
+                    pass
+
+        # 回收已退出的子进程，把退出码和资源用量发回请求方
+        while children:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn is None:
+                continue
+            try:
+                _send_message(conn, {
+                    'returncode': os.waitstatus_to_exitcode(status),
+                    'rusage': rusage_dict(rusage)
+                })
+            except OSError:
+                pass
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# 客户端
+# ---------------------------------------------------------------------------
+
+def is_supported():
+    """当前平台是否支持 fork 服务"""
+    return os.name == 'posix' and hasattr(os, 'fork') and hasattr(socket, 'send_fds')
+
+
+class ZygoteProcess:
+    """由 fork 服务启动的子进程，提供与 subprocess.Popen 相同的常用接口"""
+
+    def __init__(self, args, conn, stdout, stderr, encoding='utf-8', errors='replace'):
+        self.args = args
+        self._conn = conn
+        self._reader = _MessageReader(conn)
+        self._lock = threading.Lock()
+        self.returncode = None
+        self.rusage = None
+
+        try:
+            message = self._reader.read(timeout=10)
+        except (OSError, ValueError):
+            message = None
+        if not message or 'pid' not in message:
+            conn.close()
+            os.close(stdout)
+            os.close(stderr)
+            raise OSError((message or {}).get('error', 'zygote did not start the process'))
+        self.pid = message['pid']
+        self.stdout = open(stdout, 'r', encoding=encoding, errors=errors)
+        self.stderr = open(stderr, 'r', encoding=encoding, errors=errors)
+
+    def wait(self, timeout=None):
+        with self._lock:
+            if self.returncode is not None:
+                return self.returncode
+            try:
+                message = self._reader.read(timeout)
+            except socket.timeout:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            if message is None:
+                # fork 服务意外退出，无法得知子进程的退出码
+                message = {'returncode': -1}
+            self.returncode = message['returncode']
+            self.rusage = message.get('rusage')
+            self._conn.close()
+            return self.returncode
+
+    def poll(self):
+        try:
+            return self.wait(timeout=0)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class ZygoteClient:
+    """启动和连接 fork 服务，服务退出后在下次请求时自动重启"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._socket_path = None
+        self._failed_at = None
+
+    def _ensure_started(self):
+        """确保服务在运行，返回 socket 路径；启动失败返回 None（调用方持有锁）"""
+        if self._process is not None and self._process.poll() is None:
+            return self._socket_path
+        if self._failed_at is not None and time.monotonic() - self._failed_at < RESTART_COOLDOWN:
+            return None
+
+        import tempfile
+        socket_path = os.path.join(tempfile.mkdtemp(prefix='spider_zygote_'), 'zygote.sock')
+        # 数值计算库在导入时可能创建线程池，fork 之后的子进程无法使用，限制为单线程
+        env = os.environ.copy()
+        for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+            env.setdefault(name, '1')
+        try:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), socket_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                env=env,
+                close_fds=True
+            )
+            selector = selectors.DefaultSelector()
+            selector.register(process.stdout, selectors.EVENT_READ)
+            ready = selector.select(STARTUP_TIMEOUT) and process.stdout.readline().strip() == b'ready'
+            selector.close()
+            if not ready:
+                process.kill()
+                raise OSError('zygote did not become ready')
+        except Exception as e:
+            print(f"Failed to start spider zygote, falling back to cold start: {e}")
+            self._failed_at = time.monotonic()
+            return None
+
+        self._process = process
+        self._socket_path = socket_path
+        self._failed_at = None
+        return socket_path
+
+    def start(self):
+        """提前启动服务（预导入需要一些时间）"""
+        with self._lock:
+            return self._ensure_started() is not None
+
+    def spawn(self, script, env, cwd, encoding='utf-8', errors='replace', limits=None):
+        """fork 一个子进程执行脚本，limits 为 resource_limits 中的资源限制；服务不可用时返回 None"""
+        with self._lock:
+            socket_path = self._ensure_started()
+        if socket_path is None:
+            return None
+
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(socket_path)
+            request = {
+                'script': os.path.abspath(script),
+                'env': dict(env),
+                'cwd': os.path.abspath(cwd),
+                'limits': limits or {}
+            }
+            socket.send_fds(conn, [json.dumps(request).encode('utf-8')], [stdout_w, stderr_w])
+        except OSError as e:
+            conn.close()
+            # 写端由下面的 finally 统一关闭，这里只关闭读端，避免重复关闭已被复用的描述符
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            print(f"Spider zygote request failed, falling back to cold start: {e}")
+            return None
+        finally:
+            # 写端已交给服务端，本进程必须关闭自己的副本，否则读端收不到 EOF
+            for fd in (stdout_w, stderr_w):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+        try:
+            return ZygoteProcess(['zygote', script], conn, stdout_r, stderr_r, encoding, errors)
+        except OSError as e:
+            print(f"Spider zygote spawn failed, falling back to cold start: {e}")
+            return None
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+
+
+_zygote_client = None
+_zygote_client_lock = threading.Lock()
+
+
+def get_zygote():
+    """获取全局 fork 服务客户端"""
+    global _zygote_client
+    with _zygote_client_lock:
+        if _zygote_client is None:
+            _zygote_client = ZygoteClient()
+        return _zygote_client
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1])
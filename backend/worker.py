@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+独立的爬虫执行 worker
+
+从数据库任务队列（job_queue）领取运行任务，用与 Web 进程相同的运行器执行，
+结果（执行记录、日志、输出文件）直接写回共享的数据库和目录。系统设置中启用
+useWorkerProcesses 后，Web 进程只负责提交任务；可以同时启动多个 worker 进程
+（同一台机器，或共享同一数据库和数据目录的多台机器）来增加并发。
+
+领取的任务带有租约，worker 定期心跳续租；worker 崩溃或失联导致租约过期的任务
+会被重新排队，超过最大尝试次数后记为失败。停止运行时 Web 进程在任务上标记取消，
+执行它的 worker 在下次心跳时终止爬虫进程。
+
+用法（在 backend 目录下）: python -m worker [--concurrency 2] [--lease 30] [--worker-id NAME]
+收到 SIGTERM/SIGINT 后不再领取新任务，等待执行中的运行结束；再次收到时终止执行中的运行。
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_db
+from utils.spider_runner import get_spider_runner
+from utils import zygote
+
+logger = logging.getLogger('worker')
+
+LEASE_SECONDS = 30          # 任务租约时长（秒）
+POLL_INTERVAL = 1.0         # 没有任务时的轮询间隔（秒）
+
+
+class Worker:
+    """从任务队列领取并执行爬虫运行，concurrency 个执行线程共用一个心跳线程"""
+
+    def __init__(self, worker_id, concurrency=2, lease_seconds=LEASE_SECONDS, poll_interval=POLL_INTERVAL):
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = max(1.0, lease_seconds / 3)
+        self.poll_interval = poll_interval
+        self.db = get_db()
+        self.runner = get_spider_runner()
+        self.jobs = {}  # {job_id: 任务}，执行中的任务
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.completed = 0
+
+    def run(self):
+        """启动执行线程和心跳线程，直到 stop() 后所有执行中的运行结束"""
+        logger.info(f"Worker {self.worker_id} started with {self.concurrency} slots")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='worker-heartbeat', daemon=True)
+        heartbeat.start()
+        slots = [
+            threading.Thread(target=self._slot_loop, name=f'worker-slot-{i}', daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for slot in slots:
+            slot.start()
+        while any(slot.is_alive() for slot in slots):
+            for slot in slots:
+                slot.join(timeout=0.5)
+        logger.info(f"Worker {self.worker_id} stopped after {self.completed} runs")
+
+    def stop(self):
+        """不再领取新任务，执行中的运行继续执行到结束"""
+        self.stopping.set()
+
+    def terminate(self):
+        """终止所有执行中的运行"""
+        self.stopping.set()
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            self._stop_job(job, 'worker shutting down')
+
+    def _slot_loop(self):
+        while not self.stopping.is_set():
+            try:
+                job = self.db.claim_job(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Failed to claim job: {e}")
+                job = None
+            if job is None:
+                self.stopping.wait(self.poll_interval)
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        logger.info(f"Running spider {job['spider_id']} (execution {job['execution_id']}, attempt {job['attempts']})")
+        with self.lock:
+            self.jobs[job['id']] = job
+        status = 'error'
+        try:
+            status = self.runner.run_job(job)
+        except Exception as e:
+            logger.exception(f"Job {job['id']} failed: {e}")
+        finally:
+            with self.lock:
+                self.jobs.pop(job['id'], None)
+                self.completed += 1
+            job_status = 'cancelled' if job.get('cancelled') else 'done'
+            if not self.db.finish_job(job['id'], self.worker_id, job_status, status):
+                logger.warning(f"Lease on job {job['id']} was lost before it finished")
+        logger.info(f"Execution {job['execution_id']} finished: {status}")
+
+    def _stop_job(self, job, reason):
+        job['cancelled'] = True
+        logger.info(f"Stopping spider {job['spider_id']} (execution {job['execution_id']}): {reason}")
+        try:
+            self.runner.stop_spider(job['spider_id'])
+        except Exception as e:
+            logger.warning(f"Failed to stop spider {job['spider_id']}: {e}")
+
+    def _heartbeat_loop(self):
+        while True:
+            with self.lock:
+                jobs = list(self.jobs.values())
+            for job in jobs:
+                try:
+                    held, cancel_requested = self.db.heartbeat_job(job['id'], self.worker_id, self.lease_seconds)
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {job['id']} failed: {e}")
+                    continue
+                if job.get('cancelled'):
+                    continue
+                if not held:
+                    # 租约已被收回（心跳中断过久），任务可能已交给其他 worker
+                    self._stop_job(job, 'lease lost')
+                elif cancel_requested:
+                    self._stop_job(job, 'stop requested')
+
+            # 收回其他 worker 过期的租约
+            try:
+                for job in self.db.requeue_expired_jobs():
+                    self.runner.record_abandoned_job(job)
+            except Exception as e:
+                logger.warning(f"Failed to requeue expired jobs: {e}")
+
+            if self.stopping.is_set() and not jobs:
+                return
+            time.sleep(self.heartbeat_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从任务队列领取并执行爬虫运行')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='同时执行的运行数（默认取系统设置 maxConcurrentSpiders）')
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS, help='任务租约时长（秒）')
+    parser.add_argument('--poll', type=float, default=POLL_INTERVAL, help='没有任务时的轮询间隔（秒）')
+    parser.add_argument('--worker-id', default=None, help='worker 标识（默认 主机名:进程号）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    settings = get_db().get_system_settings()
+    concurrency = args.concurrency or settings.get('maxConcurrentSpiders', 3)
+    worker = Worker(args.worker_id or f'{socket.gethostname()}:{os.getpid()}', concurrency, args.lease, args.poll)
+
+    if zygote.is_supported() and settings.get('useZygote', True):
+        threading.Thread(target=zygote.get_zygote().start, daemon=True).start()
+
+    def handle_signal(signum, frame):
+        if worker.stopping.is_set():
+            logger.info('Terminating running spiders')
+            threading.Thread(target=worker.terminate, daemon=True).start()
+        else:
+            logger.info('Shutting down after running spiders finish (signal again to terminate them)')
+            worker.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -30,7 +30,7 @@ export function CodeEditor({
   onChange,
   language = 'python',
   height = '400px',
-  placeholder = '# 在这里编写您的爬虫代码\n# 示例：\n# import requests\n# from bs4 import BeautifulSoup\n\n# def spider_main():\n#     url = "https://example.com"\n#     response = requests.get(url)\n#     soup = BeautifulSoup(response.content, "html.parser")\n#     \n#     # 提取数据\n#     title = soup.find("title").text\n#     print(f"页面标题: {title}")\n#     \n#     return {"title": title}',
+  placeholder = '# 在这里编写您的爬虫代码\n# 示例：\n# from bs4 import BeautifulSoup\n\n# def spider_main():\n#     url = "https://example.com"\n#     # session 为预置的共享会话（连接复用、自动重试），也可以使用 requests.get\n#     response = session.get(url)\n#     soup = BeautifulSoup(response.content, "html.parser")\n#     \n#     # 提取数据\n#     title = soup.find("title").text\n#     print(f"页面标题: {title}")\n#     \n#     return {"title": title}',
   readOnly = false,
   className = '',
   onCodeErrorsChange,
@@ -0,0 +1,96 @@
+import { useState, useEffect, useRef } from 'react'
+
+export interface ExecutionLogLine {
+  id: number
+  level: string
+  source: string
+  message: string
+  timestamp: string
+}
+
+export interface ExecutionProgress {
+  duration: number
+  stdout_lines: number
+  stderr_lines: number
+  output_bytes: number
+  item_count: number
+}
+
+export interface ExecutionStatusEvent {
+  status: string
+  trigger?: string
+  trigger_source?: string
+  queued_at?: string
+  start_time?: string
+  started_at?: string
+  queue_wait?: number
+  duration?: number
+  exit_code?: number
+  error_message?: string | null
+}
+
+// 只保留最近的日志行，长时间运行也不会占用过多内存
+const MAX_LINES = 200
+
+// 通过 SSE 订阅单次运行的实时日志、状态和进度，运行结束时调用 onEnd
+export function useExecutionStream(
+  spiderId: number,
+  executionId: string | null | undefined,
+  onEnd?: () => void
+) {
+  const [status, setStatus] = useState<ExecutionStatusEvent | null>(null)
+  const [progress, setProgress] = useState<ExecutionProgress | null>(null)
+  const [lines, setLines] = useState<ExecutionLogLine[]>([])
+  const [isStreaming, setIsStreaming] = useState(false)
+  const onEndRef = useRef(onEnd)
+  onEndRef.current = onEnd
+
+  useEffect(() => {
+    if (!spiderId || !executionId) {
+      return
+    }
+
+    setStatus(null)
+    setProgress(null)
+    setLines([])
+    setIsStreaming(true)
+
+    // 浏览器断线重连时会自动携带 Last-Event-ID 续传
+    const source = new EventSource(`/api/spiders/${spiderId}/executions/${executionId}/stream`)
+
+    source.addEventListener('snapshot', (event) => {
+      const data = JSON.parse((event as MessageEvent).data)
+      if (data.status) setStatus(data.status)
+      if (data.progress) setProgress(data.progress)
+    })
+    source.addEventListener('status', (event) => {
+      setStatus(JSON.parse((event as MessageEvent).data))
+    })
+    source.addEventListener('progress', (event) => {
+      setProgress(JSON.parse((event as MessageEvent).data))
+    })
+    source.addEventListener('log', (event) => {
+      const message = event as MessageEvent
+      const line = { id: Number(message.lastEventId), ...JSON.parse(message.data) }
+      setLines(prev => [...prev, line].slice(-MAX_LINES))
+    })
+    source.addEventListener('end', () => {
+      source.close()
+      setIsStreaming(false)
+      onEndRef.current?.()
+    })
+
+    // 清理函数
+    return () => {
+      source.close()
+      setIsStreaming(false)
+    }
+  }, [spiderId, executionId])
+
+  return {
+    status,
+    progress,
+    lines,
+    isStreaming
+  }
+}
@@ -64,8 +64,17 @@ const systemSchema = z.object({
   defaultTimeout: z.number().min(5, '最小值为5秒').max(300, '最大值为300秒'),
   defaultRetries: z.number().min(0, '最小值为0').max(10, '最大值为10'),
   logRetentionDays: z.number().min(1, '最小值为1天').max(365, '最大值为365天'),
+  logArchiveDays: z.number().min(1, '最小值为1天').max(365, '最大值为365天'),
   fileRetentionDays: z.number().min(1, '最小值为1天').max(365, '最大值为365天'),
   apiCallIntervalMinutes: z.number().min(1, '最小值为1分钟').max(60, '最大值为60分钟'),
+  useZygote: z.boolean(),
+  useWorkerProcesses: z.boolean(),
+  executionTimeoutMinutes: z.number().min(0, '最小值为0'),
+  spiderCpuLimitSeconds: z.number().min(0, '最小值为0'),
+  spiderMemoryLimitMB: z.number().min(0, '最小值为0'),
+  spiderMaxOpenFiles: z.number().min(0, '最小值为0'),
+  httpCacheEnabled: z.boolean(),
+  httpCacheMaxMB: z.number().min(1, '最小值为1MB'),
 })
 
 type ProfileFormData = z.infer<typeof profileSchema>
@@ -111,8 +120,17 @@ export function Settings() {
       defaultTimeout: 30,
       defaultRetries: 3,
       logRetentionDays: 30,
+      logArchiveDays: 7,
       fileRetentionDays: 90,
       apiCallIntervalMinutes: 5,
+      useZygote: true,
+      useWorkerProcesses: false,
+      executionTimeoutMinutes: 60,
+      spiderCpuLimitSeconds: 0,
+      spiderMemoryLimitMB: 0,
+      spiderMaxOpenFiles: 0,
+      httpCacheEnabled: true,
+      httpCacheMaxMB: 256,
     },
   })
 
@@ -546,6 +564,19 @@ export function Settings() {
                     </p>
                   </div>
                   
+                  <div>
+                    <label className="text-sm font-medium">日志归档天数</label>
+                    <Input
+                      type="number"
+                      {...systemForm.register('logArchiveDays', { valueAsNumber: true })}
+                      min="1"
+                      max="365"
+                    />
+                    <p className="text-sm text-muted-foreground mt-1">
+                      多少天前的日志移入压缩归档（仍可查询和导出）
+                    </p>
+                  </div>
+                  
                   <div>
                     <label className="text-sm font-medium">文件保留天数</label>
                     <Input
@@ -571,6 +602,108 @@ export function Settings() {
                       /api-call接口的最小调用间隔
                     </p>
                   </div>
+                  
+                  <div className="flex items-center justify-between">
+                    <div>
+                      <div className="font-medium">预热进程启动</div>
+                      <div className="text-sm text-muted-foreground">
+                        从预先导入常用模块的常驻进程 fork 爬虫进程，缩短启动时间（仅 Linux/macOS）
+                      </div>
+                    </div>
+                    <input
+                      type="checkbox"
+                      {...systemForm.register('useZygote')}
+                      className="h-4 w-4"
+                    />
+                  </div>
+                  
+                  <div className="flex items-center justify-between">
+                    <div>
+                      <div className="font-medium">独立 worker 进程执行</div>
+                      <div className="text-sm text-muted-foreground">
+                        运行提交到任务队列，由 backend 目录下 python -m worker 启动的进程执行，可启动多个以提高并发（API调用仍在本进程执行）
+                      </div>
+                    </div>
+                    <input
+                      type="checkbox"
+                      {...systemForm.register('useWorkerProcesses')}
+                      className="h-4 w-4"
+                    />
+                  </div>
+                  
+                  <div>
+                    <label className="text-sm font-medium">运行超时（分钟）</label>
+                    <Input
+                      type="number"
+                      {...systemForm.register('executionTimeoutMinutes', { valueAsNumber: true })}
+                      min="0"
+                    />
+                    <p className="text-sm text-muted-foreground mt-1">
+                      超时的运行会被终止（含爬虫启动的子进程）并记为超时，0 表示不限制；爬虫配置中的 execution_timeout（秒）可单独覆盖
+                    </p>
+                  </div>
+                  
+                  <div>
+                    <label className="text-sm font-medium">爬虫CPU时间上限（秒）</label>
+                    <Input
+                      type="number"
+                      {...systemForm.register('spiderCpuLimitSeconds', { valueAsNumber: true })}
+                      min="0"
+                    />
+                    <p className="text-sm text-muted-foreground mt-1">
+                      单次运行可使用的CPU时间，0 表示不限制（仅 Linux/macOS）
+                    </p>
+                  </div>
+                  
+                  <div>
+                    <label className="text-sm font-medium">爬虫内存上限（MB）</label>
+                    <Input
+                      type="number"
+                      {...systemForm.register('spiderMemoryLimitMB', { valueAsNumber: true })}
+                      min="0"
+                    />
+                    <p className="text-sm text-muted-foreground mt-1">
+                      爬虫进程的虚拟地址空间上限，包含已导入模块占用的部分，0 表示不限制
+                    </p>
+                  </div>
+                  
+                  <div>
+                    <label className="text-sm font-medium">爬虫最大打开文件数</label>
+                    <Input
+                      type="number"
+                      {...systemForm.register('spiderMaxOpenFiles', { valueAsNumber: true })}
+                      min="0"
+                    />
+                    <p className="text-sm text-muted-foreground mt-1">
+                      包含网络连接，0 表示不限制；单个爬虫可在配置的 resource_limits 中覆盖以上限制
+                    </p>
+                  </div>
+                  
+                  <div className="flex items-center justify-between">
+                    <div>
+                      <div className="font-medium">HTTP 条件请求缓存</div>
+                      <div className="text-sm text-muted-foreground">
+                        缓存带 ETag/Last-Modified 的页面，再次抓取时服务器返回 304 则使用缓存的内容；爬虫配置中的 http_cache 可单独关闭，或设置 skip_unchanged 跳过未变化页面的提取
+                      </div>
+                    </div>
+                    <input
+                      type="checkbox"
+                      {...systemForm.register('httpCacheEnabled')}
+                      className="h-4 w-4"
+                    />
+                  </div>
+                  
+                  <div>
+                    <label className="text-sm font-medium">HTTP 缓存容量（MB）</label>
+                    <Input
+                      type="number"
+                      {...systemForm.register('httpCacheMaxMB', { valueAsNumber: true })}
+                      min="1"
+                    />
+                    <p className="text-sm text-muted-foreground mt-1">
+                      所有爬虫共用，超过后淘汰最久未使用的页面
+                    </p>
+                  </div>
                 </div>
                 
                 <Button type="submit" disabled={systemForm.formState.isSubmitting}>
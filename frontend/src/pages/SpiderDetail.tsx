@@ -59,6 +59,7 @@ import { formatTime, getRelativeTime, formatFileSize } from '../lib/utils'
 import FilePreview from '../components/FilePreview'
 import { SpiderStatsCharts } from '../components/SpiderStatsCharts'
 import { SpiderFile } from '../services/api'
+import { useExecutionStream } from '../hooks/useExecutionStream'
 
 export function SpiderDetail() {
   const { id } = useParams<{ id: string }>()
@@ -68,6 +69,7 @@ export function SpiderDetail() {
   const [previewOpen, setPreviewOpen] = useState(false)
   const [fileDeleteDialogOpen, setFileDeleteDialogOpen] = useState(false)
   const [fileToDelete, setFileToDelete] = useState<SpiderFile | null>(null)
+  const [executionId, setExecutionId] = useState<string | null>(null)
   
   const queryClient = useQueryClient()
   const runningSpiders = useRunningSpiders()
@@ -83,12 +85,21 @@ export function SpiderDetail() {
     enabled: !!spiderId,
   })
 
-  // 获取爬虫状态
+  // 获取爬虫状态（运行期间的变化通过 SSE 推送，不再轮询）
   const { data: status } = useQuery({
     queryKey: ['spider-status', spiderId],
     queryFn: () => spiderService.getSpiderStatus(spiderId),
     enabled: !!spiderId && !!isRunning,
-    refetchInterval: isRunning ? 2000 : false,
+  })
+
+  // 订阅当前运行的实时日志和进度，运行结束后刷新数据
+  const activeExecutionId = executionId || status?.runtime_info?.execution_id
+  const executionStream = useExecutionStream(spiderId, activeExecutionId, () => {
+    setExecutionId(null)
+    queryClient.invalidateQueries({ queryKey: ['spider', spiderId] })
+    queryClient.invalidateQueries({ queryKey: ['spider-status', spiderId] })
+    queryClient.invalidateQueries({ queryKey: ['spider-log-files', spiderId] })
+    queryClient.invalidateQueries({ queryKey: ['spider-files', spiderId] })
   })
 
   // 监听爬虫运行状态变化，当爬虫完成时刷新数据
@@ -139,6 +150,7 @@ export function SpiderDetail() {
         title: '爬虫启动成功',
         message: `执行ID: ${data.execution_id}`,
       })
+      setExecutionId(data.execution_id)
       queryClient.invalidateQueries({ queryKey: ['spider', spiderId] })
       queryClient.invalidateQueries({ queryKey: ['spider-status', spiderId] })
     },
@@ -496,7 +508,50 @@ export function SpiderDetail() {
       <SpiderStatsCharts spiderId={spiderId} />
 
       {/* 运行状态 */}
-      {isRunning && status && (
+      {executionStream.isStreaming && (
+        <Card>
+          <CardHeader>
+            <CardTitle className="flex items-center gap-2">
+              <Activity className="h-5 w-5 text-green-500" />
+              {executionStream.status?.status === 'queued' ? '排队中' : '运行状态'}
+            </CardTitle>
+            <CardDescription className="font-mono">{activeExecutionId}</CardDescription>
+          </CardHeader>
+          <CardContent>
+            <div className="grid gap-4 md:grid-cols-4">
+              <div>
+                <div className="text-sm font-medium text-muted-foreground">运行时长</div>
+                <div className="text-lg">
+                  {executionStream.progress ? `${Math.floor(executionStream.progress.duration)}s` : 'N/A'}
+                </div>
+              </div>
+              <div>
+                <div className="text-sm font-medium text-muted-foreground">输出行数</div>
+                <div className="text-lg">{executionStream.progress?.stdout_lines ?? 0}</div>
+              </div>
+              <div>
+                <div className="text-sm font-medium text-muted-foreground">错误行数</div>
+                <div className="text-lg">{executionStream.progress?.stderr_lines ?? 0}</div>
+              </div>
+              <div>
+                <div className="text-sm font-medium text-muted-foreground">保存条数</div>
+                <div className="text-lg">{executionStream.progress?.item_count ?? 0}</div>
+              </div>
+            </div>
+            {executionStream.lines.length > 0 && (
+              <div className="mt-4 max-h-64 overflow-y-auto rounded bg-muted p-3 font-mono text-xs">
+                {executionStream.lines.map((line) => (
+                  <div key={line.id} className={line.level === 'ERROR' ? 'text-red-500' : undefined}>
+                    {line.message}
+                  </div>
+                ))}
+              </div>
+            )}
+          </CardContent>
+        </Card>
+      )}
+
+      {!executionStream.isStreaming && isRunning && status && (
         <Card>
           <CardHeader>
             <CardTitle className="flex items-center gap-2">
@@ -224,6 +224,8 @@ export function SpiderForm() {
         // 规则模式 - 提供默认代码，主要保存配置
         spiderData.code = '# 规则模式爬虫\n# 此代码由系统根据规则自动生成\ndef spider_main():\n    pass'
         spiderData.config = {
+          // 保留表单中没有的配置项（多页面抓取、资源限制等）
+          ...(spider?.config?.type === 'rules' ? spider.config : {}),
           type: 'rules',  // 添加类型标识
           url: data.url,
           rules: data.rules,
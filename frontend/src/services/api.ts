@@ -74,7 +74,7 @@ export interface Spider {
   name: string
   description: string
   code: string
-  status: 'inactive' | 'running' | 'stopped' | 'error' | 'success'
+  status: 'inactive' | 'queued' | 'running' | 'stopped' | 'error' | 'success'
   created_at: string
   updated_at: string
   last_run_at?: string
@@ -5,6 +5,8 @@ export interface FileListParams {
   per_page?: number
   file_type?: string
   search?: string
+  cursor?: string
+  include_total?: boolean
 }
 
 export interface UpdateFileRequest {
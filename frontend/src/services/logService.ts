@@ -9,6 +9,8 @@ export interface LogListParams {
   start_date?: string
   end_date?: string
   search?: string
+  cursor?: string
+  include_total?: boolean
 }
 
 export interface CreateLogRequest {
@@ -18,8 +18,17 @@ export interface SystemSettings {
   defaultTimeout: number
   defaultRetries: number
   logRetentionDays: number
+  logArchiveDays: number
   fileRetentionDays: number
   apiCallIntervalMinutes: number
+  useZygote: boolean
+  useWorkerProcesses: boolean
+  executionTimeoutMinutes: number
+  spiderCpuLimitSeconds: number
+  spiderMemoryLimitMB: number
+  spiderMaxOpenFiles: number
+  httpCacheEnabled: boolean
+  httpCacheMaxMB: number
 }
 
 export interface ClearDataRequest {
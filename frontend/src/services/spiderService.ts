@@ -52,9 +52,9 @@ class SpiderService {
     return response
   }
 
-  // 运行爬虫
-  async runSpider(id: number): Promise<{ message: string; execution_id: string; status: string }> {
-    const response = await api.post(`/spiders/${id}/run`)
+  // 运行爬虫，shards 大于 1 时为分片运行
+  async runSpider(id: number, shards?: number): Promise<{ message: string; execution_id: string; status: string }> {
+    const response = await api.post(`/spiders/${id}/run`, shards && shards > 1 ? { shards } : undefined)
     return response
   }
 